@@ -2,11 +2,12 @@
 import pika
 import json
 import sys
+import os
 
 # Establish connection to RabbitMQ
 connection_params = pika.ConnectionParameters(
-    host='localhost',
-    port=5673,  # Changed from default 5672
+    host=os.environ.get('RABBITMQ_HOST', 'localhost'),
+    port=int(os.environ.get('RABBITMQ_PORT', 5673)),  # docker-compose maps 5673 to the broker
     credentials=pika.PlainCredentials('user', 'password')
 )
 
@@ -3,12 +3,18 @@ import pika
 import json
 import sys
 import os
+import struct
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Establish connection to RabbitMQ
 connection_params = pika.ConnectionParameters(
-    host='rabbitmq',  # Use container name instead of localhost
-    port=5672,  # Use internal port, not mapped port
+    host=os.environ.get('RABBITMQ_HOST', 'rabbitmq'),  # Use container name instead of localhost
+    port=int(os.environ.get('RABBITMQ_PORT', 5672)),  # Use internal port, not mapped port
     credentials=pika.PlainCredentials('user', 'password')
 )
 
@@ -31,6 +37,32 @@ if connection is None:
     print('Failed to connect to RabbitMQ after multiple attempts')
     exit(1)
 
+# Envelopes from `rabbitbench run --scenario envelope` pack many records
+# into one message, each prefixed with its length as a big-endian u32
+ENVELOPE_LENGTH = struct.Struct('>I')
+
+
+def iter_records(body):
+    """Yield each record of a length-prefixed envelope without copying it"""
+    view = memoryview(body)
+    at = 0
+    while at < len(view):
+        (size,) = ENVELOPE_LENGTH.unpack_from(view, at)
+        at += ENVELOPE_LENGTH.size
+        yield view[at:at + size]
+        at += size
+
+
+if orjson is not None:
+    # orjson parses the record views in place
+    decode_record = orjson.loads
+else:
+    def decode_record(record):
+        # The json module only reads str, bytes and bytearray, so without
+        # orjson each record is copied out of the envelope once
+        return json.loads(bytes(record))
+
+
 # Statistics tracking (moved outside try block)
 message_count = 0
 start_time = None
@@ -46,11 +78,18 @@ try:
         if start_time is None:
             start_time = time.time()
         
-        message = json.loads(body)
-        message_count += 1
+        previous_count = message_count
+        headers = properties.headers or {}
+        if headers.get('x-envelope') == 'length':
+            for record in iter_records(body):
+                message = decode_record(record)
+                message_count += 1
+        else:
+            message = json.loads(body)
+            message_count += 1
         
         # Print progress every 1000 messages
-        if message_count % 1000 == 0:
+        if message_count // 1000 != previous_count // 1000:
             elapsed = time.time() - start_time
             rate = message_count / elapsed
             print(f'Processed {message_count} messages - Rate: {rate:.0f} msgs/sec')
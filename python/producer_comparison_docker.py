@@ -8,8 +8,8 @@ import os
 def connect_to_rabbitmq():
     """Establish connection to RabbitMQ"""
     connection_params = pika.ConnectionParameters(
-        host='rabbitmq',
-        port=5672,
+        host=os.environ.get('RABBITMQ_HOST', 'rabbitmq'),
+        port=int(os.environ.get('RABBITMQ_PORT', 5672)),
         credentials=pika.PlainCredentials('user', 'password')
     )
     
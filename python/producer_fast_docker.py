@@ -7,8 +7,8 @@ import os
 
 # Establish connection to RabbitMQ
 connection_params = pika.ConnectionParameters(
-    host='rabbitmq',  # Use container name instead of localhost
-    port=5672,  # Use internal port, not mapped port
+    host=os.environ.get('RABBITMQ_HOST', 'rabbitmq'),  # Use container name instead of localhost
+    port=int(os.environ.get('RABBITMQ_PORT', 5672)),  # Use internal port, not mapped port
     credentials=pika.PlainCredentials('user', 'password')
 )
 
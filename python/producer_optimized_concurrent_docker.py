@@ -15,8 +15,8 @@ class OptimizedProducer:
     def setup_connection(self):
         """Create a single shared connection"""
         connection_params = pika.ConnectionParameters(
-            host='rabbitmq',
-            port=5672,
+            host=os.environ.get('RABBITMQ_HOST', 'rabbitmq'),
+            port=int(os.environ.get('RABBITMQ_PORT', 5672)),
             credentials=pika.PlainCredentials('user', 'password')
         )
         
@@ -95,8 +95,8 @@ class OptimizedProducer:
 def process_worker(worker_id, start_id, message_count):
     """Independent process worker with its own connection"""
     connection_params = pika.ConnectionParameters(
-        host='rabbitmq',
-        port=5672,
+        host=os.environ.get('RABBITMQ_HOST', 'rabbitmq'),
+        port=int(os.environ.get('RABBITMQ_PORT', 5672)),
         credentials=pika.PlainCredentials('user', 'password')
     )
     
@@ -165,8 +165,8 @@ def run_multiprocess_test(total_messages=50000, num_processes=4):
 def run_optimized_single_thread(message_count=50000):
     """Optimized single thread without any overhead"""
     connection_params = pika.ConnectionParameters(
-        host='rabbitmq',
-        port=5672,
+        host=os.environ.get('RABBITMQ_HOST', 'rabbitmq'),
+        port=int(os.environ.get('RABBITMQ_PORT', 5672)),
         credentials=pika.PlainCredentials('user', 'password')
     )
     
@@ -7,8 +7,8 @@ import os
 
 # Establish connection to RabbitMQ
 connection_params = pika.ConnectionParameters(
-    host='rabbitmq',
-    port=5672,
+    host=os.environ.get('RABBITMQ_HOST', 'rabbitmq'),
+    port=int(os.environ.get('RABBITMQ_PORT', 5672)),
     credentials=pika.PlainCredentials('user', 'password')
 )
 
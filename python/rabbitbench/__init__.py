@@ -0,0 +1,23 @@
+"""rabbitbench - unified RabbitMQ benchmark harness.
+
+Replaces the copy-pasted producer/consumer scripts with a single package
+where every test is a pluggable scenario. Run it with:
+
+    python -m rabbitbench run --scenario non_persistent --trials 3
+"""
+
+from .config import BenchConfig
+from .results import ScenarioResult, TrialResult
+from .runner import run_scenario
+from .scenarios import SCENARIOS, scenario
+
+__version__ = '0.1.0'
+
+__all__ = [
+    'BenchConfig',
+    'ScenarioResult',
+    'TrialResult',
+    'SCENARIOS',
+    'run_scenario',
+    'scenario',
+]
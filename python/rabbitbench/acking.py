@@ -0,0 +1,103 @@
+import collections
+import threading
+import time
+
+
+class AckBatcher:
+    """Acknowledge deliveries with ``basic_ack(multiple=True)`` in batches
+
+    A batch is flushed after ``every`` deliveries or once ``interval``
+    seconds have passed since the last flush, whichever comes first. Call
+    :meth:`tick` from the consume loop so a partial batch is still flushed
+    when deliveries stop. ``every`` is capped at the prefetch count because
+    the broker will not deliver more than that unacknowledged.
+    """
+
+    def __init__(self, channel, every: int = 1, interval: float = 0.0,
+                 prefetch_count: int = 0):
+        if prefetch_count:
+            every = min(every, prefetch_count)
+        self.channel = channel
+        self.every = max(every, 1)
+        self.interval = interval
+        self.pending = 0
+        self.last_tag = 0
+        self.acks_sent = 0
+        self._last_flush = time.monotonic()
+
+    def delivered(self, delivery_tag: int) -> None:
+        self.last_tag = delivery_tag
+        self.pending += 1
+        if self.pending >= self.every:
+            self.flush()
+        elif self.interval and time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def tick(self) -> None:
+        if self.pending and self.interval and \
+                time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.channel.basic_ack(delivery_tag=self.last_tag,
+                                   multiple=self.pending > 1)
+            self.acks_sent += 1
+            self.pending = 0
+        self._last_flush = time.monotonic()
+
+
+class OrderedAcker:
+    """Acknowledge deliveries completed out of order, lowest tags first
+
+    Work finishing on pool threads or processes completes deliveries in any
+    order, but ``basic_ack(multiple=True)`` acknowledges everything up to a
+    tag. Completed tags are held until every lower tag has completed too,
+    then the contiguous run is acked with one ``multiple=True`` ack.
+
+    Workers call :meth:`completed` from any thread. It queues the tag and,
+    when no drain is already pending, schedules one with
+    ``connection.add_callback_threadsafe``, so a burst of completions costs
+    one callback and one ack on the connection's thread.
+    """
+
+    def __init__(self, connection, channel, on_completed=None):
+        self.connection = connection
+        self.channel = channel
+        self.on_completed = on_completed
+        self.acked_to = 0           # every tag up to this one is acked
+        self.done = set()           # completed tags above acked_to
+        self.acks_sent = 0
+        self.max_held = 0           # most completed tags waiting on a gap
+        self._queue = collections.deque()
+        self._lock = threading.Lock()
+        self._scheduled = False
+
+    def completed(self, delivery_tag: int) -> None:
+        """Thread-safe: mark ``delivery_tag`` done and schedule an ack"""
+        self._queue.append(delivery_tag)
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.connection.add_callback_threadsafe(self.drain)
+
+    def drain(self) -> None:
+        """Connection thread: ack the contiguous run of completed tags"""
+        with self._lock:
+            self._scheduled = False
+        count = 0
+        while self._queue:
+            self.done.add(self._queue.popleft())
+            count += 1
+        start = self.acked_to
+        while self.acked_to + 1 in self.done:
+            self.acked_to += 1
+            self.done.remove(self.acked_to)
+        self.max_held = max(self.max_held, len(self.done))
+        if self.acked_to > start:
+            self.channel.basic_ack(delivery_tag=self.acked_to,
+                                   multiple=self.acked_to - start > 1)
+            self.acks_sent += 1
+        if count and self.on_completed is not None:
+            self.on_completed(count)
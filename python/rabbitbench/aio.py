@@ -0,0 +1,259 @@
+"""asyncio engine on pika's non-blocking ``AsyncioConnection``.
+
+pika's asynchronous API is callback based; :class:`AsyncSession` wraps the
+handful of calls the benchmarks need into awaitables so publish and consume
+loops can keep many operations in flight on one event loop instead of
+waiting for a socket round trip per message like ``BlockingConnection``.
+"""
+
+import asyncio
+import time
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from . import metrics
+from .acking import AckBatcher
+from .codec import codec_for
+from .config import BenchConfig
+from .confirms import ConfirmTracker
+from .connection import (connection_parameters, consume_arguments,
+                         queue_arguments, queue_durable)
+from .latency import LatencyRecorder
+from .payloads import message_factory
+
+
+class AsyncSession:
+    """One asyncio connection with one channel"""
+
+    def __init__(self, config: BenchConfig):
+        self.config = config
+        self.connection = None
+        self.channel = None
+        self._closed = None
+
+    async def open(self, quiet: bool = False) -> 'AsyncSession':
+        """Connect with the same retry policy as the blocking ``connect``"""
+        config = self.config
+        for attempt in range(1, config.connect_retries + 1):
+            try:
+                self.connection = await self._connect()
+                break
+            except pika.exceptions.AMQPConnectionError:
+                if attempt == config.connect_retries:
+                    raise ConnectionError(
+                        f'Failed to connect to RabbitMQ at {config.host}:'
+                        f'{config.port} after {config.connect_retries} attempts')
+                if not quiet:
+                    print(f'Connection attempt {attempt} failed. '
+                          f'Retrying in {config.retry_delay:g} seconds...')
+                await asyncio.sleep(config.retry_delay)
+
+        opened = asyncio.get_running_loop().create_future()
+        self.connection.channel(on_open_callback=opened.set_result)
+        self.channel = await opened
+        return self
+
+    def _connect(self) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+        self._closed = loop.create_future()
+
+        def on_open_error(connection, error):
+            if not isinstance(error, Exception):
+                error = pika.exceptions.AMQPConnectionError(error)
+            if not opened.done():
+                opened.set_exception(error)
+
+        def on_close(connection, reason):
+            if not self._closed.done():
+                self._closed.set_result(reason)
+
+        AsyncioConnection(
+            parameters=connection_parameters(self.config),
+            on_open_callback=opened.set_result,
+            on_open_error_callback=on_open_error,
+            on_close_callback=on_close,
+            custom_ioloop=loop,
+        )
+        return opened
+
+    async def close(self) -> None:
+        if self.connection is None:
+            return
+        if not (self.connection.is_closing or self.connection.is_closed):
+            self.connection.close()
+        await self._closed
+
+    async def __aenter__(self) -> 'AsyncSession':
+        return await self.open()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _call(self, method, *args, **kwargs) -> asyncio.Future:
+        """Invoke a pika channel method and await its ``callback``"""
+        done = asyncio.get_running_loop().create_future()
+        method(*args, callback=done.set_result, **kwargs)
+        return done
+
+    async def declare_queue(self, queue: str = None, passive: bool = False):
+        frame = await self._call(
+            self.channel.queue_declare, queue or self.config.queue,
+            passive=passive, durable=queue_durable(self.config),
+            arguments=None if passive else queue_arguments(self.config))
+        return frame.method
+
+    async def qos(self, prefetch_count: int) -> None:
+        await self._call(self.channel.basic_qos, prefetch_count=prefetch_count)
+
+    async def barrier(self) -> None:
+        """Round trip that completes once the broker has read every frame
+        sent on the channel before it"""
+        await self.declare_queue(passive=True)
+
+
+class AsyncPublisher:
+    """Publishes with up to ``window`` unconfirmed messages in flight
+
+    ``window`` defaults to the config's ``concurrency``. With a window of 0
+    the channel stays out of confirm mode and the
+    loop only yields to the event loop every ``batch_size`` messages so the
+    transport can drain.
+    """
+
+    def __init__(self, session: AsyncSession, window: int = None):
+        self.session = session
+        self.config = session.config
+        self.window = self.config.concurrency if window is None else window
+        self.tracker = ConfirmTracker(self.window)
+        self.messages = message_factory(self.config)
+        self._slots = None
+        self._drained = None
+
+    @property
+    def nacked(self) -> int:
+        return self.tracker.nacked
+
+    async def setup(self) -> None:
+        if self.window:
+            self._slots = asyncio.Semaphore(self.window)
+            self._drained = asyncio.Event()
+            self._drained.set()
+            await self.session._call(self.session.channel.confirm_delivery,
+                                     self._on_confirm)
+
+    def _on_confirm(self, frame) -> None:
+        method = frame.method
+        settled = self.tracker.confirm(
+            method.delivery_tag, method.multiple,
+            nack=isinstance(method, pika.spec.Basic.Nack))
+        for _ in range(settled):
+            self._slots.release()
+        if not self.tracker.outstanding:
+            self._drained.set()
+
+    async def publish(self, start_id: int, count: int) -> int:
+        channel = self.session.channel
+        body_for, properties_for = self.messages
+        routing_key = self.config.queue
+        yield_every = max(self.config.batch_size, 1)
+        live = metrics.active()
+
+        for n, i in enumerate(range(start_id, start_id + count), 1):
+            if self._slots is not None:
+                await self._slots.acquire()
+                self.tracker.record_publish()
+                self._drained.clear()
+            elif n % yield_every == 0:
+                await asyncio.sleep(0)
+
+            body = body_for(i)
+            channel.basic_publish(
+                exchange='',
+                routing_key=routing_key,
+                body=body,
+                properties=properties_for(),
+            )
+            if live is not None:
+                live.on_publish(len(body))
+
+        await self.wait_complete()
+        return count
+
+    async def wait_complete(self) -> None:
+        """Wait for outstanding confirms, or a barrier without confirms"""
+        if self._drained is not None:
+            await self._drained.wait()
+        else:
+            await self.session.barrier()
+
+
+class AsyncConsumer:
+    """Consumes with ``concurrency`` deliveries prefetched
+
+    Acks go out from the delivery callback, batched per ``ack_every``.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.config = session.config
+        self.decode = codec_for(self.config).decode
+        self.count = 0
+        self.target = 0
+        self.start_time = None
+        self.end_time = None
+        self.last_time = None
+        self.latency = LatencyRecorder(self.config) if self.config.latency else None
+        self.acks = None
+        self.live = metrics.active()
+        self._done = None
+
+    def _on_message(self, channel, method, properties, body) -> None:
+        if self.latency:
+            self.latency.record(properties)
+        self.decode(body)
+        if self.live is not None:
+            self.live.on_consume(len(body))
+        self.acks.delivered(method.delivery_tag)
+        self.count += 1
+        self.last_time = time.time()
+
+        if self.count == self.config.warmup:
+            self.start_time = self.last_time
+            if self.latency:
+                self.latency.start()
+        if self.count >= self.target and not self._done.done():
+            self.acks.flush()
+            self.end_time = self.last_time
+            self._done.set_result(None)
+
+    async def consume(self, count: int) -> int:
+        """Consume ``warmup + count`` messages; returns how many arrived"""
+        session = self.session
+        self.target = self.config.warmup + count
+        self._done = asyncio.get_running_loop().create_future()
+        if self.config.warmup == 0:
+            self.start_time = time.time()
+            if self.latency:
+                self.latency.start()
+
+        prefetch_count = self.config.concurrency or self.config.prefetch_count
+        self.acks = AckBatcher(session.channel, self.config.ack_every,
+                               self.config.ack_interval, prefetch_count)
+        await session.qos(prefetch_count)
+        consumer_tag = session.channel.basic_consume(
+            self.config.queue, self._on_message, auto_ack=False,
+            arguments=consume_arguments(self.config))
+
+        # Give up if nothing arrives for consume_timeout seconds
+        last_count = -1
+        while not self._done.done():
+            if self.count == last_count:
+                break
+            last_count = self.count
+            await asyncio.wait({self._done}, timeout=self.config.consume_timeout)
+
+        self.acks.flush()
+        await session._call(session.channel.basic_cancel, consumer_tag)
+        return self.count
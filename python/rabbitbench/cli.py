@@ -0,0 +1,426 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import time
+
+from . import compare, sweep
+from .config import BenchConfig, coerce, field_names
+from .impairment import ImpairmentProxy
+from .metrics import MetricsAggregator
+from .results import format_table, print_summary, read_results, write_results
+from .runner import run_scenario
+from .runtime import capabilities, format_capabilities
+from .scenarios import SCENARIOS
+from .stubbroker import StubBroker, start_broker_process
+
+
+def parse_set_options(pairs) -> dict:
+    """Turn repeated ``--set key=value`` options into config overrides"""
+    known = field_names()
+    overrides = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        key = key.strip().replace('-', '_')
+        if not sep or key not in known:
+            raise SystemExit(f'Invalid --set option {pair!r}; '
+                             f'expected key=value with key one of: '
+                             f'{", ".join(sorted(known))}')
+        overrides[key] = coerce(key, value)
+    return overrides
+
+
+def parse_vary_options(items) -> list:
+    """Expand ``--vary key=v1,v2`` options into a list of override dicts
+
+    Several ``--vary`` options combine as a cross product.
+    """
+    known = field_names()
+    variants = [{}]
+    for item in items or []:
+        key, sep, values = item.partition('=')
+        key = key.strip().replace('-', '_')
+        if not sep or key not in known:
+            raise SystemExit(f'Invalid --vary option {item!r}; '
+                             f'expected key=value1,value2,...')
+        variants = [dict(v, **{key: coerce(key, value.strip())})
+                    for v in variants for value in values.split(',')]
+    return variants
+
+
+def parse_grid_options(items) -> dict:
+    """``--grid key=v1,v2`` options as ``{key: [values]}`` for a sweep"""
+    space = {}
+    for item in items:
+        key = item.partition('=')[0].strip().replace('-', '_')
+        space[key] = [variant[key] for variant in parse_vary_options([item])]
+    return space
+
+
+def variant_label(variant: dict) -> str:
+    return ','.join(f'{key}={value}' for key, value in variant.items())
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options shared by every command that runs scenarios"""
+    parser.add_argument('--host', help='Broker host (env RABBITMQ_HOST)')
+    parser.add_argument('--port', type=int, help='Broker port (env RABBITMQ_PORT)')
+    parser.add_argument('--messages', dest='message_count', type=int,
+                        help='Timed messages per trial')
+    parser.add_argument('--warmup', type=int,
+                        help='Untimed messages sent before each trial')
+    parser.add_argument('--trials', type=int, help='Repetitions per scenario')
+    parser.add_argument('--queue', help='Override the scenario queue name')
+    parser.add_argument('--processes', type=int,
+                        help='Worker processes for multiprocess scenarios')
+    parser.add_argument('--progress-every', type=int,
+                        help='Print the running rate every N messages')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve live Prometheus metrics on this port')
+    parser.add_argument('--metrics-host',
+                        help='Address to serve metrics on (default '
+                             '127.0.0.1; 0.0.0.0 for every interface)')
+    parser.add_argument('--stats-file',
+                        help='Append a JSON line of live stats every '
+                             'stats_interval seconds')
+    parser.add_argument('--profile', metavar='DIR',
+                        help='Sample every worker\'s stacks and write '
+                             'collapsed stacks per scenario to DIR')
+    parser.add_argument('--memory', action='store_true', default=None,
+                        help='Sample RSS/USS/PSS of every worker process')
+    parser.add_argument('--tracemalloc', action='store_true', default=None,
+                        help='With --memory, also trace Python allocations')
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE',
+                        help='Set any BenchConfig field, may be repeated')
+
+
+def add_environment_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options for what a run talks to, not what it measures"""
+    parser.add_argument('--stub-broker', action='store_true',
+                        help='Run against a local in-memory stand-in broker '
+                             'instead of RabbitMQ')
+
+
+def config_overrides(args: argparse.Namespace) -> dict:
+    overrides = {
+        'host': args.host,
+        'port': args.port,
+        'message_count': args.message_count,
+        'warmup': args.warmup,
+        'trials': args.trials,
+        'queue': args.queue,
+        'processes': args.processes,
+        'progress_every': args.progress_every,
+        'metrics_port': args.metrics_port,
+        'metrics_host': args.metrics_host,
+        'stats_file': args.stats_file,
+        'profile_dir': args.profile,
+        'memory': args.memory or args.tracemalloc,
+        'tracemalloc': args.tracemalloc,
+    }
+    overrides.update(parse_set_options(args.set))
+    return overrides
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='rabbitbench', description='RabbitMQ benchmark harness')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help='List available scenarios')
+
+    run = subparsers.add_parser('run', help='Run one or more scenarios')
+    run.add_argument('--scenario', action='append', required=True,
+                     help='Scenario name, may be repeated')
+    run.add_argument('--output', '-o',
+                     help='Write results to this .json or .csv file')
+    run.add_argument('--vary', action='append', metavar='KEY=V1,V2',
+                     help='Run each scenario once per value, may be repeated')
+    run.add_argument('--pause', type=float, default=0.0,
+                     help='Seconds to sleep between trials and scenarios')
+    run.add_argument('--table', metavar='METRIC,...',
+                     help='Print these extra metrics side by side, e.g. '
+                          'confirm_latency_ms.p99 (defaults to the '
+                          'scenario\'s own choice when variants ran)')
+    add_environment_arguments(run)
+    add_config_arguments(run)
+
+    sweep = subparsers.add_parser(
+        'sweep', help='Run a scenario over a parameter grid and find the best point')
+    sweep.add_argument('--scenario', required=True, help='Scenario name')
+    sweep.add_argument('--grid', action='append', metavar='KEY=V1,V2',
+                       help='Values to sweep for one field, may be repeated')
+    sweep.add_argument('--space',
+                       help='JSON file mapping field names to value lists')
+    sweep.add_argument('--sample', type=int, default=0,
+                       help='Run only this many randomly chosen grid points')
+    sweep.add_argument('--seed', type=int, default=0,
+                       help='Random seed for --sample')
+    sweep.add_argument('--cache-dir', default='.rabbitbench-cache',
+                       help='Where finished points are kept for resuming')
+    sweep.add_argument('--max-p99', type=float,
+                       help='Only recommend points with p99 latency (ms) '
+                            'at or below this')
+    sweep.add_argument('--plot', metavar='PREFIX',
+                       help='Write surface heatmaps as PREFIX-<metric>.png '
+                            '(needs matplotlib)')
+    sweep.add_argument('--output', '-o', help='Write the sweep report as JSON')
+    sweep.add_argument('--pause', type=float, default=0.0,
+                       help='Seconds to sleep between trials')
+    add_environment_arguments(sweep)
+    add_config_arguments(sweep)
+
+    diff = subparsers.add_parser(
+        'compare', help='Compare two JSON result files and flag regressions')
+    diff.add_argument('baseline', help='Results from before the change')
+    diff.add_argument('candidate', help='Results from after the change')
+    diff.add_argument('--threshold', type=float, default=5.0,
+                      help='Smallest rate change in percent worth reporting')
+    diff.add_argument('--confidence', type=float, default=0.95,
+                      help='Confidence level for intervals and the t-test')
+    diff.add_argument('--output', '-o', help='Write the comparison as JSON')
+
+    broker = subparsers.add_parser(
+        'broker', help='Serve the in-memory stand-in broker')
+    broker.add_argument('--host', default='127.0.0.1', help='Address to bind')
+    broker.add_argument('--port', type=int, default=5673, help='Port to bind')
+
+    proxy = subparsers.add_parser(
+        'proxy', help='Forward to a broker with added latency and bandwidth limits')
+    proxy.add_argument('--target', default='rabbitmq:5672', metavar='HOST:PORT',
+                       help='Broker to forward to')
+    proxy.add_argument('--host', default='127.0.0.1', help='Address to bind')
+    proxy.add_argument('--port', type=int, default=5674, help='Port to bind')
+    proxy.add_argument('--rtt', type=float, default=0.0,
+                       help='Seconds of round-trip time to add')
+    proxy.add_argument('--jitter', type=float, default=0.0,
+                       help='Seconds of +/- jitter on each one-way delay')
+    proxy.add_argument('--mbps', type=float, default=0.0,
+                       help='Bandwidth cap per direction in Mbit/s')
+    proxy.add_argument('--chunk', type=int, default=0,
+                       help='Largest segment forwarded, in bytes')
+
+    return parser
+
+
+def cmd_list(args) -> int:
+    width = max(len(name) for name in SCENARIOS)
+    kind_width = max(len(s.kind) for s in SCENARIOS.values())
+    for name in sorted(SCENARIOS):
+        definition = SCENARIOS[name]
+        print(f'{name:<{width}}  {definition.kind:<{kind_width}}  '
+              f'{definition.description}')
+    print(f'\nRuntime: {format_capabilities(capabilities())}')
+    return 0
+
+
+@contextlib.contextmanager
+def run_environment(args, overrides: dict):
+    """Start the stand-in broker and metrics aggregator the options ask for
+
+    Updates ``overrides`` to point at them and yields the aggregator, or
+    ``None`` when live metrics are off.
+    """
+    broker = None
+    if args.stub_broker:
+        broker, port = start_broker_process()
+        overrides.update(host='127.0.0.1', port=port)
+        print(f'Stand-in broker listening on 127.0.0.1:{port}')
+    aggregator = None
+    if args.metrics_port or args.stats_file:
+        interval = overrides.get('stats_interval') or BenchConfig.stats_interval
+        aggregator = MetricsAggregator(
+            args.metrics_port or 0, args.stats_file or '', interval,
+            http_host=overrides.get('metrics_host') or BenchConfig.metrics_host).start()
+        overrides['metrics_addr'] = aggregator.address
+        if args.metrics_port:
+            print(f'Live metrics on {aggregator.url}')
+    try:
+        yield aggregator
+    finally:
+        if aggregator is not None:
+            aggregator.stop()
+        if broker is not None:
+            broker.terminate()
+            broker.join()
+
+
+MEMORY_COLUMNS = ['memory.peak_pss_mib', 'memory.msgs_per_sec_per_gb']
+
+
+def cmd_run(args) -> int:
+    overrides = config_overrides(args)
+    for name in args.scenario:
+        if name not in SCENARIOS:
+            raise SystemExit(f'Unknown scenario {name!r}; '
+                             f'run "python -m rabbitbench list"')
+
+    with run_environment(args, overrides) as aggregator:
+        results = run_scenarios(args, overrides, aggregator)
+
+    print()
+    for result in results:
+        print_summary(result)
+    columns = args.table.split(',') if args.table else []
+    if not columns and len(results) > 1:
+        for name in args.scenario:
+            columns += [c for c in SCENARIOS[name].table if c not in columns]
+        if any('memory' in t.extra for r in results for t in r.trials):
+            columns += MEMORY_COLUMNS
+    if columns:
+        print()
+        print(format_table(results, columns))
+
+    if args.output:
+        write_results(results, args.output)
+        print(f'\nResults written to {args.output}')
+    return 0
+
+
+def run_scenarios(args, overrides: dict, aggregator=None) -> list:
+    results = []
+    for name in args.scenario:
+        for variant in parse_vary_options(args.vary):
+            if results and args.pause:
+                time.sleep(args.pause)
+            if aggregator is not None:
+                aggregator.label = name + (f'[{variant_label(variant)}]'
+                                           if variant else '')
+            results.append(run_scenario(name, overrides=dict(overrides, **variant),
+                                        trial_pause=args.pause,
+                                        variant=variant_label(variant)))
+    return results
+
+
+def cmd_sweep(args) -> int:
+    if args.scenario not in SCENARIOS:
+        raise SystemExit(f'Unknown scenario {args.scenario!r}; '
+                         f'run "python -m rabbitbench list"')
+    items = list(args.grid or [])
+    if args.space:
+        with open(args.space) as f:
+            items += [f'{key}={",".join(str(v) for v in values)}'
+                      for key, values in json.load(f).items()]
+    space = parse_grid_options(items)
+    if not space:
+        raise SystemExit('Nothing to sweep; give --grid KEY=V1,V2 or --space FILE')
+
+    points = sweep.sample_points(sweep.grid_points(space), args.sample, args.seed)
+    overrides = config_overrides(args)
+    if args.trials is None:
+        overrides['trials'] = 3
+    cache = sweep.SweepCache(args.cache_dir)
+
+    with run_environment(args, overrides) as aggregator:
+        if aggregator is not None:
+            aggregator.label = f'sweep:{args.scenario}'
+        done = sweep.run_sweep(args.scenario, points, overrides, cache,
+                               trial_pause=args.pause, label=variant_label)
+
+    rows = [sweep.point_stats(point, result) for point, result, _ in done]
+    report = sweep.analyse(rows, args.max_p99)
+
+    print()
+    width = max(len(row['label']) for row in rows)
+    for row in sorted(rows, key=lambda row: -row['rate']):
+        p99 = '' if row['p99_ms'] is None else f'  p99 {row["p99_ms"]:.2f} ms'
+        print(f'{row["label"]:<{width}}  {row["rate"]:>10.0f} msgs/sec '
+              f'(stdev {row["stdev"]:.0f}){p99}')
+    print()
+    for key, effect in report['effects'].items():
+        means = ', '.join(f'{value}: {mean:.0f}'
+                          for value, mean in effect['means'].items())
+        print(f'{key}: spread {effect["spread"]:.0f} msgs/sec ({means})')
+    for table in report['surfaces']:
+        print()
+        print(sweep.format_surface(table))
+    if args.plot:
+        for path in sweep.plot_surfaces(report['surfaces'], args.plot):
+            print(f'Plot written to {path}')
+
+    best = report['recommended']
+    print()
+    if best is None:
+        print(f'No point met p99 <= {args.max_p99} ms')
+    else:
+        print(f'Recommended: {best["label"]} ({best["rate"]:.0f} msgs/sec)')
+
+    if args.output:
+        report.update(scenario=args.scenario, space=space, points=rows,
+                      results=[result.as_dict() for _, result, _ in done])
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+            f.write('\n')
+        print(f'Report written to {args.output}')
+    return 0
+
+
+def cmd_compare(args) -> int:
+    """Exits 1 when any scenario regressed, so CI can gate on it"""
+    if not 0 < args.confidence < 1:
+        raise SystemExit('--confidence must be between 0 and 1')
+    try:
+        baseline = read_results(args.baseline)
+        candidate = read_results(args.candidate)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    report = compare.compare_results(baseline, candidate,
+                                     threshold=args.threshold / 100,
+                                     confidence=args.confidence)
+    if not report['rows']:
+        raise SystemExit('No scenario appears in both result files')
+    compare.print_comparison(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+            f.write('\n')
+        print(f'Comparison written to {args.output}')
+    return 1 if report['regressions'] else 0
+
+
+def cmd_broker(args) -> int:
+    broker = StubBroker(args.host, args.port)
+
+    async def serve():
+        await broker.open()
+        print(f'Stand-in broker listening on {broker.host}:{broker.port}')
+        await broker.serve_forever()
+
+    asyncio.run(serve())
+    return 0
+
+
+def cmd_proxy(args) -> int:
+    host, _, port = args.target.rpartition(':')
+    proxy = ImpairmentProxy(host, int(port), args.host, args.port, rtt=args.rtt,
+                            jitter=args.jitter, mbps=args.mbps, chunk=args.chunk)
+
+    async def serve():
+        await proxy.open()
+        print(f'Impairment proxy on {proxy.host}:{proxy.port} -> {args.target}')
+        await proxy.serve_forever()
+
+    asyncio.run(serve())
+    return 0
+
+
+COMMANDS = {
+    'list': cmd_list,
+    'run': cmd_run,
+    'sweep': cmd_sweep,
+    'compare': cmd_compare,
+    'broker': cmd_broker,
+    'proxy': cmd_proxy,
+}
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return COMMANDS[args.command](args)
+    except ConnectionError as e:
+        print(f'Error: {e}')
+        return 1
+    except KeyboardInterrupt:
+        print('\nInterrupted')
+        return 130
@@ -0,0 +1,201 @@
+"""Payload codecs and optional compression.
+
+Every codec turns the benchmark message dict into bytes and back. Optional
+libraries (orjson, msgpack, lz4) are imported lazily; asking for a codec
+whose library is missing raises a ``ValueError`` naming the package to
+install rather than failing at import time.
+"""
+
+import json
+import random
+import string
+import struct
+import zlib
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+from .config import BenchConfig
+
+
+def make_payload(size: int, seed: int = 0) -> bytes:
+    """Deterministic printable filler, roughly as compressible as text"""
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + ' ' * 8
+    return ''.join(rng.choices(alphabet, k=size)).encode('ascii')
+
+
+class Codec:
+    """Base class: ``encode`` a message dict to bytes and ``decode`` it back"""
+
+    name = ''
+    text = True  # payload field is str (True) or bytes (False)
+
+    def prepare_payload(self, payload: bytes):
+        return payload.decode('ascii') if self.text else payload
+
+    def encode(self, message: dict) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, body) -> dict:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    name = 'json'
+
+    def encode(self, message):
+        return json.dumps(message).encode()
+
+    def decode(self, body):
+        # json only reads str, bytes and bytearray, so an envelope record
+        # view is copied once here; the orjson codec decodes views in place
+        return json.loads(bytes(body) if isinstance(body, memoryview) else body)
+
+
+class OrjsonCodec(Codec):
+    name = 'orjson'
+
+    def encode(self, message):
+        return orjson.dumps(message)
+
+    def decode(self, body):
+        return orjson.loads(body)
+
+
+class MsgpackCodec(Codec):
+    name = 'msgpack'
+    text = False
+
+    def encode(self, message):
+        return msgpack.packb(message)
+
+    def decode(self, body):
+        return msgpack.unpackb(body)
+
+
+class StructCodec(Codec):
+    """Fixed binary header then the variable-length fields back to back
+
+    Layout: id (u64), content length (u16), timestamp length (u16), then
+    content, timestamp and payload bytes.
+    """
+
+    name = 'struct'
+    text = False
+    header = struct.Struct('>QHH')
+
+    def encode(self, message):
+        content = message['content'].encode()
+        timestamp = message['timestamp'].encode()
+        return b''.join((
+            self.header.pack(message['id'], len(content), len(timestamp)),
+            content, timestamp, message.get('payload', b''),
+        ))
+
+    def decode(self, body):
+        view = memoryview(body)
+        message_id, content_len, timestamp_len = self.header.unpack_from(view)
+        at = self.header.size
+        content = bytes(view[at:at + content_len]).decode()
+        at += content_len
+        timestamp = bytes(view[at:at + timestamp_len]).decode()
+        at += timestamp_len
+        return {'id': message_id, 'content': content, 'timestamp': timestamp,
+                'payload': view[at:]}
+
+
+class RawCodec(Codec):
+    """Just the message id (u64) and the payload; no field encoding at all"""
+
+    name = 'raw'
+    text = False
+    header = struct.Struct('>Q')
+
+    def encode(self, message):
+        return self.header.pack(message['id']) + message.get('payload', b'')
+
+    def decode(self, body):
+        view = memoryview(body)
+        return {'id': self.header.unpack_from(view)[0],
+                'payload': view[self.header.size:]}
+
+
+class Compressed(Codec):
+    """Wraps another codec, compressing its output"""
+
+    def __init__(self, inner: Codec, compression: str, level: int = None):
+        self.inner = inner
+        self.text = inner.text
+        self.name = f'{inner.name}+{compression}'
+        if compression == 'zlib':
+            level = 1 if level is None else level
+            self._compress = lambda data: zlib.compress(data, level)
+            self._decompress = zlib.decompress
+        elif compression == 'lz4':
+            require(lz4_frame, 'lz4')
+            self._compress = lz4_frame.compress
+            self._decompress = lz4_frame.decompress
+        else:
+            raise ValueError(f'Unknown compression {compression!r}; '
+                             f'expected one of: {", ".join(COMPRESSIONS)}')
+
+    def encode(self, message):
+        return self._compress(self.inner.encode(message))
+
+    def decode(self, body):
+        return self.inner.decode(self._decompress(body))
+
+
+CODECS = {
+    'json': (JsonCodec, None),
+    'orjson': (OrjsonCodec, 'orjson'),
+    'msgpack': (MsgpackCodec, 'msgpack'),
+    'struct': (StructCodec, None),
+    'raw': (RawCodec, None),
+}
+
+COMPRESSIONS = ('none', 'zlib', 'lz4')
+
+
+def require(module, package: str) -> None:
+    if module is None:
+        raise ValueError(f'This codec needs the optional {package!r} package; '
+                         f'pip install {package}')
+
+
+def available_codecs() -> list:
+    """Codec names whose optional dependencies are importable"""
+    modules = {'orjson': orjson, 'msgpack': msgpack}
+    return [name for name, (_, package) in CODECS.items()
+            if package is None or modules[package] is not None]
+
+
+def get_codec(name: str = 'json', compression: str = 'none') -> Codec:
+    try:
+        cls, package = CODECS[name]
+    except KeyError:
+        raise ValueError(f'Unknown codec {name!r}; '
+                         f'expected one of: {", ".join(CODECS)}') from None
+    if package:
+        require({'orjson': orjson, 'msgpack': msgpack}[package], package)
+    codec = cls()
+    if compression and compression != 'none':
+        codec = Compressed(codec, compression)
+    return codec
+
+
+def codec_for(config: BenchConfig) -> Codec:
+    return get_codec(config.codec, config.compression)
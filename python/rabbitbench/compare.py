@@ -0,0 +1,123 @@
+"""Compare two result files and flag regressions.
+
+Each scenario (and ``--vary`` variant) present in both files is compared
+on its per-trial rates with Welch's t-test. A change is only called a
+regression or an improvement when it is both statistically significant
+at the chosen confidence and at least ``threshold`` of the baseline mean,
+so a real but negligible shift is not reported as news. When the
+difference is not significant but its confidence interval still reaches
+past the threshold, the result is ``inconclusive``: the trials are too
+noisy to rule out a change of that size, and more of them are needed.
+"""
+
+from typing import List
+
+from .results import ScenarioResult
+from .stats import describe, welch
+from .sweep import EXCLUDED_FROM_KEY
+
+
+def config_changes(baseline: dict, candidate: dict) -> dict:
+    """``{field: (baseline, candidate)}`` for config fields that differ"""
+    return {key: (baseline.get(key), candidate.get(key))
+            for key in sorted(set(baseline) | set(candidate))
+            if key not in EXCLUDED_FROM_KEY
+            and baseline.get(key) != candidate.get(key)}
+
+
+def verdict(change: float, test: dict, threshold: float,
+            confidence: float, mean: float) -> str:
+    if not test:
+        return 'insufficient trials'
+    if test['p_value'] < 1 - confidence:
+        if change <= -threshold:
+            return 'regression'
+        if change >= threshold:
+            return 'improvement'
+        return 'minor change'
+    if mean and (test['ci_low'] / mean <= -threshold
+                 or test['ci_high'] / mean >= threshold):
+        return 'inconclusive'
+    return 'no change'
+
+
+def compare_one(baseline: ScenarioResult, candidate: ScenarioResult,
+                threshold: float = 0.05, confidence: float = 0.95) -> dict:
+    before = [t.rate for t in baseline.trials]
+    after = [t.rate for t in candidate.trials]
+    a, b = describe(before, confidence), describe(after, confidence)
+    test = welch(before, after, confidence)
+    mean = a.get('mean', 0.0)
+    change = (b.get('mean', 0.0) - mean) / mean if mean else 0.0
+    return {
+        'label': baseline.label,
+        'baseline': a,
+        'candidate': b,
+        'change': change,
+        'test': test,
+        'verdict': verdict(change, test, threshold, confidence, mean),
+        'config_changes': config_changes(baseline.config, candidate.config),
+    }
+
+
+def compare_results(baseline: List[ScenarioResult],
+                    candidate: List[ScenarioResult], threshold: float = 0.05,
+                    confidence: float = 0.95) -> dict:
+    """Compare every label found in both lists"""
+    after = {result.label: result for result in candidate}
+    before = {result.label: result for result in baseline}
+    rows = [compare_one(result, after[label], threshold, confidence)
+            for label, result in before.items() if label in after]
+    environment = {}
+    if baseline and candidate:
+        old, new = baseline[0].environment, candidate[0].environment
+        environment = {key: (old.get(key), new.get(key))
+                       for key in sorted(set(old) | set(new))
+                       if old.get(key) != new.get(key)}
+    return {
+        'threshold': threshold,
+        'confidence': confidence,
+        'rows': rows,
+        'only_baseline': [label for label in before if label not in after],
+        'only_candidate': [label for label in after if label not in before],
+        'environment_changes': environment,
+        'regressions': [row['label'] for row in rows
+                        if row['verdict'] == 'regression'],
+    }
+
+
+def format_row(row: dict) -> str:
+    a, b = row['baseline'], row['candidate']
+    test = row['test']
+    if 'mean' not in a or 'mean' not in b:
+        # describe() gives only a count when a side has no trials
+        line = f'{row["label"]}: insufficient trials'
+    else:
+        line = (f'{row["label"]}: {a["mean"]:.0f} -> {b["mean"]:.0f} msgs/sec '
+                f'({row["change"] * 100:+.1f}%)')
+        if test:
+            pct = a['confidence'] * 100
+            line += (f', {pct:g}% CI of difference {test["ci_low"]:+.0f} to '
+                     f'{test["ci_high"]:+.0f}, p={test["p_value"]:.3g}')
+        line += f'  [{row["verdict"]}]'
+    for key, (old, new) in row['config_changes'].items():
+        line += f'\n    {key}: {old!r} -> {new!r}'
+    return line
+
+
+def print_comparison(report: dict) -> None:
+    for key, (old, new) in report['environment_changes'].items():
+        print(f'environment {key}: {old} -> {new}')
+    for row in report['rows']:
+        print(format_row(row))
+    for label in report['only_baseline']:
+        print(f'{label}: only in baseline')
+    for label in report['only_candidate']:
+        print(f'{label}: only in candidate')
+    inconclusive = [row['label'] for row in report['rows']
+                    if row['verdict'] in ('inconclusive', 'insufficient trials')]
+    if inconclusive:
+        print(f'\nRun more trials to settle: {", ".join(inconclusive)}')
+    if report['regressions']:
+        print(f'\nRegressions beyond {report["threshold"] * 100:g}%: '
+              f'{", ".join(report["regressions"])}')
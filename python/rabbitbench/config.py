@@ -0,0 +1,136 @@
+import dataclasses
+import os
+from dataclasses import dataclass
+
+
+@dataclass
+class BenchConfig:
+    """Everything a scenario needs to know about a benchmark run.
+
+    Connection defaults come from the environment so the same command works
+    inside the Docker network (``rabbitmq:5672``) and from the host
+    (``RABBITMQ_HOST=localhost RABBITMQ_PORT=5673``).
+    """
+
+    host: str = dataclasses.field(
+        default_factory=lambda: os.environ.get('RABBITMQ_HOST', 'rabbitmq'))
+    port: int = dataclasses.field(
+        default_factory=lambda: int(os.environ.get('RABBITMQ_PORT', '5672')))
+    username: str = dataclasses.field(
+        default_factory=lambda: os.environ.get('RABBITMQ_USER', 'user'))
+    password: str = dataclasses.field(
+        default_factory=lambda: os.environ.get('RABBITMQ_PASSWORD', 'password'))
+    virtual_host: str = '/'
+    connect_retries: int = 5
+    retry_delay: float = 5.0
+    reconnect_initial: float = 0.1  # recovering sessions: first backoff delay,
+    reconnect_max: float = 5.0      # ...doubling up to this
+    reconnect_timeout: float = 60.0  # ...giving up after an outage this long
+    reconnect_buffer: int = 100000  # publishes held locally while disconnected
+    net_rtt: float = 0.0           # impairment proxy: seconds of round trip added
+    net_jitter: float = 0.0        # ...+/- seconds on each one-way delay
+    net_mbps: float = 0.0          # ...bandwidth cap per direction, 0 for none
+    net_chunk: int = 0             # ...max bytes per forwarded segment, 0 for none
+
+    # Workload
+    queue: str = 'bench_queue'
+    durable: bool = False
+    queue_type: str = 'classic'    # classic, lazy, quorum or stream
+    max_length: int = 0            # x-max-length, 0 for unlimited
+    max_length_bytes: int = 0
+    overflow: str = ''             # drop-head, reject-publish or reject-publish-dlx
+    message_ttl: int = 0           # x-message-ttl in milliseconds
+    max_age: str = ''              # streams: x-max-age, e.g. 1h or 7D
+    persistent: bool = False
+    message_count: int = 5000
+    warmup: int = 0
+    trials: int = 1
+    sleep_time: float = 0.0
+    rate: float = 0.0              # msgs/sec, 0 for unlimited
+    rate_profile: str = ''         # e.g. ramp:1000:20000:60, see ratecontrol
+    rate_tick: float = 0.01
+    batch_size: int = 1000
+    envelope_size: int = 100       # records packed into one AMQP message
+    envelope_bytes: int = 0        # ...or flush at this many bytes, 0 for no limit
+    envelope_linger: float = 0.0   # ...or once the oldest record waited this long
+    envelope_format: str = 'length'  # length (u32-prefixed records) or msgpack
+    processes: int = 4
+    worker_mode: str = 'process'   # parallel_*: thread, process or subinterpreter
+    producers: int = 1
+    consumers: int = 1
+    shards: int = 1
+    connections: int = 1
+    channels: int = 1              # per connection
+    channel_mode: str = 'round_robin'  # round_robin or thread (one per channel)
+    generators: int = 1            # pipeline: processes feeding the ring buffers
+    ring_slots: int = 4096
+    slot_size: int = 0             # bytes per ring slot, 0 to size from the message
+    shard_mode: str = 'queue'      # queue, direct or consistent-hash
+    prefetch_count: int = 100
+    ack_every: int = 1             # ack with multiple=True every N deliveries
+    ack_interval: float = 0.0      # ...or after this many seconds
+    concurrency: int = 256
+    confirm_mode: str = 'window'   # none, sync or window
+    confirm_window: int = 256
+    consume_timeout: float = 10.0
+    restarts: int = 1              # broker_restart: restarts spread over the run
+    restart_downtime: float = 2.0  # ...seconds the stand-in broker stays down
+    restart_command: str = ''      # ...or restart a real broker, e.g. docker restart rabbitmq
+    processing: str = 'inline'     # consumer work: inline, thread or process pool
+    pool_workers: int = 4
+    work: str = 'cpu'              # simulated work per message: cpu or sleep
+    work_time: float = 0.0         # seconds of simulated work per message
+    preencode: bool = False
+    pool_size: int = 1024
+    codec: str = 'json'            # json, orjson, msgpack, struct or raw
+    compression: str = 'none'      # none, zlib or lz4
+    payload_size: int = 0
+    latency: bool = False          # stamp send time, record end-to-end latency
+    latency_clock: str = 'monotonic'  # monotonic (same host) or wall
+    stats_interval: float = 1.0
+
+    # Reporting
+    progress_every: int = 0
+    metrics_port: int = 0          # serve live Prometheus metrics, 0 for off
+    metrics_host: str = '127.0.0.1'  # address to serve them on
+    stats_file: str = ''           # append a JSON line every stats_interval
+    metrics_addr: str = ''         # host:port of the aggregator, set by the CLI
+    profile_dir: str = ''          # write sampled stacks here, '' for off
+    profile_interval: float = 0.005
+    memory: bool = False           # sample RSS/USS/PSS of every process
+    memory_interval: float = 0.1
+    tracemalloc: bool = False      # ...and trace Python allocations (slow)
+    memory_dir: str = ''           # where processes leave reports, set by the runner
+
+    def replace(self, **changes) -> 'BenchConfig':
+        """Return a copy with ``changes`` applied, ignoring ``None`` values"""
+        changes = {k: v for k, v in changes.items() if v is not None}
+        return dataclasses.replace(self, **changes)
+
+    def as_dict(self, include_secrets: bool = False) -> dict:
+        """Plain dict of the config for result files"""
+        data = dataclasses.asdict(self)
+        if not include_secrets:
+            data.pop('password', None)
+        return data
+
+    @property
+    def delivery_mode(self) -> int:
+        return 2 if self.persistent else 1
+
+
+def field_names() -> set:
+    """Names of every configurable field, used to validate overrides"""
+    return {f.name for f in dataclasses.fields(BenchConfig)}
+
+
+def coerce(name: str, value: str):
+    """Convert a ``key=value`` string from the CLI to the field's type"""
+    default = getattr(BenchConfig(), name)
+    if isinstance(default, bool):
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+
+from . import metrics
+from .stats import percentiles
+
+
+class ConfirmTracker:
+    """Bookkeeping for publisher confirms with a bounded in-flight window
+
+    Delivery tags on a confirm-mode channel count up from 1 in publish order.
+    The broker may acknowledge a single tag or, with ``multiple=True``, every
+    outstanding tag up to and including it; nacks follow the same rules.
+    Each confirmed publish contributes its publish-to-confirm latency.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.pending = OrderedDict()
+        self.next_tag = 1
+        self.acked = 0
+        self.nacked = 0
+        self.latencies_ns = []
+
+    @property
+    def outstanding(self) -> int:
+        return len(self.pending)
+
+    @property
+    def full(self) -> bool:
+        return self.window > 0 and len(self.pending) >= self.window
+
+    def record_publish(self) -> int:
+        """Register the next publish and return its delivery tag"""
+        tag = self.next_tag
+        self.pending[tag] = time.perf_counter_ns()
+        self.next_tag += 1
+        return tag
+
+    def confirm(self, delivery_tag: int, multiple: bool = False,
+                nack: bool = False) -> int:
+        """Settle one tag, or every tag up to it; returns how many settled"""
+        if multiple:
+            tags = []
+            for tag in self.pending:
+                if tag > delivery_tag:
+                    break
+                tags.append(tag)
+        elif delivery_tag in self.pending:
+            tags = [delivery_tag]
+        else:
+            tags = []
+
+        now = time.perf_counter_ns()
+        for tag in tags:
+            self.latencies_ns.append(now - self.pending.pop(tag))
+
+        if nack:
+            self.nacked += len(tags)
+        else:
+            self.acked += len(tags)
+        live = metrics.active()
+        if live is not None:
+            live.on_confirm(len(tags), nack)
+        return len(tags)
+
+    def reset_stats(self) -> None:
+        """Drop counters and latencies gathered so far, e.g. after warmup"""
+        self.acked = 0
+        self.nacked = 0
+        self.latencies_ns = []
+
+    def latency_summary(self) -> dict:
+        """Confirm latency percentiles in milliseconds"""
+        summary = percentiles(ns / 1e6 for ns in self.latencies_ns)
+        return {k: v if k == 'count' else round(v, 4) for k, v in summary.items()}
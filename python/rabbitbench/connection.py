@@ -0,0 +1,84 @@
+import time
+
+import pika
+
+from .config import BenchConfig
+
+
+def connection_parameters(config: BenchConfig) -> pika.ConnectionParameters:
+    """Build pika connection parameters from the benchmark config"""
+    return pika.ConnectionParameters(
+        host=config.host,
+        port=config.port,
+        virtual_host=config.virtual_host,
+        credentials=pika.PlainCredentials(config.username, config.password),
+    )
+
+
+def connect(config: BenchConfig, quiet: bool = False) -> pika.BlockingConnection:
+    """Establish a blocking connection, retrying while the broker starts up"""
+    params = connection_parameters(config)
+    for attempt in range(1, config.connect_retries + 1):
+        try:
+            return pika.BlockingConnection(params)
+        except pika.exceptions.AMQPConnectionError:
+            if attempt == config.connect_retries:
+                break
+            if not quiet:
+                print(f'Connection attempt {attempt} failed. '
+                      f'Retrying in {config.retry_delay:g} seconds...')
+            time.sleep(config.retry_delay)
+
+    raise ConnectionError(
+        f'Failed to connect to RabbitMQ at {config.host}:{config.port} '
+        f'after {config.connect_retries} attempts')
+
+
+QUEUE_TYPES = ('classic', 'lazy', 'quorum', 'stream')
+
+
+def queue_arguments(config: BenchConfig) -> dict:
+    """``x-`` declare arguments for the config's queue type and limits"""
+    if config.queue_type not in QUEUE_TYPES:
+        raise ValueError(f'queue_type must be one of {", ".join(QUEUE_TYPES)}, '
+                         f'not {config.queue_type!r}')
+    arguments = {}
+    if config.queue_type == 'lazy':
+        arguments['x-queue-mode'] = 'lazy'
+    elif config.queue_type != 'classic':
+        arguments['x-queue-type'] = config.queue_type
+    if config.max_length:
+        arguments['x-max-length'] = config.max_length
+    if config.max_length_bytes:
+        arguments['x-max-length-bytes'] = config.max_length_bytes
+    if config.overflow:
+        arguments['x-overflow'] = config.overflow
+    if config.message_ttl:
+        arguments['x-message-ttl'] = config.message_ttl
+    if config.max_age:
+        arguments['x-max-age'] = config.max_age
+    return arguments or None
+
+
+def queue_durable(config: BenchConfig) -> bool:
+    # Quorum queues and streams only exist as durable queues
+    return config.durable or config.queue_type in ('quorum', 'stream')
+
+
+def consume_arguments(config: BenchConfig) -> dict:
+    """``basic_consume`` arguments; streams are read from their start"""
+    return {'x-stream-offset': 'first'} if config.queue_type == 'stream' else None
+
+
+def declare_queue(channel, config: BenchConfig, queue: str = None) -> str:
+    """Declare the benchmark queue using the config's type and durability"""
+    name = queue or config.queue
+    channel.queue_declare(queue=name, durable=queue_durable(config),
+                          arguments=queue_arguments(config))
+    return name
+
+
+def queue_depth(channel, queue: str) -> tuple:
+    """``(messages ready, consumer count)`` from a passive declare"""
+    method = channel.queue_declare(queue=queue, passive=True).method
+    return method.message_count, method.consumer_count
@@ -0,0 +1,146 @@
+"""Many logical records in one AMQP message.
+
+Per-message cost on both client and broker is mostly per frame, not per
+byte, so packing N encoded records into one body divides it by N. An
+envelope is flushed once it holds ``envelope_size`` records, reaches
+``envelope_bytes`` bytes or its oldest record has waited
+``envelope_linger`` seconds, whichever comes first. The time records spend
+waiting for their envelope is the latency batching adds.
+
+Two layouts are supported, named in the ``x-envelope`` header with the
+record count in ``x-envelope-count`` so consumers can tell envelopes from
+plain messages:
+
+    length   each record prefixed with its length as a big-endian u32;
+             :func:`iter_records` yields memoryview slices, no copies
+    msgpack  a msgpack array of binary records (needs msgpack)
+"""
+
+import struct
+import time
+
+from .codec import msgpack, require
+from .config import BenchConfig
+
+ENVELOPE_HEADER = 'x-envelope'
+COUNT_HEADER = 'x-envelope-count'
+ENVELOPE_FORMATS = ('length', 'msgpack')
+LENGTH = struct.Struct('>I')
+
+
+class EnvelopePacker:
+    """Collects records and hands back a full envelope body when one is due"""
+
+    def __init__(self, config: BenchConfig):
+        if config.envelope_format not in ENVELOPE_FORMATS:
+            raise ValueError(f'envelope_format must be one of '
+                             f'{", ".join(ENVELOPE_FORMATS)}, '
+                             f'not {config.envelope_format!r}')
+        if config.envelope_format == 'msgpack':
+            require(msgpack, 'msgpack')
+        self.format = config.envelope_format
+        self.max_records = max(config.envelope_size, 1)
+        self.max_bytes = config.envelope_bytes
+        self.linger = config.envelope_linger
+        self.records = []
+        self.size = 0
+        self.first_added = 0.0
+        self.added_sum = 0.0
+        # Batching delay over every record flushed, in seconds
+        self.delay_total = 0.0
+        self.delay_max = 0.0
+        self.flushed_records = 0
+        self.envelopes = 0
+        self.last_count = 0
+
+    def add(self, record) -> bytes:
+        """Queue ``record``; returns an envelope body when one is due"""
+        now = time.perf_counter()
+        if not self.records:
+            self.first_added = now
+        self.records.append(record)
+        self.size += len(record) + LENGTH.size
+        self.added_sum += now
+        if (len(self.records) >= self.max_records
+                or (self.max_bytes and self.size >= self.max_bytes)
+                or (self.linger and now - self.first_added >= self.linger)):
+            return self.flush()
+        return None
+
+    def due(self, within: float = 0.0) -> bool:
+        """Whether a partial envelope will have waited ``linger`` seconds
+        ``within`` seconds from now"""
+        return bool(self.records and self.linger and
+                    time.perf_counter() + within - self.first_added >= self.linger)
+
+    def flush(self) -> bytes:
+        """The pending records as one envelope, or ``None`` if there are none"""
+        if not self.records:
+            return None
+        now = time.perf_counter()
+        count = len(self.records)
+        self.delay_total += count * now - self.added_sum
+        self.delay_max = max(self.delay_max, now - self.first_added)
+        self.flushed_records += count
+        self.envelopes += 1
+        if self.format == 'msgpack':
+            body = msgpack.packb([bytes(r) for r in self.records])
+        else:
+            parts = []
+            for record in self.records:
+                parts.append(LENGTH.pack(len(record)))
+                parts.append(record)
+            body = b''.join(parts)
+        self.last_count = count
+        self.records = []
+        self.size = 0
+        self.added_sum = 0.0
+        return body
+
+    def headers(self) -> dict:
+        """Headers describing the envelope :meth:`flush` just returned"""
+        return {ENVELOPE_HEADER: self.format, COUNT_HEADER: self.last_count}
+
+    def reset_stats(self) -> None:
+        self.delay_total = 0.0
+        self.delay_max = 0.0
+        self.flushed_records = 0
+        self.envelopes = 0
+
+    def stats(self) -> dict:
+        records = self.flushed_records
+        return {
+            'envelopes': self.envelopes,
+            'records_per_envelope': round(records / self.envelopes, 2)
+            if self.envelopes else 0.0,
+            'batching_delay_ms': {
+                'mean': round(self.delay_total / records * 1e3, 4) if records else 0.0,
+                'max': round(self.delay_max * 1e3, 4),
+            },
+        }
+
+
+def iter_records(body, envelope_format: str = 'length'):
+    """Yield the records of an envelope; ``length`` records are memoryviews"""
+    if envelope_format == 'msgpack':
+        require(msgpack, 'msgpack')
+        yield from msgpack.unpackb(body)
+        return
+    view = memoryview(body)
+    at = 0
+    end = len(view)
+    unpack_from = LENGTH.unpack_from
+    while at < end:
+        (size,) = unpack_from(view, at)
+        at += LENGTH.size
+        yield view[at:at + size]
+        at += size
+
+
+def envelope_format(properties):
+    """The envelope layout named in ``properties``, or ``None`` for a plain message"""
+    headers = properties.headers if properties is not None else None
+    if not headers:
+        return None
+    value = headers.get(ENVELOPE_HEADER)
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,152 @@
+"""Raw-frame publishing on a pika connection's socket.
+
+``channel.basic_publish`` builds a ``Basic.Publish`` method, a
+``BasicProperties`` header and a body frame object per message, marshals
+each one and hands three buffers to the transport. For a fixed routing key
+and fixed properties everything except the two length fields and the body
+is the same every time, so :class:`FramePublisher` encodes those bytes once,
+patches the lengths per message and writes a whole batch of frames with a
+single ``sendall``.
+
+The connection is opened, the queue declared and the channel closed
+through pika as usual; only the publishes bypass it. That relies on pika's
+transport internals and is only safe while pika has nothing buffered, which
+holds between blocking calls.
+"""
+
+import struct
+import time
+
+from pika import frame, spec
+
+from . import metrics
+from .config import BenchConfig
+from .payloads import message_factory
+
+FRAME_END = bytes((spec.FRAME_END,))
+FRAME_PREFIX = struct.Struct('>BHL')
+CONTENT_HEADER = struct.Struct('>HHQ')
+
+
+def raw_socket(connection):
+    """The socket under a ``BlockingConnection``, checked to be idle"""
+    transport = connection._impl._transport
+    if transport.get_write_buffer_size():
+        raise RuntimeError('pika has unsent data buffered on this connection')
+    return transport._sock
+
+
+def encode_properties(properties) -> bytes:
+    return b''.join(properties.encode())
+
+
+class FramePublisher:
+    """Publish to one routing key by writing pre-built AMQP frames
+
+    ``properties_for`` results are encoded once unless ``latency`` is set,
+    in which case the stamped headers are encoded per message. Messages are
+    written in batches of ``batch_size``; with a pacer, each burst is
+    written as soon as it is built.
+    """
+
+    def __init__(self, connection, channel, config: BenchConfig,
+                 routing_key: str = None, exchange: str = '', messages=None):
+        self.connection = connection
+        self.channel = channel
+        self.config = config
+        self.routing_key = routing_key or config.queue
+        self.body_for, self.properties_for = messages or message_factory(
+            config, min_slots=config.batch_size)
+        self.per_message_properties = config.latency
+        self.max_body = connection._impl.params.frame_max - spec.FRAME_HEADER_SIZE \
+            - spec.FRAME_END_SIZE
+
+        number = channel.channel_number
+        self.method = frame.Method(number, spec.Basic.Publish(
+            exchange=exchange, routing_key=self.routing_key)).marshal()
+        self.header_prefix = FRAME_PREFIX.pack(spec.FRAME_HEADER, number, 0)[:3]
+        self.body_prefix = FRAME_PREFIX.pack(spec.FRAME_BODY, number, 0)[:3]
+        self.set_properties(encode_properties(self.properties_for()))
+
+    def set_properties(self, properties: bytes) -> None:
+        """Rebuild the per-message templates around encoded ``properties``"""
+        self.properties = properties
+        header_size = CONTENT_HEADER.size + len(properties)
+        # method frame + header frame up to the body size field
+        self.lead = (self.method + self.header_prefix
+                     + struct.pack('>LHH', header_size, spec.Basic.INDEX, 0))
+        # body size, properties, end of header frame, body frame up to its size
+        middle = properties + FRAME_END + self.body_prefix
+        self.middle = middle
+        self.sizes = struct.Struct(f'>Q{len(middle)}sL')
+
+    def frames(self, body: bytes) -> list:
+        """The buffers for one message, body included"""
+        if self.per_message_properties:
+            self.set_properties(encode_properties(self.properties_for()))
+        size = len(body)
+        if size <= self.max_body:
+            return [self.lead, self.sizes.pack(size, self.middle, size),
+                    body, FRAME_END]
+        parts = [self.lead, struct.pack('>Q', size), self.properties, FRAME_END]
+        for start in range(0, size, self.max_body):
+            fragment = body[start:start + self.max_body]
+            parts += [self.body_prefix, struct.pack('>L', len(fragment)),
+                      fragment, FRAME_END]
+        return parts
+
+    def write(self, parts: list) -> None:
+        sock = raw_socket(self.connection)
+        sock.setblocking(True)
+        try:
+            sock.sendall(b''.join(parts))
+        finally:
+            sock.setblocking(False)
+
+    def publish(self, start_id: int, count: int, pacer=None,
+                progress_from: float = None) -> int:
+        """Publish ``count`` messages with ids starting at ``start_id``"""
+        body_for = self.body_for
+        frames = self.frames
+        batch_size = max(self.config.batch_size, 1)
+        progress_every = self.config.progress_every
+        live = metrics.active()
+        parts = []
+        pending = 0
+        budget = 0
+
+        for n, i in enumerate(range(start_id, start_id + count), 1):
+            if pacer is not None and not budget:
+                if parts:
+                    self.write(parts)
+                    pacer.sent(pending)
+                    parts = []
+                    pending = 0
+                while not budget:
+                    budget = pacer.acquire(count - n + 1)
+            budget -= 1
+
+            body = body_for(i)
+            parts += frames(body)
+            pending += 1
+            if live is not None:
+                live.on_publish(len(body))
+            if pending == batch_size:
+                self.write(parts)
+                if pacer is not None:
+                    pacer.sent(pending)
+                parts = []
+                pending = 0
+                if progress_every and progress_from and n % progress_every < batch_size:
+                    rate = n / (time.time() - progress_from)
+                    print(f'Sent {n} messages - Rate: {rate:.0f} msgs/sec')
+
+        if parts:
+            self.write(parts)
+            if pacer is not None:
+                pacer.sent(pending)
+        return count
+
+    def barrier(self) -> None:
+        """Wait until the broker has processed every frame written so far"""
+        self.channel.queue_declare(queue=self.routing_key, passive=True)
@@ -0,0 +1,180 @@
+"""TCP proxy that makes a local broker look like a distant one.
+
+Client and broker on one Docker bridge see a round trip of tens of
+microseconds, which hides what confirm windows and prefetch are for.
+:class:`ImpairmentProxy` forwards each client connection to the broker
+and, in both directions:
+
+    net_rtt        adds half of this many seconds of one-way delay
+    net_jitter     adds up to +/- this many seconds to each delay
+    net_mbps       serialises bytes at this many megabits per second
+    net_chunk      splits writes into segments of at most this many bytes
+
+Data is never reordered: like TCP over netem, a segment whose jitter would
+land it before the previous one waits for it. Bytes waiting for the link
+are held in the proxy up to ``MAX_QUEUED`` segments before it stops
+reading, which is roughly what a router buffer does.
+
+Any ``net_*`` field makes :func:`runner.run_scenario` start a proxy in its
+own process for the scenario and point the config at it, so impairment is
+selected per scenario or variant, e.g. ``--vary net_rtt=0,0.001,0.01``.
+``python -m rabbitbench proxy`` serves one for other clients.
+"""
+
+import asyncio
+import multiprocessing
+import random
+import socket
+import time
+
+from .config import BenchConfig
+
+READ_SIZE = 1 << 16
+MAX_QUEUED = 1024
+
+
+def impaired(config: BenchConfig) -> bool:
+    return bool(config.net_rtt or config.net_jitter or config.net_mbps
+                or config.net_chunk)
+
+
+def describe(config: BenchConfig) -> str:
+    parts = [f'rtt {config.net_rtt * 1e3:g}ms']
+    if config.net_jitter:
+        parts.append(f'jitter +/-{config.net_jitter * 1e3:g}ms')
+    if config.net_mbps:
+        parts.append(f'{config.net_mbps:g} Mbit/s')
+    if config.net_chunk:
+        parts.append(f'{config.net_chunk}-byte segments')
+    return ', '.join(parts)
+
+
+class Link:
+    """One direction of a proxied connection"""
+
+    def __init__(self, delay: float, jitter: float, mbps: float, chunk: int):
+        self.delay = delay
+        self.jitter = jitter
+        self.bytes_per_second = mbps * 1e6 / 8
+        self.chunk = chunk
+        self.queue = asyncio.Queue(MAX_QUEUED)
+        self.link_free = 0.0
+        self.last_due = 0.0
+
+    def schedule(self, data: bytes) -> list:
+        """``(due, segment)`` pairs for bytes read now"""
+        now = time.monotonic()
+        size = self.chunk or len(data)
+        segments = []
+        for offset in range(0, len(data), size):
+            segment = data[offset:offset + size]
+            sent = now
+            if self.bytes_per_second:
+                sent = max(now, self.link_free) + len(segment) / self.bytes_per_second
+                self.link_free = sent
+            delay = self.delay
+            if self.jitter:
+                delay = max(delay + random.uniform(-self.jitter, self.jitter), 0.0)
+            self.last_due = max(sent + delay, self.last_due)
+            segments.append((self.last_due, segment))
+        return segments
+
+    async def pump(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                for item in self.schedule(data):
+                    await self.queue.put(item)
+        except ConnectionError:
+            pass
+        finally:
+            await self.queue.put((0.0, None))
+
+    async def deliver(self, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                due, segment = await self.queue.get()
+                if segment is None:
+                    break
+                wait = due - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                writer.write(segment)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class ImpairmentProxy:
+    """Forwards ``host:port`` to the broker at ``target_host:target_port``"""
+
+    def __init__(self, target_host: str, target_port: int,
+                 host: str = '127.0.0.1', port: int = 0, rtt: float = 0.0,
+                 jitter: float = 0.0, mbps: float = 0.0, chunk: int = 0):
+        self.target = (target_host, target_port)
+        self.host = host
+        self.port = port
+        self.link = (rtt / 2, jitter, mbps, chunk)
+        self._server = None
+
+    @classmethod
+    def for_config(cls, config: BenchConfig, port: int = 0) -> 'ImpairmentProxy':
+        return cls(config.host, config.port, port=port, rtt=config.net_rtt,
+                   jitter=config.net_jitter, mbps=config.net_mbps,
+                   chunk=config.net_chunk)
+
+    async def _on_client(self, client_reader, client_writer) -> None:
+        try:
+            broker_reader, broker_writer = await asyncio.open_connection(
+                *self.target)
+        except OSError:
+            client_writer.close()
+            return
+        for writer in (client_writer, broker_writer):
+            sock = writer.get_extra_info('socket')
+            if sock is not None:
+                # Segments leave when the link says so, not when Nagle does
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        upstream, downstream = Link(*self.link), Link(*self.link)
+        await asyncio.gather(upstream.pump(client_reader),
+                             upstream.deliver(broker_writer),
+                             downstream.pump(broker_reader),
+                             downstream.deliver(client_writer))
+
+    async def open(self) -> None:
+        self._server = await asyncio.start_server(self._on_client, self.host,
+                                                  self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.open()
+        await self._server.serve_forever()
+
+
+def _serve_process(config: BenchConfig, conn) -> None:
+    proxy = ImpairmentProxy.for_config(config)
+
+    async def main():
+        await proxy.open()
+        conn.send(proxy.port)
+        await proxy.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def start_proxy_process(config: BenchConfig):
+    """Run an :class:`ImpairmentProxy` to the config's broker in a child
+    process; returns ``(process, port)``"""
+    parent, child = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_serve_process,
+                                      args=(config, child), daemon=True)
+    process.start()
+    return process, parent.recv()
@@ -0,0 +1,208 @@
+"""Publish-to-consume latency measurement.
+
+Producers stamp the send time in nanoseconds into the ``x-sent-ns``
+message header; consumers subtract it from their own clock on delivery
+and record the difference in a :class:`LatencyHistogram`. The default
+``monotonic`` clock is only comparable between processes on the same host
+(including containers sharing a kernel); use ``latency_clock=wall`` with
+NTP-synchronised clocks when producer and consumer run on different hosts.
+"""
+
+import time
+
+from . import metrics
+from .config import BenchConfig
+
+SENT_HEADER = 'x-sent-ns'
+
+CLOCKS = {
+    'monotonic': time.monotonic_ns,
+    'wall': time.time_ns,
+}
+
+
+def clock_for(config: BenchConfig):
+    try:
+        return CLOCKS[config.latency_clock]
+    except KeyError:
+        raise ValueError(f'latency_clock must be one of {", ".join(CLOCKS)}, '
+                         f'not {config.latency_clock!r}') from None
+
+
+class LatencyHistogram:
+    """Log-linear histogram in the style of HdrHistogram
+
+    Values below ``2 ** sub_bits`` are counted exactly; above that each
+    power-of-two range is split into ``2 ** (sub_bits - 1)`` equal buckets,
+    so every recorded value is within ``2 ** -(sub_bits - 1)`` of its
+    bucket's upper bound (0.8% with the default 8 bits) while memory stays
+    proportional to the logarithm of the largest value.
+    """
+
+    def __init__(self, sub_bits: int = 8):
+        self.sub_bits = sub_bits
+        self._half = 1 << (sub_bits - 1)
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self.sub_bits
+        if shift <= 0:
+            return value
+        return (shift << (self.sub_bits - 1)) + (value >> shift)
+
+    def _upper_bound(self, index: int) -> int:
+        """Highest value that lands in bucket ``index``"""
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        mantissa = index - shift * self._half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        value = max(int(value), 0)
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        if other.sub_bits != self.sub_bits:
+            raise ValueError('Cannot merge histograms with different precision')
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def reset(self) -> None:
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def value_at_percentile(self, pct: float) -> int:
+        if not self.count:
+            return 0
+        target = max(pct / 100.0 * self.count, 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self, pcts=(50, 90, 99, 99.9), scale: float = 1e6) -> dict:
+        """Percentiles, mean and max divided by ``scale`` (ns to ms default)"""
+        summary = {f'p{pct:g}': round(self.value_at_percentile(pct) / scale, 4)
+                   for pct in pcts}
+        summary['mean'] = round(self.mean / scale, 4)
+        summary['max'] = round(self.max / scale, 4)
+        summary['count'] = self.count
+        return summary
+
+    def to_dict(self) -> dict:
+        """Sparse, JSON/pickle friendly form for shipping between processes"""
+        return {
+            'sub_bits': self.sub_bits,
+            'counts': {i: c for i, c in enumerate(self.counts) if c},
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LatencyHistogram':
+        histogram = cls(data['sub_bits'])
+        counts = {int(i): c for i, c in data['counts'].items()}
+        if counts:
+            histogram.counts = [0] * (max(counts) + 1)
+            for index, count in counts.items():
+                histogram.counts[index] = count
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+
+class LatencyRecorder:
+    """Consumer-side latency recording with per-interval snapshots"""
+
+    def __init__(self, config: BenchConfig):
+        self.clock = clock_for(config)
+        self.interval_ns = int(config.stats_interval * 1e9)
+        self.histogram = LatencyHistogram()
+        self.interval = LatencyHistogram()
+        self.snapshots = []
+        self.missing = 0
+        self.live = metrics.active()
+        self._started = None
+        self._interval_start = None
+
+    def start(self) -> None:
+        """Discard anything recorded so far (the warmup) and start timing"""
+        self.histogram.reset()
+        self.interval.reset()
+        self.snapshots = []
+        self.missing = 0
+        self._started = self._interval_start = time.monotonic_ns()
+
+    def record(self, properties) -> None:
+        headers = properties.headers if properties is not None else None
+        sent = headers.get(SENT_HEADER) if headers else None
+        if sent is None:
+            self.missing += 1
+            return
+        latency = self.clock() - sent
+        self.histogram.record(latency)
+        self.interval.record(latency)
+        if self.live is not None:
+            self.live.on_latency(latency)
+
+        if self.interval_ns and self._interval_start is not None:
+            now = time.monotonic_ns()
+            if now - self._interval_start >= self.interval_ns:
+                self.snapshot(now)
+
+    def snapshot(self, now: int = None) -> None:
+        """Close the current interval and start a new one"""
+        now = now or time.monotonic_ns()
+        if self._interval_start is None:
+            self._interval_start = self._started = now
+        elapsed = (now - self._interval_start) / 1e9
+        entry = self.interval.summary()
+        entry['t'] = round((now - self._started) / 1e9, 3)
+        entry['rate'] = round(self.interval.count / elapsed, 1) if elapsed > 0 else 0.0
+        self.snapshots.append(entry)
+        self.interval.reset()
+        self._interval_start = now
+
+    def finish(self) -> dict:
+        """Flush the last partial interval and return the report"""
+        if self.interval.count:
+            self.snapshot()
+        report = {'latency_ms': self.histogram.summary(),
+                  'latency_intervals': self.snapshots}
+        if self.missing:
+            report['latency_missing_header'] = self.missing
+        return report
@@ -0,0 +1,257 @@
+"""Memory use of benchmark processes.
+
+On Linux the resident set size comes from ``/proc/self/statm``; elsewhere
+the peak RSS from ``getrusage`` stands in for it, which only ever grows.
+
+With ``memory`` set, every process that starts live metrics (see
+:func:`metrics.start_reporting`) also samples its RSS, USS (pages only it
+maps) and PSS (its share of every page it maps) each ``memory_interval``
+seconds from ``/proc/self/smaps_rollup``. Worker processes forked from
+one parent share most of the interpreter, so their RSS adds up to far
+more than the machine spends; PSS adds up to what it does, which is what
+a container's memory limit is charged, and is what msgs/sec per GB uses.
+
+With ``tracemalloc`` set, each process also traces Python allocations
+between those calls and reports how far traced memory grew, its peak
+and the lines that grew most. tracemalloc follows live memory rather
+than every allocation, so per message these are bytes retained and
+bytes held at the peak, e.g. by a prefetch window full of deliveries.
+Tracing slows allocation-heavy loops down severalfold, so leave it off
+for throughput numbers.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from .config import BenchConfig
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+TOP_LINES = 5
+
+_active = None
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process in bytes, 0 if it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def usage() -> dict:
+    """``rss``, ``uss`` and ``pss`` in bytes; USS and PSS fall back to RSS
+    where ``smaps_rollup`` is missing (before Linux 4.14, or not Linux)"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                    fields[name] = int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        pass
+    if 'Rss' not in fields:
+        rss = rss_bytes()
+        return {'rss': rss, 'uss': rss, 'pss': rss}
+    return {'rss': fields['Rss'], 'pss': fields.get('Pss', fields['Rss']),
+            'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def mib(size: int) -> float:
+    return round(size / (1 << 20), 2)
+
+
+class MemorySampler:
+    """Samples this process's memory from a daemon thread"""
+
+    def __init__(self, directory: str, role: str, worker_id: int,
+                 interval: float, trace: bool):
+        self.directory = directory
+        self.role = role
+        self.worker_id = worker_id
+        self.interval = interval
+        self.trace = trace
+        self.peak = dict.fromkeys(('rss', 'uss', 'pss'), 0)
+        self.total_rss = 0
+        self.samples = 0
+        self.start_usage = None
+        self._snapshot = None
+        self._traced_start = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='memory-sampler')
+
+    def sample(self) -> dict:
+        current = usage()
+        for key, value in current.items():
+            self.peak[key] = max(self.peak[key], value)
+        self.total_rss += current['rss']
+        self.samples += 1
+        return current
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> 'MemorySampler':
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._snapshot = tracemalloc.take_snapshot()
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+        self.start_usage = self.sample()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        end = self.sample()
+        report = {'role': self.role, 'worker': self.worker_id,
+                  'pid': os.getpid(), 'samples': self.samples,
+                  'start': self.start_usage, 'end': end, 'peak': self.peak,
+                  'mean_rss': self.total_rss // self.samples}
+        if self.trace:
+            report['tracemalloc'] = self.traced()
+        self.write(report)
+
+    def traced(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        growth = snapshot.compare_to(self._snapshot, 'lineno')
+        return {
+            'growth': current - self._traced_start,
+            'peak': peak - self._traced_start,
+            'top': [{'line': str(stat.traceback[0]), 'growth': stat.size_diff,
+                     'count': stat.count_diff}
+                    for stat in growth[:TOP_LINES] if stat.size_diff > 0],
+        }
+
+    def write(self, report: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{self.role}-{self.worker_id}-'
+                                            f'{os.getpid()}-{time.time_ns()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(report, f)
+        # Rename so collect never reads a file still being written
+        os.replace(path + '.tmp', path)
+
+
+def start(config: BenchConfig, role: str, worker_id: int = 0) -> MemorySampler:
+    """Start sampling this process if ``memory`` is set"""
+    global _active
+    stop()
+    if config.memory and config.memory_dir:
+        _active = MemorySampler(config.memory_dir, role, worker_id,
+                                config.memory_interval,
+                                config.tracemalloc).start()
+    return _active
+
+
+def stop() -> None:
+    """Stop sampling and write this process's report"""
+    global _active
+    if _active is not None:
+        sampler, _active = _active, None
+        sampler.stop()
+
+
+def _forget_in_child() -> None:
+    # A forked child must not report the parent's samples, nor trace
+    global _active
+    if _active is not None and _active.trace:
+        tracemalloc.stop()
+    _active = None
+
+
+os.register_at_fork(after_in_child=_forget_in_child)
+
+
+def collect(directory: str, messages: int, rate: float) -> dict:
+    """Merge the per-process reports of one trial and remove them
+
+    Reports from one process (say a main thread and its thread workers)
+    are merged by pid, taking the peaks, so each process counts once.
+    """
+    reports = []
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            reports.append(json.load(f))
+        os.remove(os.path.join(directory, name))
+
+    processes = {}
+    for report in reports:
+        merged = processes.setdefault(report['pid'], {
+            'role': report['role'], 'worker': report['worker'],
+            'peak': dict.fromkeys(('rss', 'uss', 'pss'), 0)})
+        if report['role'] != 'main':
+            merged.update(role=report['role'], worker=report['worker'])
+        for key, value in report['peak'].items():
+            merged['peak'][key] = max(merged['peak'][key], value)
+
+    totals = {key: sum(p['peak'][key] for p in processes.values())
+              for key in ('rss', 'uss', 'pss')}
+    gb = totals['pss'] / 1e9
+    summary = {
+        'processes': len(processes),
+        'peak_rss_mib': mib(totals['rss']),
+        'peak_uss_mib': mib(totals['uss']),
+        'peak_pss_mib': mib(totals['pss']),
+        'msgs_per_sec_per_gb': round(rate / gb, 1) if gb else 0.0,
+        'per_process': [{'role': p['role'], 'worker': p['worker'],
+                         **{f'peak_{key}_mib': mib(value)
+                            for key, value in p['peak'].items()}}
+                        for p in processes.values()],
+    }
+
+    traced = [r for r in reports if 'tracemalloc' in r]
+    if traced:
+        growth = sum(r['tracemalloc']['growth'] for r in traced)
+        peak = sum(r['tracemalloc']['peak'] for r in traced)
+        lines = {}
+        for r in traced:
+            for line in r['tracemalloc']['top']:
+                merged = lines.setdefault(line['line'], dict(line, growth=0, count=0))
+                merged['growth'] += line['growth']
+                merged['count'] += line['count']
+        top = sorted(lines.values(), key=lambda line: -line['growth'])[:TOP_LINES]
+        summary['tracemalloc'] = {
+            'growth_bytes': growth,
+            'peak_bytes': peak,
+            'growth_per_message': round(growth / messages, 1) if messages else 0.0,
+            'peak_per_message': round(peak / messages, 1) if messages else 0.0,
+            'top': top,
+        }
+    return summary
+
+
+def format_memory(summary: dict) -> str:
+    text = (f'{summary["peak_pss_mib"]:g} MiB PSS over {summary["processes"]} '
+            f'process(es) (RSS {summary["peak_rss_mib"]:g}, USS '
+            f'{summary["peak_uss_mib"]:g}), '
+            f'{summary["msgs_per_sec_per_gb"]:.0f} msgs/sec per GB')
+    traced = summary.get('tracemalloc')
+    if traced:
+        text += (f'; traced {traced["growth_per_message"]:g} B/msg retained, '
+                 f'{traced["peak_per_message"]:g} B/msg at peak')
+    return text
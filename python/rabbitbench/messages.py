@@ -0,0 +1,22 @@
+import datetime
+import json
+
+
+def build_message(i: int, payload=None) -> dict:
+    """The message dict every producer script sends, plus optional payload"""
+    message = {
+        'id': i,
+        'content': f'Hello World #{i}',
+        'timestamp': datetime.datetime.now().isoformat(),
+    }
+    if payload:
+        message['payload'] = payload
+    return message
+
+
+def encode_message(message: dict) -> bytes:
+    return json.dumps(message).encode()
+
+
+def decode_message(body: bytes) -> dict:
+    return json.loads(body)
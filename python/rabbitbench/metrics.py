@@ -0,0 +1,357 @@
+"""Live counters from every benchmark process.
+
+Each process that publishes or consumes calls :func:`start_reporting`.
+Its hot loops bump integer counters on the object returned by
+:func:`active` (``None`` when live metrics are off, so the check is one
+comparison), and a daemon thread sends a JSON snapshot of the counters,
+plus the latencies recorded since the previous snapshot, as one UDP
+datagram every ``stats_interval`` seconds. Several threads of one process
+may share the object, so updates and snapshots hold a per-process lock
+that is almost never contended; nothing on the hot path crosses a
+process boundary.
+
+:class:`MetricsAggregator` receives the snapshots, serves the totals in
+Prometheus text format on ``/metrics`` (JSON on ``/stats``) and appends a
+JSON line per interval to ``stats_file``, so soak runs can be graphed over
+time instead of read as one final average. A lost datagram only delays a
+counter until the next snapshot; latency samples in it are dropped.
+
+The same calls start and stop the sampling profiler (see :mod:`profiling`)
+when ``profile_dir`` is set, and the memory sampler (see :mod:`memory`)
+when ``memory`` is, so every instrumented process is covered.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import latency, memory, profiling
+from .config import BenchConfig
+
+COUNTERS = ('sent', 'sent_bytes', 'confirmed', 'nacked', 'consumed',
+            'consumed_bytes')
+MAX_DATAGRAM = 65507
+
+_active = None
+
+
+class WorkerMetrics:
+    """Counters for one process, pushed to the aggregator by a thread"""
+
+    def __init__(self, address: tuple, role: str, worker_id: int,
+                 interval: float):
+        self.address = address
+        self.role = role
+        self.worker_id = worker_id
+        self.interval = interval
+        # Tells apart successive reporters of one process, e.g. per trial
+        self.started = time.time_ns()
+        self.sent = 0
+        self.sent_bytes = 0
+        self.confirmed = 0
+        self.nacked = 0
+        self.consumed = 0
+        self.consumed_bytes = 0
+        self.latency = latency.LatencyHistogram()
+        self._lock = threading.Lock()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='metrics-reporter')
+
+    def on_publish(self, size: int, count: int = 1) -> None:
+        with self._lock:
+            self.sent += count
+            self.sent_bytes += size
+
+    def on_consume(self, size: int, count: int = 1) -> None:
+        with self._lock:
+            self.consumed += count
+            self.consumed_bytes += size
+
+    def on_confirm(self, count: int, nack: bool = False) -> None:
+        with self._lock:
+            if nack:
+                self.nacked += count
+            else:
+                self.confirmed += count
+
+    def on_latency(self, ns: int) -> None:
+        with self._lock:
+            self.latency.record(ns)
+
+    def snapshot(self, final: bool = False) -> dict:
+        # Swap rather than copy so the lock is held for as little as possible
+        fresh = latency.LatencyHistogram()
+        with self._lock:
+            recorded, self.latency = self.latency, fresh
+            data = {name: getattr(self, name) for name in COUNTERS}
+        data.update(role=self.role, worker=self.worker_id, pid=os.getpid(),
+                    started=self.started, final=final)
+        if recorded.count:
+            data['latency'] = recorded.to_dict()
+        return data
+
+    def send(self, final: bool = False) -> None:
+        payload = json.dumps(self.snapshot(final)).encode()
+        if len(payload) > MAX_DATAGRAM:
+            # Only a pathological latency spread gets here; keep the counters
+            data = json.loads(payload)
+            data.pop('latency')
+            payload = json.dumps(data).encode()
+        try:
+            self._socket.sendto(payload, self.address)
+        except OSError:
+            pass
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.send()
+
+    def start(self) -> 'WorkerMetrics':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.send(final=True)
+        self._socket.close()
+
+
+def parse_address(address: str) -> tuple:
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def start_reporting(config: BenchConfig, role: str,
+                    worker_id: int = 0) -> WorkerMetrics:
+    """Start pushing this process's counters if ``metrics_addr`` is set"""
+    global _active
+    stop_reporting()
+    profiling.start(config, role, worker_id)
+    memory.start(config, role, worker_id)
+    if config.metrics_addr:
+        _active = WorkerMetrics(parse_address(config.metrics_addr), role,
+                                worker_id, config.stats_interval).start()
+    return _active
+
+
+def stop_reporting() -> None:
+    """Send the final snapshot and stop the reporter thread"""
+    global _active
+    if _active is not None:
+        metrics, _active = _active, None
+        metrics.stop()
+    memory.stop()
+    profiling.stop()
+
+
+def active() -> WorkerMetrics:
+    """This process's counters, or ``None`` when live metrics are off"""
+    return _active
+
+
+def _forget_in_child() -> None:
+    # A forked child has the parent's counters but not its reporter thread
+    global _active
+    _active = None
+
+
+os.register_at_fork(after_in_child=_forget_in_child)
+
+
+class MetricsAggregator:
+    """Collect worker snapshots; serve and log the running totals
+
+    Worker snapshots arrive on a UDP socket bound to ``host``; ``/metrics``
+    is served on ``http_host:port``, loopback only unless asked otherwise.
+    """
+
+    def __init__(self, port: int = 0, stats_file: str = '',
+                 interval: float = 1.0, host: str = '127.0.0.1',
+                 http_host: str = '127.0.0.1'):
+        self.port = port
+        self.http_host = http_host
+        self.stats_file = stats_file
+        self.interval = interval
+        self.host = host
+        self.label = ''
+        self.workers = {}  # (pid, started, role, worker) -> latest snapshot
+        self.latency = latency.LatencyHistogram()
+        self.interval_latency = latency.LatencyHistogram()
+        self.last_line = {}
+        self._previous = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, 0))
+        self._socket.settimeout(0.2)
+        self._http = None
+        self._threads = []
+        self._started = None
+
+    @property
+    def address(self) -> str:
+        """``host:port`` for the ``metrics_addr`` config field"""
+        host, port = self._socket.getsockname()
+        return f'{host}:{port}'
+
+    @property
+    def url(self) -> str:
+        """Where ``/metrics`` is actually served, once started"""
+        host, port = self._http.server_address[:2]
+        return f'http://{host}:{port}/metrics'
+
+    def start(self) -> 'MetricsAggregator':
+        self._started = time.time()
+        targets = [self._receive]
+        if self.stats_file:
+            targets.append(self._write_stats)
+        if self.port:
+            self._http = ThreadingHTTPServer((self.http_host, self.port),
+                                             self._handler())
+            self._http.daemon_threads = True
+            targets.append(self._http.serve_forever)
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True,
+                                      name='metrics-aggregator')
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        # Let the last worker snapshots arrive, then log a final line
+        time.sleep(min(self.interval, 0.5))
+        self._stop.set()
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self.stats_file:
+            self._append_line()
+        self._socket.close()
+
+    def _receive(self) -> None:
+        while not self._stop.is_set():
+            try:
+                payload = self._socket.recv(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            data = json.loads(payload)
+            recorded = data.pop('latency', None)
+            with self._lock:
+                key = (data['pid'], data['started'], data['role'], data['worker'])
+                self.workers[key] = data
+                if recorded:
+                    histogram = latency.LatencyHistogram.from_dict(recorded)
+                    self.latency.merge(histogram)
+                    self.interval_latency.merge(histogram)
+
+    def totals(self) -> dict:
+        """Counter sums per role and overall, over every worker seen"""
+        with self._lock:
+            snapshots = list(self.workers.values())
+        roles = {}
+        for data in snapshots:
+            role = roles.setdefault(data['role'], dict.fromkeys(COUNTERS, 0))
+            for name in COUNTERS:
+                role[name] += data[name]
+        overall = {name: sum(role[name] for role in roles.values())
+                   for name in COUNTERS}
+        live = sum(1 for data in snapshots if not data['final'])
+        return {'roles': roles, 'total': overall, 'workers': live}
+
+    def stats_line(self) -> dict:
+        """Totals, per-second rates since the last line and interval latency"""
+        now = time.time()
+        totals = self.totals()
+        line = {'time': round(now, 3), 'elapsed': round(now - self._started, 3),
+                'scenario': self.label, 'workers': totals['workers']}
+        line.update(totals['total'])
+        if self._previous is not None:
+            then, previous = self._previous
+            elapsed = now - then
+            for name in COUNTERS:
+                line[f'{name}_rate'] = round(
+                    (totals['total'][name] - previous[name]) / elapsed, 1) \
+                    if elapsed > 0 else 0.0
+        self._previous = (now, totals['total'])
+        with self._lock:
+            interval, self.interval_latency = (self.interval_latency,
+                                               latency.LatencyHistogram())
+        if interval.count:
+            line['latency_ms'] = interval.summary()
+        return line
+
+    def _append_line(self) -> None:
+        self.last_line = self.stats_line()
+        with open(self.stats_file, 'a') as f:
+            f.write(json.dumps(self.last_line) + '\n')
+
+    def _write_stats(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._append_line()
+
+    def prometheus(self) -> str:
+        """The totals in the Prometheus text exposition format"""
+        totals = self.totals()
+        scenario = self.label.replace('\\', '\\\\').replace('"', '\\"')
+        lines = []
+        for name in COUNTERS:
+            metric = (f'rabbitbench_{name}_total' if name.endswith('bytes')
+                      else f'rabbitbench_messages_{name}_total')
+            lines.append(f'# TYPE {metric} counter')
+            for role, counters in sorted(totals['roles'].items()):
+                lines.append(f'{metric}{{scenario="{scenario}",role="{role}"}} '
+                             f'{counters[name]}')
+        lines.append('# TYPE rabbitbench_workers gauge')
+        lines.append(f'rabbitbench_workers{{scenario="{scenario}"}} '
+                     f'{totals["workers"]}')
+
+        with self._lock:
+            histogram = latency.LatencyHistogram()
+            histogram.merge(self.latency)
+        lines.append('# TYPE rabbitbench_latency_seconds summary')
+        for pct in (50, 90, 99, 99.9):
+            value = histogram.value_at_percentile(pct) / 1e9
+            lines.append(f'rabbitbench_latency_seconds{{scenario="{scenario}",'
+                         f'quantile="{pct / 100:g}"}} {value:.9f}')
+        lines.append(f'rabbitbench_latency_seconds_sum{{scenario="{scenario}"}} '
+                     f'{histogram.total / 1e9:.9f}')
+        lines.append(f'rabbitbench_latency_seconds_count{{scenario="{scenario}"}} '
+                     f'{histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def _handler(self):
+        aggregator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = aggregator.prometheus().encode()
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/stats':
+                    totals = aggregator.totals()
+                    totals['scenario'] = aggregator.label
+                    body = json.dumps(totals).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
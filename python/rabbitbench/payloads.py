@@ -0,0 +1,132 @@
+"""Pre-serialized message bodies for allocation-free publish loops.
+
+:class:`MessagePool` encodes the standard benchmark message once into a ring
+of fixed-width slots and then only rewrites the id and timestamp bytes of
+the next slot for each message. The padding is JSON whitespace, so the
+bodies still decode to exactly what :func:`build_message` produces.
+"""
+
+import json
+import time
+
+import pika
+
+from .codec import codec_for, make_payload
+from .config import BenchConfig
+from .latency import SENT_HEADER, clock_for
+from .messages import build_message
+
+ID_WIDTH = 10
+TIMESTAMP_WIDTH = 26  # 2026-10-18T12:34:56.123456
+
+
+class MessagePool:
+    """Ring of pre-encoded message bodies patched in place"""
+
+    def __init__(self, slots: int = 1024, payload: str = None):
+        if slots < 1:
+            raise ValueError('MessagePool needs at least one slot')
+
+        head = b'{"id": '
+        content = b', "content": "Hello World #'
+        stamp = b', "timestamp": "'
+        tail = b'"'
+        if payload:
+            tail += b', "payload": ' + json.dumps(payload).encode()
+        template = (head + b' ' * ID_WIDTH
+                    + content + b' ' * (ID_WIDTH + 1)
+                    + stamp + b' ' * TIMESTAMP_WIDTH + tail + b'}')
+
+        self.slot_size = len(template)
+        self.slots = slots
+        self.buffer = bytearray(template * slots)
+        self.view = memoryview(self.buffer)
+        self.views = [self.view[n * self.slot_size:(n + 1) * self.slot_size]
+                      for n in range(slots)]
+
+        self._id_at = len(head)
+        self._content_at = self._id_at + ID_WIDTH + len(content)
+        self._stamp_at = self._content_at + ID_WIDTH + 1 + len(stamp)
+        self._next = 0
+        self._second = None
+        self._stamp_prefix = b''
+
+    def _timestamp(self) -> bytes:
+        """Local ISO-8601 time with microseconds, reformatted once a second"""
+        second, ns = divmod(time.time_ns(), 1_000_000_000)
+        if second != self._second:
+            self._second = second
+            self._stamp_prefix = time.strftime(
+                '%Y-%m-%dT%H:%M:%S', time.localtime(second)).encode()
+        return self._stamp_prefix + b'.%06d' % (ns // 1000)
+
+    def body(self, message_id: int) -> memoryview:
+        """Patch the next slot for ``message_id`` and return a view of it"""
+        digits = b'%d' % message_id
+        if len(digits) > ID_WIDTH:
+            raise ValueError(f'Message id {message_id} exceeds {ID_WIDTH} digits')
+
+        n = self._next
+        self._next = n + 1 if n + 1 < self.slots else 0
+        start = n * self.slot_size
+        buf = self.buffer
+
+        at = start + self._id_at
+        buf[at:at + ID_WIDTH] = digits.rjust(ID_WIDTH)
+        at = start + self._content_at
+        buf[at:at + ID_WIDTH + 1] = (digits + b'"').ljust(ID_WIDTH + 1)
+        at = start + self._stamp_at
+        buf[at:at + TIMESTAMP_WIDTH] = self._timestamp()
+        return self.views[n]
+
+
+def message_factory(config: BenchConfig, min_slots: int = 0):
+    """Return ``(body_for, properties_for)`` callables for a producer loop
+
+    With ``preencode`` set, bodies come from a :class:`MessagePool` and one
+    ``BasicProperties`` object is shared; otherwise every message is built
+    as a dict, encoded with the configured codec and given fresh properties
+    as the original scripts do. ``min_slots`` keeps the ring larger than any
+    batch that is built ahead of publishing. With ``latency`` set, each
+    call to ``properties_for`` stamps the send time into the headers, so
+    call it after building the body.
+    """
+    delivery_mode = config.delivery_mode
+    stamp = clock_for(config) if config.latency else None
+    codec = codec_for(config)
+    payload = None
+    if config.payload_size:
+        payload = codec.prepare_payload(make_payload(config.payload_size))
+
+    if config.preencode:
+        if codec.name != 'json':
+            raise ValueError('preencode only supports the json codec '
+                             'without compression')
+        pool = MessagePool(max(config.pool_size, min_slots), payload)
+        properties = pika.BasicProperties(delivery_mode=delivery_mode,
+                                          headers={} if stamp else None)
+        if not stamp:
+            return pool.body, lambda: properties
+
+        # pika marshals the header frame inside basic_publish, so patching
+        # the shared headers dict before each publish is safe
+        headers = properties.headers
+
+        def stamped_properties():
+            headers[SENT_HEADER] = stamp()
+            return properties
+
+        return pool.body, stamped_properties
+
+    encode = codec.encode
+
+    def body_for(i):
+        return encode(build_message(i, payload))
+
+    def properties_for():
+        if stamp:
+            return pika.BasicProperties(delivery_mode=delivery_mode,
+                                        headers={SENT_HEADER: stamp()})
+        return pika.BasicProperties(delivery_mode=delivery_mode)
+
+    return body_for, properties_for
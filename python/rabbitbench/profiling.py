@@ -0,0 +1,236 @@
+"""Sampling profiler for benchmark processes.
+
+With ``profile_dir`` set, every process that starts live metrics (see
+:func:`metrics.start_reporting`) also starts a thread that snapshots the
+Python stack of every other thread each ``profile_interval`` seconds. Each
+process writes its counts as collapsed stacks (``frame;frame;frame
+count``, the input format of flamegraph.pl and speedscope) when it stops,
+and :func:`collect` merges the files of a trial into one per scenario and
+breaks the samples down by phase.
+
+Sampling is used rather than cProfile because cProfile's per-call hook
+roughly doubles the cost of the tight publish loops it is meant to
+explain, and records callers one level deep instead of whole stacks.
+Samples only see Python frames: time inside a C function such as
+``socket.send`` or ``datetime.now`` is charged to its Python caller.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from .config import BenchConfig
+
+RAW_DIR = 'raw'
+IDLE_THREADS = {'metrics-reporter', 'metrics-aggregator', 'profile-sampler',
+                'memory-sampler'}
+
+# (phase, path fragment, function name fragment); a stack is charged to the
+# first rule that matches its innermost matching frame
+PHASE_RULES = (
+    ('wait', 'select_connection.py', 'poll'),
+    ('wait', 'selectors.py', ''),
+    ('wait', 'threading.py', 'wait'),
+    ('wait', 'queues.py', 'get'),
+    ('wait', 'shmring.py', 'wait'),
+    ('socket', 'select_connection.py', ''),
+    ('socket', 'io_services_utils.py', ''),
+    ('socket', 'socket.py', ''),
+    ('socket', 'fastpath.py', 'write'),
+    ('encode', 'rabbitbench/codec.py', ''),
+    ('encode', 'json/', ''),
+    ('encode', 'pika/spec.py', ''),
+    ('encode', 'pika/frame.py', ''),
+    ('encode', 'pika/data.py', ''),
+    ('generate', 'rabbitbench/messages.py', ''),
+    ('generate', 'rabbitbench/payloads.py', ''),
+    ('ack', '', 'basic_ack'),
+    ('ack', '', 'basic_nack'),
+    ('ack', '', 'basic_reject'),
+    ('ack', 'rabbitbench/acking.py', ''),
+    ('ack', 'rabbitbench/confirms.py', ''),
+    ('publish', '', 'basic_publish'),
+    ('publish', 'rabbitbench/publisher.py', ''),
+    ('publish', 'rabbitbench/fastpath.py', ''),
+    ('consume', '', '_deliver'),
+    ('consume', '', 'on_message'),
+    ('consume', 'rabbitbench/scenarios/consumers.py', ''),
+)
+PHASES = ('generate', 'encode', 'publish', 'socket', 'ack', 'consume', 'wait',
+          'other')
+
+_active = None
+
+
+def frame_name(code) -> str:
+    """``package/module.py:Class.function`` for one code object"""
+    path = code.co_filename.replace('\\', '/')
+    short = '/'.join(path.rsplit('/', 2)[-2:])
+    return f'{short}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+def phase_of(stack: list) -> str:
+    """Phase of a stack of ``(path, function)`` pairs, innermost last"""
+    for path, function in reversed(stack):
+        for phase, path_part, function_part in PHASE_RULES:
+            if path_part in path and function_part in function:
+                return phase
+    return 'other'
+
+
+class Sampler:
+    """Counts the stacks of this process's threads from a daemon thread"""
+
+    def __init__(self, directory: str, role: str, worker_id: int,
+                 interval: float):
+        self.directory = directory
+        self.role = role
+        self.worker_id = worker_id
+        self.interval = interval
+        self.stacks = {}
+        self.phases = dict.fromkeys(PHASES, 0)
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='profile-sampler')
+
+    def sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, 'thread')
+            if name in IDLE_THREADS:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            key = ';'.join([self.role, name] + [frame_name(c) for c in stack])
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            phase = phase_of([(c.co_filename.replace('\\', '/'), c.co_name)
+                              for c in stack])
+            self.phases[phase] += 1
+            self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> 'Sampler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def write(self) -> None:
+        directory = os.path.join(self.directory, RAW_DIR)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.role}-{self.worker_id}-'
+                                       f'{os.getpid()}-{time.time_ns()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'role': self.role, 'worker': self.worker_id,
+                       'samples': self.samples, 'phases': self.phases,
+                       'stacks': self.stacks}, f)
+        # Rename so collect never reads a file still being written
+        os.replace(path + '.tmp', path)
+
+
+def start(config: BenchConfig, role: str, worker_id: int = 0) -> Sampler:
+    """Start sampling this process if ``profile_dir`` is set"""
+    global _active
+    stop()
+    if config.profile_dir:
+        _active = Sampler(config.profile_dir, role, worker_id,
+                          config.profile_interval).start()
+    return _active
+
+
+def stop() -> None:
+    """Stop sampling and write this process's stacks"""
+    global _active
+    if _active is not None:
+        sampler, _active = _active, None
+        sampler.stop()
+
+
+def _forget_in_child() -> None:
+    # A forked child must not write out the parent's samples
+    global _active
+    _active = None
+
+
+os.register_at_fork(after_in_child=_forget_in_child)
+
+
+def safe_name(label: str) -> str:
+    return re.sub(r'[^\w.,=-]+', '_', label)
+
+
+def read_collapsed(path: str) -> dict:
+    stacks = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                stacks[stack] = stacks.get(stack, 0) + int(count)
+    except FileNotFoundError:
+        pass
+    return stacks
+
+
+def collect(directory: str, label: str, append: bool = False) -> dict:
+    """Merge the per-process files of one trial into ``<label>.collapsed``
+
+    With ``append`` the stacks are added to the file's existing counts, so
+    it covers every trial; the returned breakdown, share of samples per
+    phase overall and per role, covers only this trial.
+    """
+    raw = os.path.join(directory, RAW_DIR)
+    path = os.path.join(directory, f'{safe_name(label)}.collapsed')
+    merged = read_collapsed(path) if append else {}
+    phases = dict.fromkeys(PHASES, 0)
+    roles = {}
+    samples = 0
+    for name in sorted(os.listdir(raw)) if os.path.isdir(raw) else []:
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(raw, name)) as f:
+            data = json.load(f)
+        os.remove(os.path.join(raw, name))
+        for stack, count in data['stacks'].items():
+            merged[stack] = merged.get(stack, 0) + count
+        role = roles.setdefault(data['role'], dict.fromkeys(PHASES, 0))
+        for phase, count in data['phases'].items():
+            phases[phase] += count
+            role[phase] += count
+        samples += data['samples']
+
+    with open(path, 'w') as f:
+        for stack, count in sorted(merged.items()):
+            f.write(f'{stack} {count}\n')
+
+    def shares(counts, skip=()):
+        total = sum(n for phase, n in counts.items() if phase not in skip)
+        return {phase: round(n / total, 4) for phase, n in counts.items()
+                if n and phase not in skip} if total else {}
+
+    # Waiting threads (the main process joining workers, pika's poller
+    # between deliveries) dilute the phases; ``busy`` leaves them out
+    return {'samples': samples, 'phases': shares(phases),
+            'busy': shares(phases, skip=('wait',)),
+            'roles': {role: shares(counts) for role, counts in roles.items()},
+            'collapsed': path}
+
+
+def format_phases(breakdown: dict) -> str:
+    """Busy time by phase, then the share of samples spent waiting"""
+    busy = sorted(breakdown['busy'].items(), key=lambda kv: -kv[1])
+    text = ', '.join(f'{phase} {share * 100:.0f}%' for phase, share in busy)
+    waiting = breakdown['phases'].get('wait', 0.0)
+    return f'{text or "idle"} (waiting in {waiting * 100:.0f}% of samples)'
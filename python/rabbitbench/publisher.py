@@ -0,0 +1,54 @@
+import time
+
+from . import metrics
+from .config import BenchConfig
+from .payloads import message_factory
+
+
+def publish_range(channel, config: BenchConfig, start_id: int, count: int,
+                  routing_key: str = None, progress_from: float = None,
+                  messages=None, pacer=None) -> int:
+    """Publish ``count`` messages with ids starting at ``start_id``
+
+    This is the loop every producer script used to copy: build the message
+    dict, JSON-encode it and publish with fresh properties, or take bodies
+    from a pre-encoded pool when ``preencode`` is set. ``messages`` is a
+    ``(body_for, properties_for)`` pair from :func:`message_factory`, passed
+    in to reuse one pool across calls. A ``pacer`` (see :func:`pacer_for`)
+    releases messages in per-tick bursts; the legacy ``sleep_time`` instead
+    sleeps after each message. ``progress_every`` prints the running rate
+    measured from ``progress_from``.
+    """
+    routing_key = routing_key or config.queue
+    sleep_time = config.sleep_time
+    progress_every = config.progress_every
+    body_for, properties_for = messages or message_factory(config)
+    live = metrics.active()
+    budget = 0
+
+    for n, i in enumerate(range(start_id, start_id + count), 1):
+        if pacer is not None:
+            while not budget:
+                budget = pacer.acquire(count - n + 1)
+            budget -= 1
+
+        body = body_for(i)
+        channel.basic_publish(
+            exchange='',
+            routing_key=routing_key,
+            body=body,
+            properties=properties_for(),
+        )
+        if pacer is not None:
+            pacer.sent()
+        if live is not None:
+            live.on_publish(len(body))
+
+        if progress_every and progress_from and n % progress_every == 0:
+            rate = n / (time.time() - progress_from)
+            print(f'Sent {n} messages - Rate: {rate:.0f} msgs/sec')
+
+        if sleep_time:
+            time.sleep(sleep_time)
+
+    return count
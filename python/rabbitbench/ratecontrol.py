@@ -0,0 +1,223 @@
+"""Closed-loop publish rate control.
+
+Instead of sleeping after every message, :class:`RateController` wakes once
+per ``tick`` and releases however many messages the target profile says
+should have been sent by now, minus what was already released. Running
+behind (a slow publish, a late wake-up) is therefore corrected on the next
+tick rather than accumulating as drift, and sub-millisecond sleeps are
+never needed. Bursts after a stall are capped at ``max_burst_ticks`` ticks
+worth of messages so a long pause does not turn into a flood; a stall
+longer than that is skipped, and what it should have sent still counts
+towards the target but is never released.
+
+Publish loops call :meth:`RateController.sent` once messages are actually
+written, so the achieved rate counts those rather than the messages
+released, some of which may still sit in a batch or envelope.
+
+Profiles are given as strings:
+
+    constant:5000              5000 msgs/sec
+    step:1000@10,5000@20       1000 msgs/sec for 10 s, then 5000 for 20 s
+    ramp:1000:20000:60         linear from 1000 to 20000 msgs/sec over 60 s
+    sine:10000:5000:30         10000 +/- 5000 msgs/sec with a 30 s period
+    trace:rates.csv            "seconds,rate" rows, linearly interpolated
+
+Every profile holds its last rate once it runs out.
+"""
+
+import bisect
+import csv
+import math
+import time
+
+from .config import BenchConfig
+from .latency import LatencyHistogram
+
+
+class Profile:
+    """Target rate as a function of seconds since the start"""
+
+    def rate_at(self, t: float) -> float:
+        raise NotImplementedError
+
+
+class ConstantProfile(Profile):
+    def __init__(self, rate: float):
+        self.rate = rate
+
+    def rate_at(self, t):
+        return self.rate
+
+
+class PiecewiseProfile(Profile):
+    """Linear interpolation between ``(t, rate)`` points"""
+
+    def __init__(self, points, stepped: bool = False):
+        if not points:
+            raise ValueError('A rate profile needs at least one point')
+        self.times = [t for t, _ in points]
+        self.rates = [r for _, r in points]
+        self.stepped = stepped
+
+    def rate_at(self, t):
+        i = bisect.bisect_right(self.times, t) - 1
+        if i < 0:
+            return self.rates[0]
+        if self.stepped or i + 1 >= len(self.times):
+            return self.rates[i]
+        t0, t1 = self.times[i], self.times[i + 1]
+        r0, r1 = self.rates[i], self.rates[i + 1]
+        return r0 + (r1 - r0) * (t - t0) / (t1 - t0) if t1 > t0 else r1
+
+
+class SineProfile(Profile):
+    def __init__(self, mean: float, amplitude: float, period: float):
+        self.mean = mean
+        self.amplitude = amplitude
+        self.period = period
+
+    def rate_at(self, t):
+        rate = self.mean + self.amplitude * math.sin(2 * math.pi * t / self.period)
+        return max(rate, 0.0)
+
+
+def parse_profile(spec: str) -> Profile:
+    """Build a :class:`Profile` from a ``kind:args`` string"""
+    kind, _, args = spec.partition(':')
+    try:
+        if kind == 'constant':
+            return ConstantProfile(float(args))
+        if kind == 'step':
+            points, t = [], 0.0
+            for step in args.split(','):
+                rate, _, seconds = step.partition('@')
+                points.append((t, float(rate)))
+                t += float(seconds or 0)
+            return PiecewiseProfile(points, stepped=True)
+        if kind == 'ramp':
+            start, end, seconds = (float(v) for v in args.split(':'))
+            return PiecewiseProfile([(0.0, start), (seconds, end)])
+        if kind == 'sine':
+            mean, amplitude, period = (float(v) for v in args.split(':'))
+            return SineProfile(mean, amplitude, period)
+        if kind == 'trace':
+            with open(args, newline='') as f:
+                points = [(float(row[0]), float(row[1])) for row in csv.reader(f)
+                          if row and not row[0].startswith('#')
+                          and row[0].strip().replace('.', '', 1).isdigit()]
+            return PiecewiseProfile(sorted(points))
+    except (ValueError, OSError) as e:
+        raise ValueError(f'Invalid rate profile {spec!r}: {e}') from None
+    raise ValueError(f'Unknown rate profile {kind!r}; expected constant, '
+                     f'step, ramp, sine or trace')
+
+
+class RateController:
+    """Releases messages in per-tick bursts that track a target profile"""
+
+    def __init__(self, profile: Profile, tick: float = 0.01, scale: float = 1.0,
+                 max_burst_ticks: int = 10):
+        self.profile = profile
+        self.tick = tick
+        self.scale = scale
+        self.max_burst_ticks = max_burst_ticks
+        self.jitter = LatencyHistogram()
+        self.released = 0
+        self.published = 0
+        self.target = 0.0
+        self.skipped = 0.0     # target over ticks skipped after a stall
+        self.timeline = []
+        self._start = None
+        self._ticks = 0
+        self._second = 0
+        self._second_target = 0.0
+        self._second_published = 0
+        self._published_seen = 0
+
+    def start(self) -> None:
+        self._start = time.perf_counter()
+        self._ticks = 0
+
+    def acquire(self, limit: int) -> int:
+        """Wait for the next tick and return how many messages may go now"""
+        if self._start is None:
+            self.start()
+
+        deadline = self._start + self._ticks * self.tick
+        now = time.perf_counter()
+        if now < deadline:
+            time.sleep(deadline - now)
+            now = time.perf_counter()
+        self.jitter.record((now - deadline) * 1e9)
+
+        # Skip ticks we overslept by more than the burst cap instead of
+        # trying to catch up on them; they still count towards the target
+        if now - deadline > self.tick * self.max_burst_ticks:
+            for tick in range(self._ticks, int((now - self._start) / self.tick)):
+                elapsed = tick * self.tick
+                due = self.profile.rate_at(elapsed) * self.scale * self.tick
+                self.target += due
+                self.skipped += due
+                self._account(elapsed, due)
+                self._ticks = tick + 1
+
+        # Integrate the profile over this tick
+        elapsed = self._ticks * self.tick
+        due = self.profile.rate_at(elapsed) * self.scale * self.tick
+        self.target += due
+        self._ticks += 1
+
+        allowed = int(self.target - self.skipped) - self.released
+        cap = max(int(due * self.max_burst_ticks), 1)
+        allowed = max(min(allowed, cap, limit), 0)
+        self.released += allowed
+        self._account(elapsed, due)
+        return allowed
+
+    def sent(self, count: int = 1) -> None:
+        """Count ``count`` messages as published"""
+        self.published += count
+
+    def _account(self, elapsed: float, due: float) -> None:
+        second = int(elapsed)
+        if second != self._second:
+            self._flush_second()
+            self._second = second
+        self._second_target += due
+
+    def _flush_second(self) -> None:
+        # Messages published since the last flush land in the second being
+        # closed: acquire runs once per tick, so they went out within it
+        published = self.published - self._published_seen
+        self._published_seen = self.published
+        if self._second_target or published:
+            self.timeline.append({'t': self._second,
+                                  'target': round(self._second_target, 1),
+                                  'achieved': published})
+        self._second_target = 0.0
+
+    def report(self) -> dict:
+        """Target vs achieved rate over the run plus tick scheduling jitter"""
+        self._flush_second()
+        elapsed = time.perf_counter() - self._start if self._start else 0.0
+        return {
+            'target_rate': round(self.target / elapsed, 1) if elapsed else 0.0,
+            'achieved_rate': round(self.published / elapsed, 1) if elapsed else 0.0,
+            'tick_ms': self.tick * 1e3,
+            'jitter_us': self.jitter.summary(scale=1e3),
+            'timeline': self.timeline,
+        }
+
+
+def pacer_for(config: BenchConfig, scale: float = 1.0):
+    """A :class:`RateController` for the config, or ``None`` when unlimited
+
+    ``scale`` splits the target between workers sharing one profile.
+    """
+    if config.rate_profile:
+        profile = parse_profile(config.rate_profile)
+    elif config.rate > 0:
+        profile = ConstantProfile(config.rate)
+    else:
+        return None
+    return RateController(profile, tick=config.rate_tick, scale=scale)
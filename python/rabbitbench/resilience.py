@@ -0,0 +1,362 @@
+"""Connections that survive a broker restart.
+
+:class:`RecoveringSession` is an :class:`AsyncSession` that reconnects
+when its connection drops, waiting an exponentially growing delay between
+attempts, and then runs its ``setup`` hooks again: the queue declare first,
+then whatever the publisher or consumer on it registered (confirm mode,
+qos, ``basic.consume``). It gives up once an outage has lasted
+``reconnect_timeout`` seconds.
+
+:class:`ResilientPublisher` holds every message until the broker confirms
+it. Publishes still unconfirmed when the connection drops go back to the
+front of a local buffer, ahead of what the producer generates during the
+outage, and are sent again once the session is back. Some of them may
+have reached the queue already, so delivery is at-least-once;
+:class:`RecoveringConsumer` counts those duplicates and redeliveries by
+``message_id``.
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+
+import pika
+
+from . import metrics
+from .acking import AckBatcher
+from .aio import AsyncSession
+from .codec import codec_for
+from .config import BenchConfig
+from .connection import consume_arguments
+from .payloads import message_factory
+
+
+class Backoff:
+    """Delays from ``initial`` seconds, doubling up to ``maximum``
+
+    Each delay is drawn from the upper half of its step so clients that
+    lost the broker at the same moment don't all retry at once.
+    """
+
+    def __init__(self, initial: float, maximum: float, multiplier: float = 2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+
+    def delays(self):
+        delay = self.initial
+        while True:
+            yield random.uniform(delay / 2, delay)
+            delay = min(delay * self.multiplier, self.maximum)
+
+
+async def declare_topology(session: 'RecoveringSession') -> None:
+    await session.declare_queue()
+
+
+class RecoveringSession(AsyncSession):
+    """An asyncio session that reconnects and redeclares after a drop
+
+    ``setup`` hooks are coroutine functions taking the session, run in
+    order on every new channel before :attr:`ready` is set; ``on_lost``
+    callbacks run as soon as a drop is noticed. :attr:`outages` records
+    each one: when it was noticed, when the session was ready again and
+    how many connection attempts that took.
+    """
+
+    def __init__(self, config: BenchConfig, role: str = 'client'):
+        super().__init__(config)
+        self.role = role
+        self.setup = [declare_topology]
+        self.on_lost = []
+        self.outages = []
+        self.failed = None
+        self.closing = False
+        self.ready = asyncio.Event()
+        self._watcher = None
+
+    async def open(self, quiet: bool = False) -> 'RecoveringSession':
+        await self._establish()
+        self._watcher = asyncio.ensure_future(self._watch())
+        return self
+
+    async def _establish(self) -> int:
+        """Connect, open a channel and run the setup hooks; returns attempts"""
+        config = self.config
+        delays = Backoff(config.reconnect_initial, config.reconnect_max).delays()
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.connection = await self._connect()
+                await self._guard(self._open_channel())
+                for hook in self.setup:
+                    await self._guard(hook(self))
+            except (pika.exceptions.AMQPError, OSError) as e:
+                delay = next(delays)
+                if time.monotonic() - started + delay > config.reconnect_timeout:
+                    raise ConnectionError(
+                        f'{self.role} could not reconnect to {config.host}:'
+                        f'{config.port} within {config.reconnect_timeout:g}s: '
+                        f'{e!r}') from e
+                await asyncio.sleep(delay)
+            else:
+                self.ready.set()
+                return attempt
+
+    async def _open_channel(self) -> None:
+        opened = asyncio.get_running_loop().create_future()
+        self.connection.channel(on_open_callback=opened.set_result)
+        self.channel = await opened
+        self.channel.add_on_close_callback(self._on_channel_closed)
+
+    def _on_channel_closed(self, channel, reason) -> None:
+        # A channel error is recovered the same way as a lost connection
+        if channel is self.channel and not self.closing and \
+                self.connection.is_open:
+            self.connection.close()
+
+    async def _guard(self, awaitable):
+        """Await ``awaitable``, unless the connection closes first"""
+        task = asyncio.ensure_future(awaitable)
+        await asyncio.wait({task, self._closed},
+                           return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        task.cancel()
+        raise pika.exceptions.AMQPConnectionError(self._closed.result())
+
+    async def _watch(self) -> None:
+        while True:
+            # Shielded so cancelling the watcher leaves the future to close()
+            reason = await asyncio.shield(self._closed)
+            if self.closing:
+                return
+            lost_at = time.time()
+            self.ready.clear()
+            for callback in self.on_lost:
+                callback()
+            try:
+                attempts = await self._establish()
+            except ConnectionError as e:
+                self.failed = e
+                self.ready.set()
+                return
+            self.outages.append({'lost_at': lost_at, 'ready_at': time.time(),
+                                 'attempts': attempts, 'reason': str(reason)})
+
+    async def wait_ready(self) -> None:
+        await self.ready.wait()
+        if self.failed is not None:
+            raise self.failed
+
+    async def close(self) -> None:
+        self.closing = True
+        if self._watcher is not None:
+            self._watcher.cancel()
+        connection = self.connection
+        if connection is None or connection.is_closed:
+            return
+        if not connection.is_closing:
+            connection.close()
+        await self._closed
+
+
+async def wait_for(event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+class ResilientPublisher:
+    """Publishes with confirms through a :class:`RecoveringSession`
+
+    Up to ``window`` publishes are unconfirmed at once. While the session
+    is down, generated messages wait in the local buffer, up to
+    ``reconnect_buffer`` of them before the producer blocks. Every message
+    carries its id as ``message_id``.
+    """
+
+    def __init__(self, session: RecoveringSession, window: int):
+        self.session = session
+        self.config = session.config
+        self.window = max(window, 1)
+        self.messages = message_factory(self.config)
+        self.buffer = deque()         # ids waiting to be sent, oldest first
+        self.pending = OrderedDict()  # delivery tag -> id on this channel
+        self.next_tag = 1
+        self.confirmed = set()
+        self.generated = 0
+        self.nacked = 0
+        self.buffered = 0             # generated while disconnected
+        self.max_buffered = 0
+        self.republished = 0          # unconfirmed at a drop, sent again
+        self.changed = asyncio.Event()
+        session.setup.append(self._on_open)
+        session.on_lost.append(self._on_lost)
+
+    async def _on_open(self, session: RecoveringSession) -> None:
+        self.next_tag = 1
+        await session._call(session.channel.confirm_delivery, self._on_confirm)
+        # Wake the producer once the session is ready, after the last hook
+        asyncio.get_running_loop().call_soon(self.changed.set)
+
+    def _on_lost(self) -> None:
+        ids = list(self.pending.values())
+        self.pending.clear()
+        self.buffer.extendleft(reversed(ids))
+        self.republished += len(ids)
+        self.changed.set()
+
+    def _on_confirm(self, frame) -> None:
+        method = frame.method
+        if method.multiple:
+            tags = []
+            for tag in self.pending:
+                if tag > method.delivery_tag:
+                    break
+                tags.append(tag)
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self.pending else []
+        nack = isinstance(method, pika.spec.Basic.Nack)
+        for tag in tags:
+            message_id = self.pending.pop(tag)
+            if nack:
+                self.nacked += 1
+            else:
+                self.confirmed.add(message_id)
+        live = metrics.active()
+        if live is not None:
+            live.on_confirm(len(tags), nack)
+        self._send()
+        self.changed.set()
+
+    def _send(self) -> None:
+        channel = self.session.channel
+        if not self.session.ready.is_set() or not channel.is_open:
+            return
+        body_for, properties_for = self.messages
+        live = metrics.active()
+        while self.buffer and len(self.pending) < self.window:
+            message_id = self.buffer[0]
+            body = body_for(message_id)
+            properties = properties_for()
+            properties.message_id = str(message_id)
+            try:
+                channel.basic_publish(exchange='', routing_key=self.config.queue,
+                                      body=body, properties=properties)
+            except pika.exceptions.AMQPError:
+                return  # dropped mid-burst; _on_lost re-buffers what's pending
+            self.buffer.popleft()
+            self.pending[self.next_tag] = message_id
+            self.next_tag += 1
+            if live is not None:
+                live.on_publish(len(body))
+
+    def _blocked(self) -> bool:
+        if self.session.ready.is_set():
+            self._send()
+            return bool(self.buffer)  # the window is full
+        return len(self.buffer) >= self.config.reconnect_buffer
+
+    async def _wait(self) -> None:
+        self.changed.clear()
+        await wait_for(self.changed, 0.1)
+        if self.session.failed is not None:
+            raise self.session.failed
+
+    async def publish(self, count: int, rate: float = 0.0) -> int:
+        """Generate ``count`` messages, at ``rate`` msgs/sec if set, and
+        return once every one has been confirmed or nacked"""
+        yield_every = max(self.config.batch_size, 1)
+        start = time.perf_counter()
+        for i in range(count):
+            if rate:
+                delay = start + i / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            while self._blocked():
+                await self._wait()
+            self.buffer.append(i)
+            self.generated += 1
+            if not self.session.ready.is_set():
+                self.buffered += 1
+                self.max_buffered = max(self.max_buffered, len(self.buffer))
+            self._send()
+            if not rate and self.generated % yield_every == 0:
+                await asyncio.sleep(0)
+        while self.buffer or self.pending:
+            self._send()
+            await self._wait()
+        return count
+
+
+class RecoveringConsumer:
+    """Consumes through a :class:`RecoveringSession`, spotting duplicates
+
+    A delivery whose ``message_id`` was already seen is acked and counted
+    as a duplicate; ``redelivered`` counts deliveries the broker flagged.
+    """
+
+    def __init__(self, session: RecoveringSession, expected: int):
+        self.session = session
+        self.config = session.config
+        self.expected = expected
+        self.decode = codec_for(self.config).decode
+        self.seen = set()
+        self.deliveries = 0
+        self.duplicates = 0
+        self.redelivered = 0
+        self.bytes = 0
+        self.last_time = None
+        self.acks = None
+        self.live = metrics.active()
+        self.done = asyncio.Event()
+        session.setup.append(self._on_open)
+
+    async def _on_open(self, session: RecoveringSession) -> None:
+        config = self.config
+        await session.qos(config.prefetch_count)
+        self.acks = AckBatcher(session.channel, config.ack_every,
+                               config.ack_interval, config.prefetch_count)
+        session.channel.basic_consume(config.queue, self._on_message,
+                                      auto_ack=False,
+                                      arguments=consume_arguments(config))
+
+    def _on_message(self, channel, method, properties, body) -> None:
+        self.decode(body)
+        self.deliveries += 1
+        if method.redelivered:
+            self.redelivered += 1
+        message_id = int(properties.message_id)
+        if message_id in self.seen:
+            self.duplicates += 1
+        else:
+            self.seen.add(message_id)
+            self.bytes += len(body)
+            self.last_time = time.time()
+        if self.live is not None:
+            self.live.on_consume(len(body))
+        self.acks.delivered(method.delivery_tag)
+        if len(self.seen) >= self.expected and not self.done.is_set():
+            self.acks.flush()
+            self.done.set()
+
+    async def wait(self) -> int:
+        """Wait until every expected message arrived, or none has for
+        ``consume_timeout`` seconds while connected; returns how many did"""
+        idle_since, last = time.monotonic(), -1
+        while not self.done.is_set():
+            if self.session.failed is not None:
+                raise self.session.failed
+            if not self.session.ready.is_set() or self.deliveries != last:
+                idle_since, last = time.monotonic(), self.deliveries
+            elif time.monotonic() - idle_since >= self.config.consume_timeout:
+                break
+            elif self.acks is not None and self.session.channel.is_open:
+                self.acks.tick()
+            await wait_for(self.done, 0.05)
+        return len(self.seen)
@@ -0,0 +1,223 @@
+import csv
+import json
+import platform
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List
+
+from .runtime import free_threaded_build, gil_enabled
+from .stats import describe
+
+
+@dataclass
+class TrialResult:
+    """Outcome of one timed trial of a scenario (warmup excluded)"""
+
+    messages: int
+    duration: float
+    bytes: int = 0
+    extra: dict = field(default_factory=dict)
+    workers: List[dict] = field(default_factory=list)
+    trial: int = 0
+
+    @property
+    def rate(self) -> float:
+        return self.messages / self.duration if self.duration > 0 else 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.bytes / 1e6 / self.duration if self.duration > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data['rate'] = self.rate
+        data['mb_per_sec'] = self.mb_per_sec
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TrialResult':
+        """Rebuild from :meth:`as_dict` output; derived rates are dropped"""
+        return cls(messages=data['messages'], duration=data['duration'],
+                   bytes=data.get('bytes', 0), extra=data.get('extra', {}),
+                   workers=data.get('workers', []), trial=data.get('trial', 0))
+
+
+@dataclass
+class ScenarioResult:
+    """All trials of one scenario plus the config that produced them"""
+
+    scenario: str
+    config: dict
+    trials: List[TrialResult] = field(default_factory=list)
+    variant: str = ''
+    started_at: float = field(default_factory=time.time)
+    environment: dict = field(default_factory=lambda: {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'free_threaded_build': free_threaded_build(),
+        'gil_enabled': gil_enabled(),
+    })
+
+    @property
+    def label(self) -> str:
+        return f'{self.scenario}[{self.variant}]' if self.variant else self.scenario
+
+    def summary(self) -> dict:
+        rates = [t.rate for t in self.trials]
+        if not rates:
+            return {}
+        summary = {
+            'trials': len(rates),
+            'mean_rate': statistics.fmean(rates),
+            'stdev_rate': statistics.stdev(rates) if len(rates) > 1 else 0.0,
+        }
+        if len(rates) > 1:
+            # One trial has no spread to build an interval from
+            described = describe(rates)
+            summary['ci95_low_rate'] = described['ci_low']
+            summary['ci95_high_rate'] = described['ci_high']
+        summary.update({
+            'min_rate': min(rates),
+            'max_rate': max(rates),
+            'mean_mb_per_sec': statistics.fmean(t.mb_per_sec for t in self.trials),
+            'total_messages': sum(t.messages for t in self.trials),
+        })
+        return summary
+
+    def as_dict(self) -> dict:
+        return {
+            'scenario': self.scenario,
+            'variant': self.variant,
+            'started_at': self.started_at,
+            'environment': self.environment,
+            'config': self.config,
+            'summary': self.summary(),
+            'trials': [t.as_dict() for t in self.trials],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ScenarioResult':
+        """Rebuild a result written by :func:`write_json`"""
+        result = cls(scenario=data['scenario'], config=data['config'],
+                     trials=[TrialResult.from_dict(t) for t in data['trials']],
+                     variant=data.get('variant', ''))
+        result.started_at = data.get('started_at', result.started_at)
+        result.environment = data.get('environment', result.environment)
+        return result
+
+
+CSV_FIELDS = ['scenario', 'variant', 'trial', 'messages', 'duration', 'rate',
+              'bytes', 'mb_per_sec']
+
+
+def flatten(extra: dict, prefix: str = '') -> dict:
+    """Scalar metrics from ``extra``, with nested dicts as ``outer.inner``"""
+    flat = {}
+    for key, value in extra.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float, str, bool)):
+            flat[name] = value
+    return flat
+
+
+def write_json(results: List[ScenarioResult], path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump([r.as_dict() for r in results], f, indent=2, default=str)
+        f.write('\n')
+
+
+def write_csv(results: List[ScenarioResult], path: str) -> None:
+    """One row per trial; ``extra`` metrics become extra columns"""
+    rows = []
+    extra_fields = []
+    for result in results:
+        for trial in result.trials:
+            row = {
+                'scenario': result.scenario,
+                'variant': result.variant,
+                'trial': trial.trial,
+                'messages': trial.messages,
+                'duration': f'{trial.duration:.6f}',
+                'rate': f'{trial.rate:.2f}',
+                'bytes': trial.bytes,
+                'mb_per_sec': f'{trial.mb_per_sec:.3f}',
+            }
+            for key, value in flatten(trial.extra).items():
+                row[key] = value
+                if key not in extra_fields:
+                    extra_fields.append(key)
+            rows.append(row)
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS + extra_fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_results(results: List[ScenarioResult], path: str) -> None:
+    """Write results as CSV or JSON depending on the file extension"""
+    if path.endswith('.csv'):
+        write_csv(results, path)
+    else:
+        write_json(results, path)
+
+
+def load_results(path: str) -> List[dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_results(path: str) -> List[ScenarioResult]:
+    """Results from a file written by :func:`write_json`"""
+    if path.endswith('.csv'):
+        raise ValueError(f'{path}: comparisons need the JSON results, not CSV')
+    return [ScenarioResult.from_dict(data) for data in load_results(path)]
+
+
+def print_summary(result: ScenarioResult) -> None:
+    summary = result.summary()
+    if not summary:
+        print(f'{result.label}: no trials completed')
+        return
+    interval = ''
+    if 'ci95_low_rate' in summary:
+        interval = (f'95% CI {summary["ci95_low_rate"]:.0f}-'
+                    f'{summary["ci95_high_rate"]:.0f}, ')
+    print(f'{result.label}: {summary["mean_rate"]:.0f} msgs/sec '
+          f'({interval}stdev {summary["stdev_rate"]:.0f}, '
+          f'min {summary["min_rate"]:.0f}, max {summary["max_rate"]:.0f}, '
+          f'{summary["trials"]} trials)')
+
+
+def format_table(results: List[ScenarioResult], columns) -> str:
+    """Mean rate and the mean of each ``extra`` column, one row per result
+
+    Columns use :func:`flatten` names, e.g. ``confirm_latency_ms.p99``;
+    non-numeric values show the last trial's value.
+    """
+    header = ['scenario', 'msgs/sec'] + list(columns)
+    rows = []
+    for result in results:
+        flat = [flatten(trial.extra) for trial in result.trials]
+        row = [result.label, f'{result.summary().get("mean_rate", 0.0):.0f}']
+        for column in columns:
+            values = [f[column] for f in flat if column in f]
+            if not values:
+                row.append('-')
+            elif all(isinstance(v, (int, float)) and not isinstance(v, bool)
+                     for v in values):
+                row.append(f'{statistics.fmean(values):.6g}')
+            else:
+                row.append(str(values[-1]))
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows + [header])
+              for i in range(len(header))]
+    lines = ['  '.join(f'{cell:<{w}}' if i == 0 else f'{cell:>{w}}'
+                       for i, (cell, w) in enumerate(zip(row, widths)))
+             for row in [header] + rows]
+    return '\n'.join(lines)
@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+import time
+
+from . import impairment, memory, metrics, profiling
+from .config import BenchConfig
+from .results import ScenarioResult
+from .scenarios import get_scenario
+
+
+def resolve_config(name: str, overrides: dict = None,
+                   base: BenchConfig = None) -> BenchConfig:
+    """Layer a scenario's defaults and then explicit overrides onto ``base``"""
+    definition = get_scenario(name)
+    config = (base or BenchConfig()).replace(**definition.defaults)
+    return config.replace(**(overrides or {}))
+
+
+def run_scenario(name: str, config: BenchConfig = None, overrides: dict = None,
+                 trial_pause: float = 0.0, verbose: bool = True,
+                 variant: str = '') -> ScenarioResult:
+    """Run every trial of scenario ``name`` and collect the results"""
+    definition = get_scenario(name)
+    config = resolve_config(name, overrides, config)
+    result = ScenarioResult(scenario=name, config=config.as_dict(),
+                            variant=variant)
+    name = result.label
+
+    scratch = None
+    if config.memory and not config.memory_dir:
+        scratch = tempfile.mkdtemp(prefix='rabbitbench-memory-')
+        config = config.replace(memory_dir=scratch)
+    proxy = None
+    if impairment.impaired(config):
+        proxy, port = impairment.start_proxy_process(config)
+        config = config.replace(host='127.0.0.1', port=port)
+        if verbose:
+            print(f'[{name}] through impairment proxy on 127.0.0.1:{port}: '
+                  f'{impairment.describe(config)}')
+    try:
+        run_trials(definition, config, result, trial_pause, verbose)
+    finally:
+        if proxy is not None:
+            proxy.terminate()
+            proxy.join()
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return result
+
+
+def run_trials(definition, config: BenchConfig, result: ScenarioResult,
+               trial_pause: float, verbose: bool) -> None:
+    name = result.label
+    for trial in range(1, config.trials + 1):
+        if verbose:
+            print(f'[{name}] trial {trial}/{config.trials}: '
+                  f'{config.message_count} messages '
+                  f'(+{config.warmup} warmup)')
+        metrics.start_reporting(config, 'main')
+        try:
+            trial_result = definition.func(config)
+        finally:
+            metrics.stop_reporting()
+        trial_result.trial = trial
+        result.trials.append(trial_result)
+        if verbose:
+            print(f'[{name}] trial {trial}: {trial_result.messages} messages in '
+                  f'{trial_result.duration:.2f}s '
+                  f'({trial_result.rate:.0f} msgs/sec)')
+        if config.memory:
+            usage = memory.collect(config.memory_dir, trial_result.messages,
+                                   trial_result.rate)
+            trial_result.extra['memory'] = usage
+            if verbose:
+                print(f'[{name}] memory: {memory.format_memory(usage)}')
+        if config.profile_dir:
+            profile = profiling.collect(config.profile_dir, name,
+                                        append=trial > 1)
+            trial_result.extra['profile'] = profile
+            if verbose:
+                print(f'[{name}] profile ({profile["samples"]} samples): '
+                      f'{profiling.format_phases(profile)}')
+        if trial_pause and trial < config.trials:
+            time.sleep(trial_pause)
@@ -0,0 +1,53 @@
+"""What the running interpreter can do for parallel workers.
+
+A free-threaded build (``python3.13t`` and later, PEP 703) can run Python
+threads in parallel, but it re-enables the GIL when an extension module
+that doesn't declare support is imported, or with ``PYTHON_GIL=1``, so the
+build flag alone isn't enough: :func:`capabilities` also asks the
+interpreter whether the GIL is on right now. Sub-interpreters with their
+own GIL (PEP 684) are usable from Python through PEP 734's
+``concurrent.interpreters``, added in 3.14.
+"""
+
+import platform
+import sys
+import sysconfig
+
+try:
+    from concurrent import interpreters
+except ImportError:  # before Python 3.14
+    interpreters = None
+
+
+def free_threaded_build() -> bool:
+    """Whether this CPython was built with ``--disable-gil``"""
+    return bool(sysconfig.get_config_var('Py_GIL_DISABLED'))
+
+
+def gil_enabled() -> bool:
+    """Whether the GIL is on right now; always true before 3.13"""
+    check = getattr(sys, '_is_gil_enabled', None)
+    return check() if check is not None else True
+
+
+def subinterpreters_available() -> bool:
+    return interpreters is not None
+
+
+def capabilities() -> dict:
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'free_threaded_build': free_threaded_build(),
+        'gil_enabled': gil_enabled(),
+        'subinterpreters': subinterpreters_available(),
+    }
+
+
+def format_capabilities(caps: dict) -> str:
+    threads = ('free-threaded, GIL off' if not caps['gil_enabled']
+               else 'free-threaded build, GIL re-enabled'
+               if caps['free_threaded_build'] else 'GIL')
+    subs = 'available' if caps['subinterpreters'] else 'unavailable'
+    return (f'{caps["implementation"]} {caps["python"]} ({threads}); '
+            f'sub-interpreters {subs}')
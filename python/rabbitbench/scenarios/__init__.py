@@ -0,0 +1,59 @@
+"""Scenario registry.
+
+A scenario is a function taking a :class:`BenchConfig` and returning a
+:class:`TrialResult` for one timed trial. Register new ones with the
+``@scenario`` decorator; keyword arguments become that scenario's config
+defaults, which explicit command-line options still override.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict
+
+from ..config import BenchConfig
+from ..results import TrialResult
+
+
+@dataclass
+class Scenario:
+    name: str
+    func: Callable[[BenchConfig], TrialResult]
+    kind: str = 'producer'
+    defaults: dict = field(default_factory=dict)
+    table: tuple = ()   # extra metrics worth comparing across variants
+
+    @property
+    def description(self) -> str:
+        doc = self.func.__doc__ or ''
+        return doc.strip().splitlines()[0] if doc.strip() else ''
+
+
+SCENARIOS: Dict[str, Scenario] = {}
+
+
+def scenario(name: str, kind: str = 'producer', table: tuple = (), **defaults):
+    """Register ``func`` as a benchmark scenario called ``name``
+
+    ``table`` names ``extra`` metrics (``outer.inner`` for nested ones) that
+    ``rabbitbench run`` prints side by side when several variants ran.
+    """
+    def decorator(func):
+        if name in SCENARIOS:
+            raise ValueError(f'Scenario {name!r} is already registered')
+        SCENARIOS[name] = Scenario(name, func, kind, defaults, tuple(table))
+        return func
+    return decorator
+
+
+def get_scenario(name: str) -> Scenario:
+    try:
+        return SCENARIOS[name]
+    except KeyError:
+        known = ', '.join(sorted(SCENARIOS))
+        raise KeyError(f'Unknown scenario {name!r} (known: {known})') from None
+
+
+# Importing the modules registers their scenarios
+from . import (aio, confirms, consumers, coordinated,  # noqa: E402,F401
+               envelopes, latency, micro, multiplex, multiprocess, parallel,
+               payload, pipeline, pool, processing, producers, queues,
+               recovery)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from ..aio import AsyncConsumer, AsyncPublisher, AsyncSession
+from ..config import BenchConfig
+from ..results import TrialResult
+from . import scenario
+
+
+async def async_publish_trial(config: BenchConfig) -> TrialResult:
+    async with AsyncSession(config) as session:
+        await session.declare_queue()
+        publisher = AsyncPublisher(session)
+        await publisher.setup()
+
+        await publisher.publish(0, config.warmup)
+        start_time = time.time()
+        sent = await publisher.publish(config.warmup, config.message_count)
+        duration = time.time() - start_time
+
+    return TrialResult(messages=sent, duration=duration,
+                       extra={'concurrency': config.concurrency,
+                              'nacked': publisher.nacked})
+
+
+async def async_consume_trial(config: BenchConfig) -> TrialResult:
+    async with AsyncSession(config) as session:
+        await session.declare_queue()
+        consumer = AsyncConsumer(session)
+        received = await consumer.consume(config.message_count)
+
+    end_time = consumer.end_time or consumer.last_time or time.time()
+    timed = max(received - config.warmup, 0)
+    duration = end_time - consumer.start_time if consumer.start_time else 0.0
+    extra = {'concurrency': config.concurrency,
+             'timed_out': consumer.end_time is None}
+    if consumer.latency:
+        extra.update(consumer.latency.finish())
+    return TrialResult(messages=timed, duration=duration, extra=extra)
+
+
+@scenario('async_publish', queue='fast_queue', durable=False, persistent=False)
+def async_publish(config: BenchConfig) -> TrialResult:
+    """asyncio publisher with `concurrency` unconfirmed messages in flight"""
+    return asyncio.run(async_publish_trial(config))
+
+
+@scenario('async_consume', kind='consumer', queue='fast_queue', durable=False)
+def async_consume(config: BenchConfig) -> TrialResult:
+    """asyncio consumer with `concurrency` deliveries prefetched"""
+    return asyncio.run(async_consume_trial(config))
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pika
+
+from .. import metrics
+from ..aio import AsyncPublisher, AsyncSession
+from ..config import BenchConfig
+from ..confirms import ConfirmTracker
+from ..connection import connect, declare_queue
+from ..payloads import message_factory
+from ..publisher import publish_range
+from ..results import TrialResult
+from . import scenario
+
+CONFIRM_MODES = ('none', 'sync', 'window')
+
+
+def blocking_confirm_trial(config: BenchConfig) -> TrialResult:
+    """Publish on a BlockingConnection, optionally waiting for every confirm"""
+    tracker = ConfirmTracker(window=1)
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        if config.confirm_mode == 'sync':
+            channel.confirm_delivery()
+        messages = message_factory(config)
+        body_for, properties_for = messages
+
+        def publish(start_id, count):
+            if config.confirm_mode == 'none':
+                return publish_range(channel, config, start_id, count,
+                                     messages=messages)
+            live = metrics.active()
+            for i in range(start_id, start_id + count):
+                tag = tracker.record_publish()
+                body = body_for(i)
+                try:
+                    channel.basic_publish(
+                        exchange='',
+                        routing_key=config.queue,
+                        body=body,
+                        properties=properties_for(),
+                    )
+                except pika.exceptions.NackError:
+                    tracker.confirm(tag, nack=True)
+                else:
+                    tracker.confirm(tag)
+                if live is not None:
+                    live.on_publish(len(body))
+            return count
+
+        publish(0, config.warmup)
+        tracker.reset_stats()
+        start_time = time.time()
+        sent = publish(config.warmup, config.message_count)
+        duration = time.time() - start_time
+    finally:
+        connection.close()
+
+    return TrialResult(messages=sent, duration=duration,
+                       extra=confirm_extra(config, tracker))
+
+
+async def window_confirm_trial(config: BenchConfig) -> TrialResult:
+    """Keep up to ``confirm_window`` publishes unconfirmed at once"""
+    async with AsyncSession(config) as session:
+        await session.declare_queue()
+        publisher = AsyncPublisher(session, window=config.confirm_window)
+        await publisher.setup()
+
+        await publisher.publish(0, config.warmup)
+        publisher.tracker.reset_stats()
+        start_time = time.time()
+        sent = await publisher.publish(config.warmup, config.message_count)
+        duration = time.time() - start_time
+
+    return TrialResult(messages=sent, duration=duration,
+                       extra=confirm_extra(config, publisher.tracker))
+
+
+def confirm_extra(config: BenchConfig, tracker: ConfirmTracker) -> dict:
+    extra = {
+        'confirm_mode': config.confirm_mode,
+        'confirm_window': config.confirm_window if config.confirm_mode == 'window' else 1,
+    }
+    if config.confirm_mode != 'none':
+        extra['acked'] = tracker.acked
+        extra['nacked'] = tracker.nacked
+        extra['confirm_latency_ms'] = tracker.latency_summary()
+    return extra
+
+
+@scenario('confirms', queue='confirm_queue', durable=True, persistent=True)
+def confirms(config: BenchConfig) -> TrialResult:
+    """Durable publishing with confirm_mode none, sync or window(confirm_window)"""
+    if config.confirm_mode not in CONFIRM_MODES:
+        raise ValueError(f'confirm_mode must be one of {", ".join(CONFIRM_MODES)}, '
+                         f'not {config.confirm_mode!r}')
+    if config.confirm_mode == 'window':
+        if config.confirm_window < 1:
+            raise ValueError('confirm_window must be at least 1')
+        return asyncio.run(window_confirm_trial(config))
+    return blocking_confirm_trial(config)
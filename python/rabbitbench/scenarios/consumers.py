@@ -0,0 +1,144 @@
+import time
+
+from .. import metrics
+from ..acking import AckBatcher
+from ..codec import codec_for
+from ..config import BenchConfig
+from ..connection import connect, consume_arguments, declare_queue
+from ..envelope import envelope_format, iter_records
+from ..latency import LatencyRecorder
+from ..results import TrialResult
+from ..stats import cpu_per_message
+from . import scenario
+
+
+class ConsumeCounter:
+    """Per-delivery callback state for a bounded consume trial
+
+    Envelopes (see :mod:`envelope`) are unpacked and every record in them
+    is decoded and counted as one message.
+    """
+
+    def __init__(self, config: BenchConfig):
+        self.config = config
+        self.decode = codec_for(config).decode
+        self.target = config.warmup + config.message_count
+        self.count = 0
+        self.bytes = 0
+        self.start_time = None
+        self.end_time = None
+        self.last_time = None
+        self.cpu_start = None
+        self.cpu_end = None
+        self.latency = LatencyRecorder(config) if config.latency else None
+        self.acks = None
+        self.live = metrics.active()
+        if config.warmup == 0:
+            self.start()
+
+    def start(self) -> None:
+        self.start_time = time.time()
+        self.cpu_start = time.process_time()
+        if self.latency:
+            self.latency.start()
+
+    def __call__(self, ch, method, properties, body):
+        if self.latency:
+            self.latency.record(properties)
+        layout = envelope_format(properties)
+        if layout is None:
+            self.decode(body)
+            records = 1
+        else:
+            records = 0
+            for record in iter_records(body, layout):
+                self.decode(record)
+                records += 1
+        if self.live is not None:
+            self.live.on_consume(len(body), records)
+        if self.acks is None:
+            self.acks = AckBatcher(ch, self.config.ack_every,
+                                   self.config.ack_interval,
+                                   self.config.prefetch_count)
+        self.acks.delivered(method.delivery_tag)
+        self.count += records
+        self.last_time = time.time()
+        if self.start_time is not None:
+            self.bytes += len(body)
+
+        if self.start_time is None and self.count >= self.config.warmup:
+            self.start()
+
+        progress_every = self.config.progress_every
+        if progress_every and self.start_time and self.count % progress_every == 0:
+            timed = self.count - self.config.warmup
+            rate = timed / (time.time() - self.start_time)
+            print(f'Processed {timed} messages - Rate: {rate:.0f} msgs/sec')
+
+        if self.count >= self.target:
+            self.acks.flush()
+            self.end_time = time.time()
+            self.cpu_end = time.process_time()
+            ch.stop_consuming()
+
+    def result(self) -> TrialResult:
+        # On timeout, measure up to the last delivery rather than the idle wait
+        end_time = self.end_time or self.last_time or time.time()
+        timed = max(self.count - self.config.warmup, 0)
+        duration = end_time - self.start_time if self.start_time else 0.0
+        cpu_end = self.cpu_end or time.process_time()
+        cpu = cpu_end - self.cpu_start if self.cpu_start is not None else 0.0
+        extra = {'prefetch_count': self.config.prefetch_count,
+                 'ack_every': self.acks.every if self.acks else self.config.ack_every,
+                 'timed_out': self.end_time is None,
+                 'cpu_us_per_message': cpu_per_message(cpu, timed)}
+        if self.latency:
+            extra.update(self.latency.finish())
+        return TrialResult(messages=timed, duration=duration, bytes=self.bytes,
+                           extra=extra)
+
+
+def drain(connection, channel, config: BenchConfig, ready=None) -> ConsumeCounter:
+    """Consume ``warmup + message_count`` messages from the config queue
+
+    ``ready`` is called once the consumer is registered. Gives up once the
+    queue has stayed empty for ``consume_timeout`` seconds.
+    """
+    counter = ConsumeCounter(config)
+    channel.basic_qos(prefetch_count=config.prefetch_count)
+    consumer_tag = channel.basic_consume(
+        queue=config.queue, on_message_callback=counter, auto_ack=False,
+        arguments=consume_arguments(config))
+    if ready is not None:
+        ready()
+
+    deadline = time.time() + config.consume_timeout
+    last_count = 0
+    poll = min(config.ack_interval or 0.5, 0.5)
+    while counter.end_time is None and time.time() < deadline:
+        connection.process_data_events(time_limit=poll)
+        if counter.acks is not None:
+            counter.acks.tick()
+        if counter.count != last_count:
+            last_count = counter.count
+            deadline = time.time() + config.consume_timeout
+
+    if counter.end_time is None:
+        if counter.acks is not None:
+            counter.acks.flush()
+        channel.basic_cancel(consumer_tag)
+    return counter
+
+
+@scenario('consume', kind='consumer', queue='hello_queue', durable=True)
+def consume(config: BenchConfig) -> TrialResult:
+    """Drain message_count messages with manual acks and a prefetch window"""
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        counter = drain(connection, channel, config)
+    finally:
+        connection.close()
+
+    return counter.result()
@@ -0,0 +1,302 @@
+"""Producers and consumers run together while the queue depth is sampled.
+
+Each worker is its own process with its own connection. Workers bump a
+shared counter per message so the coordinator can chart publish and
+consume rates next to the backlog without any locking on the hot path.
+With ``shards`` > 1 producers route by message id across the shard queues
+and consumer ``n`` reads shard ``n % shards``.
+"""
+
+import multiprocessing
+import time
+
+from .. import metrics
+from ..acking import AckBatcher
+from ..codec import codec_for
+from ..config import BenchConfig
+from ..connection import connect, consume_arguments, queue_depth
+from ..latency import LatencyHistogram, LatencyRecorder
+from ..payloads import message_factory
+from ..ratecontrol import pacer_for
+from ..results import TrialResult
+from ..sharding import declare_shards, shard_router
+from ..stats import linear_slope
+from . import scenario
+from .multiprocess import gather, split_evenly, timed_window
+
+# Backlog growth below this fraction of the publish rate counts as stable
+GROWTH_TOLERANCE = 0.02
+
+
+def producer_worker(config: BenchConfig, worker_id: int, start_id: int,
+                    count: int, sent, go, results) -> None:
+    try:
+        live = metrics.start_reporting(config, 'producer', worker_id)
+        connection = connect(config, quiet=True)
+        try:
+            channel = connection.channel()
+            declare_shards(channel, config)
+            route = shard_router(config)
+            body_for, properties_for = message_factory(config)
+            pacer = pacer_for(config, scale=1.0 / config.producers)
+            budget = 0
+
+            go.wait()
+            start = time.perf_counter()
+            for n, i in enumerate(range(start_id, start_id + count)):
+                if pacer is not None:
+                    while not budget:
+                        budget = pacer.acquire(count - n)
+                    budget -= 1
+                exchange, routing_key = route(i)
+                body = body_for(i)
+                channel.basic_publish(exchange=exchange, routing_key=routing_key,
+                                      body=body, properties=properties_for())
+                sent.value += 1
+                if pacer is not None:
+                    pacer.sent()
+                if live is not None:
+                    live.on_publish(len(body))
+            end = time.perf_counter()
+        finally:
+            connection.close()
+            metrics.stop_reporting()
+        duration = end - start
+        report = {'messages': count, 'start': start, 'end': end,
+                  'duration': duration,
+                  'rate': count / duration if duration > 0 else 0.0}
+        if pacer is not None:
+            report['rate_control'] = pacer.report()
+        results.put(('producer', worker_id, report))
+    except Exception as e:
+        results.put(('error', worker_id, repr(e)))
+
+
+def consumer_worker(config: BenchConfig, worker_id: int, consumed, go, stop,
+                    results) -> None:
+    try:
+        live = metrics.start_reporting(config, 'consumer', worker_id)
+        connection = connect(config, quiet=True)
+        try:
+            channel = connection.channel()
+            queues = declare_shards(channel, config)
+            queue = queues[worker_id % len(queues)]
+            decode = codec_for(config).decode
+            recorder = LatencyRecorder(config) if config.latency else None
+            acks = AckBatcher(channel, config.ack_every, config.ack_interval,
+                              config.prefetch_count)
+            last = [None]
+
+            def on_message(ch, method, properties, body):
+                if recorder:
+                    recorder.record(properties)
+                decode(body)
+                acks.delivered(method.delivery_tag)
+                consumed.value += 1
+                last[0] = time.perf_counter()
+                if live is not None:
+                    live.on_consume(len(body))
+
+            channel.basic_qos(prefetch_count=config.prefetch_count)
+            channel.basic_consume(queue=queue, on_message_callback=on_message,
+                                  arguments=consume_arguments(config))
+            go.wait()
+            if recorder:
+                recorder.start()
+            start = time.perf_counter()
+            while not stop.is_set():
+                connection.process_data_events(time_limit=0.1)
+                acks.tick()
+            acks.flush()
+        finally:
+            connection.close()
+            metrics.stop_reporting()
+        # Up to the last delivery, not the idle wait for stop
+        end = last[0] or start
+        duration = end - start
+        report = {'messages': consumed.value, 'start': start, 'end': end,
+                  'duration': duration,
+                  'rate': consumed.value / duration if duration > 0 else 0.0,
+                  'queue': queue}
+        if recorder:
+            report['latency'] = recorder.histogram.to_dict()
+        results.put(('consumer', worker_id, report))
+    except Exception as e:
+        results.put(('error', worker_id, repr(e)))
+
+
+def analyse_backlog(samples: list, publish_end: float) -> dict:
+    """Backlog growth while producers ran, and the rate it implies
+
+    Only samples taken while producers were still publishing count: once
+    they stop, the queue drains and the slope says nothing about whether
+    the consumers kept up. With fewer than two of those there is nothing
+    to fit, and every rate is ``None``.
+    """
+    window = [s for s in samples if s['t'] <= publish_end]
+    if len(window) < 2:
+        return dict.fromkeys(('publish_rate', 'consume_rate', 'backlog_growth',
+                              'saturated', 'sustainable_rate'))
+    # Skip the first sample so connection start-up does not skew the fit
+    if len(window) > 3:
+        window = window[1:]
+    xs = [s['t'] for s in window]
+    growth = linear_slope(xs, [s['depth'] for s in window])
+    publish_rate = linear_slope(xs, [s['published'] for s in window])
+    consume_rate = linear_slope(xs, [s['consumed'] for s in window])
+    saturated = growth > GROWTH_TOLERANCE * max(publish_rate, 1.0)
+    return {
+        'publish_rate': round(publish_rate, 1),
+        'consume_rate': round(consume_rate, 1),
+        'backlog_growth': round(growth, 1),
+        'saturated': saturated,
+        # When the backlog grows consumers set the pace; otherwise every
+        # published message is absorbed and the publish rate is sustainable
+        'sustainable_rate': round(consume_rate if saturated else publish_rate, 1),
+    }
+
+
+def backlog(channel, queues: list) -> tuple:
+    """Total ready messages and consumers over every shard queue"""
+    depths = [queue_depth(channel, queue) for queue in queues]
+    return ([d for d, _ in depths], sum(d for d, _ in depths),
+            sum(c for _, c in depths))
+
+
+@scenario('coordinated', kind='roundtrip', queue='coordinated_queue',
+          durable=False, persistent=False)
+def coordinated(config: BenchConfig) -> TrialResult:
+    """N producers and M consumers together, sampling queue depth over time
+
+    ``warmup`` is not used: the backlog fit skips start-up instead. The
+    trial's rate is the sustainable rate: the consume rate if the backlog
+    grew while producers ran, else the publish rate. If producers finish
+    within one ``stats_interval`` that rate is undetermined (``None``) and
+    the trial's rate is messages consumed from the first publish to the
+    last delivery.
+    """
+    return run_coordinated(config)
+
+
+@scenario('sharded', kind='roundtrip', queue='sharded_queue', durable=False,
+          persistent=False, shards=4, producers=4,
+          table=('shards', 'sustainable_rate', 'peak_backlog'))
+def sharded(config: BenchConfig) -> TrialResult:
+    """Publish across `shards` queues routed by message id, one consumer per shard
+
+    Run with ``--vary shards=1,2,4,8`` to see how throughput scales with the
+    number of queue processes.
+    """
+    return run_coordinated(config.replace(consumers=max(config.shards, 1)))
+
+
+def run_coordinated(config: BenchConfig) -> TrialResult:
+    context = multiprocessing.get_context()
+    go = context.Event()
+    stop = context.Event()
+    results = context.Queue()
+    sent = [context.RawValue('q', 0) for _ in range(config.producers)]
+    consumed = [context.RawValue('q', 0) for _ in range(config.consumers)]
+
+    monitor = connect(config)
+    try:
+        channel = monitor.channel()
+        queues = declare_shards(channel, config)
+        for queue in queues:
+            channel.queue_purge(queue)
+
+        workers = []
+        start_id = 0
+        for worker_id, count in enumerate(
+                split_evenly(config.message_count, config.producers)):
+            workers.append(context.Process(target=producer_worker, args=(
+                config, worker_id, start_id, count, sent[worker_id], go, results)))
+            start_id += count
+        producer_procs = list(workers)
+        for worker_id in range(config.consumers):
+            workers.append(context.Process(target=consumer_worker, args=(
+                config, worker_id, consumed[worker_id], go, stop, results)))
+        for worker in workers:
+            worker.start()
+
+        # Wait until every consumer is attached before releasing everyone
+        deadline = time.time() + config.consume_timeout + config.retry_delay
+        while backlog(channel, queues)[2] < config.consumers:
+            if time.time() > deadline or not all(w.is_alive() for w in workers):
+                break
+            time.sleep(0.05)
+
+        samples = []
+        go.set()
+        start_time = time.time()
+        publish_end = None
+        idle_since = None
+        while True:
+            time.sleep(config.stats_interval)
+            depths, depth, _ = backlog(channel, queues)
+            now = time.time() - start_time
+            total_sent = sum(v.value for v in sent)
+            total_consumed = sum(v.value for v in consumed)
+            samples.append({'t': round(now, 3), 'depth': depth,
+                            'published': total_sent, 'consumed': total_consumed})
+            if len(queues) > 1:
+                samples[-1]['shard_depths'] = depths
+
+            if publish_end is None and not any(p.is_alive() for p in producer_procs):
+                publish_end = now
+            if publish_end is not None:
+                if total_consumed >= total_sent and depth == 0:
+                    break
+                if samples[-2:-1] and samples[-2]['consumed'] == total_consumed:
+                    idle_since = idle_since or now
+                    if now - idle_since >= config.consume_timeout:
+                        break
+                else:
+                    idle_since = None
+        duration = time.time() - start_time
+        stop.set()
+    finally:
+        stop.set()
+        go.set()
+        monitor.close()
+
+    reports = {'producer': [], 'consumer': []}
+    errors = []
+    for kind, worker_id, report in gather(
+            results, workers, config.consume_timeout + config.retry_delay):
+        if kind == 'error':
+            errors.append(f'worker {worker_id}: {report}')
+        else:
+            report['worker'] = worker_id
+            reports[kind].append(report)
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise RuntimeError('Coordinated run failed: ' + '; '.join(errors))
+
+    analysis = analyse_backlog(samples, publish_end or duration)
+    extra = dict(analysis, producers=config.producers, consumers=config.consumers,
+                 shards=len(queues), shard_mode=config.shard_mode,
+                 peak_backlog=max(s['depth'] for s in samples),
+                 backlog_samples=samples)
+
+    histograms = [LatencyHistogram.from_dict(r.pop('latency'))
+                  for r in reports['consumer'] if 'latency' in r]
+    if histograms:
+        merged = histograms[0]
+        for histogram in histograms[1:]:
+            merged.merge(histogram)
+        extra['latency_ms'] = merged.summary()
+
+    total_consumed = sum(r['messages'] for r in reports['consumer'])
+    sustainable = analysis['sustainable_rate']
+    # Without a fit, time the run from the first producer starting to the
+    # last delivery; the monitor loop only ends on whole stats_intervals
+    return TrialResult(
+        messages=total_consumed,
+        duration=total_consumed / sustainable if sustainable else timed_window(
+            reports['producer'] + reports['consumer']),
+        workers=[dict(r, role=kind) for kind in ('producer', 'consumer')
+                 for r in sorted(reports[kind], key=lambda r: r['worker'])],
+        extra=extra,
+    )
@@ -0,0 +1,100 @@
+import time
+
+import pika
+
+from .. import metrics
+from ..config import BenchConfig
+from ..connection import connect, declare_queue
+from ..envelope import EnvelopePacker
+from ..payloads import message_factory
+from ..ratecontrol import pacer_for
+from ..results import TrialResult
+from . import scenario
+from .consumers import drain
+
+
+def publish_envelopes(channel, config: BenchConfig, packer: EnvelopePacker,
+                      start_id: int, count: int, messages, pacer=None) -> int:
+    """Pack ``count`` records into envelopes and publish them; returns records"""
+    body_for, properties_for = messages
+    live = metrics.active()
+
+    def send(body):
+        properties = properties_for()
+        headers = dict(properties.headers or {})
+        headers.update(packer.headers())
+        channel.basic_publish(
+            exchange='', routing_key=config.queue, body=body,
+            properties=pika.BasicProperties(
+                delivery_mode=properties.delivery_mode, headers=headers))
+        if pacer is not None:
+            pacer.sent(packer.last_count)
+        if live is not None:
+            live.on_publish(len(body), packer.last_count)
+
+    budget = 0
+    for n, i in enumerate(range(start_id, start_id + count)):
+        if pacer is not None:
+            while not budget:
+                # acquire may wait up to a tick; don't hold records past linger
+                if packer.due(within=config.rate_tick):
+                    send(packer.flush())
+                budget = pacer.acquire(count - n)
+            budget -= 1
+        body = packer.add(body_for(i))
+        if body is not None:
+            send(body)
+    body = packer.flush()
+    if body is not None:
+        send(body)
+    return count
+
+
+@scenario('envelope', kind='roundtrip', queue='envelope_queue', durable=False,
+          persistent=False,
+          table=('consume_rate', 'records_per_envelope',
+                 'batching_delay_ms.mean', 'batching_delay_ms.max'))
+def envelope(config: BenchConfig) -> TrialResult:
+    """Pack envelope_size records per AMQP message, then consume and unpack them
+
+    The trial rate is logical records published per second; the consume
+    side, which decodes every record, is reported as ``consume_rate``.
+    Chart the trade-off with ``--vary envelope_size=1,10,100,1000`` and,
+    for the latency it adds at a given load, ``--set rate=20000 --vary
+    envelope_linger=0.001,0.01``.
+    """
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        channel.queue_purge(config.queue)
+        # The pre-encoded pool hands out views into a ring, so it needs a
+        # slot for every record an envelope holds before it is joined
+        messages = message_factory(config, min_slots=config.envelope_size)
+        packer = EnvelopePacker(config)
+
+        publish_envelopes(channel, config, packer, 0, config.warmup, messages)
+        packer.reset_stats()
+        pacer = pacer_for(config)
+        start_time = time.time()
+        sent = publish_envelopes(channel, config, packer, config.warmup,
+                                 config.message_count, messages, pacer=pacer)
+        duration = time.time() - start_time
+
+        counter = drain(connection, channel, config)
+    finally:
+        connection.close()
+
+    consumed = counter.result()
+    extra = {
+        'envelope_size': config.envelope_size,
+        'envelope_format': config.envelope_format,
+        'consume_rate': round(consumed.rate, 1),
+        'consumed': consumed.messages,
+        'consume_cpu_us_per_message': consumed.extra['cpu_us_per_message'],
+    }
+    extra.update(packer.stats())
+    if pacer is not None:
+        extra['rate_control'] = pacer.report()
+    return TrialResult(messages=sent, duration=duration, bytes=consumed.bytes,
+                       extra=extra)
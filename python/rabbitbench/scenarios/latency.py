@@ -0,0 +1,112 @@
+import multiprocessing
+import queue
+import time
+
+from .. import metrics
+from ..config import BenchConfig
+from ..connection import connect, declare_queue, queue_depth
+from ..payloads import message_factory
+from ..publisher import publish_range
+from ..ratecontrol import pacer_for
+from ..results import TrialResult
+from . import scenario
+from .consumers import drain
+
+
+def consumer_process(config: BenchConfig, ready, results) -> None:
+    """Drain the trial's messages in a separate process and report back"""
+    try:
+        metrics.start_reporting(config, 'consumer')
+        connection = connect(config, quiet=True)
+        try:
+            channel = connection.channel()
+            declare_queue(channel, config)
+            counter = drain(connection, channel, config, ready=ready.set)
+            results.put(counter.result())
+        finally:
+            connection.close()
+            metrics.stop_reporting()
+    except Exception as e:
+        results.put(e)
+        ready.set()
+
+
+def wait_for_report(channel, config: BenchConfig, consumer, results):
+    """The consumer process's report, for as long as it is still draining
+
+    Gives up if the consumer exits without reporting, or if the queue depth
+    has not moved for ``consume_timeout + retry_delay`` seconds, long after
+    the consumer's own idle timeout should have ended it.
+    """
+    patience = config.consume_timeout + config.retry_delay
+    depth, deadline = None, time.time() + patience
+    while True:
+        try:
+            return results.get(timeout=0.5)
+        except queue.Empty:
+            pass
+        if not consumer.is_alive():
+            try:
+                # It may have reported just before exiting
+                return results.get(timeout=0.5)
+            except queue.Empty:
+                raise RuntimeError(f'Latency consumer exited with code '
+                                   f'{consumer.exitcode} without reporting') from None
+        current = queue_depth(channel, config.queue)[0]
+        if current != depth:
+            depth, deadline = current, time.time() + patience
+        elif time.time() > deadline:
+            raise TimeoutError(f'Latency consumer made no progress in {patience:g}s')
+
+
+@scenario('latency', kind='roundtrip', queue='latency_queue', durable=False,
+          persistent=False, latency=True)
+def end_to_end_latency(config: BenchConfig) -> TrialResult:
+    """Publish while a consumer process drains, recording publish-to-consume latency
+
+    Latency only means something below saturation: set ``rate`` or
+    ``rate_profile`` so the queue does not build.
+    The trial's rate is the consumer's.
+    """
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        channel.queue_purge(config.queue)
+
+        context = multiprocessing.get_context()
+        ready = context.Event()
+        results = context.Queue()
+        consumer = context.Process(target=consumer_process,
+                                   args=(config, ready, results))
+        consumer.start()
+        consumed = None
+        try:
+            if not ready.wait(config.consume_timeout + config.retry_delay):
+                raise ConnectionError('Latency consumer did not start in time')
+
+            messages = message_factory(config)
+            publish_range(channel, config, 0, config.warmup, messages=messages)
+            pacer = pacer_for(config)
+            start_time = time.time()
+            sent = publish_range(channel, config, config.warmup,
+                                 config.message_count, messages=messages,
+                                 pacer=pacer)
+            publish_duration = time.time() - start_time
+            consumed = wait_for_report(channel, config, consumer, results)
+        finally:
+            if consumed is not None:
+                # Let it write its metrics and memory reports on the way out
+                consumer.join(config.retry_delay)
+            consumer.terminate()
+            consumer.join()
+    finally:
+        connection.close()
+
+    if isinstance(consumed, Exception):
+        raise consumed
+    consumed.extra['producer_rate'] = round(
+        sent / publish_duration if publish_duration > 0 else 0.0, 2)
+    if pacer is not None:
+        consumed.extra['rate_control'] = pacer.report()
+    return consumed
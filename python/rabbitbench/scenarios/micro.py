@@ -0,0 +1,87 @@
+"""Broker-free micro-benchmarks of the client side of a publish."""
+
+import time
+
+import pika
+from pika import frame, spec
+
+from ..codec import codec_for, make_payload
+from ..config import BenchConfig
+from ..messages import build_message, encode_message
+from ..payloads import MessagePool
+from ..results import TrialResult
+from . import scenario
+
+
+def time_per_message(func, count: int) -> float:
+    """Nanoseconds per call of ``func(i)`` over ``count`` calls"""
+    start = time.perf_counter_ns()
+    for i in range(count):
+        func(i)
+    return (time.perf_counter_ns() - start) / count if count else 0.0
+
+
+def marshal_publish(body, properties, channel_number: int = 1) -> bytes:
+    """The frames pika builds for one ``basic_publish``, minus the socket"""
+    method = spec.Basic.Publish(exchange='', routing_key='bench_queue')
+    return b''.join((
+        frame.Method(channel_number, method).marshal(),
+        frame.Header(channel_number, len(body), properties).marshal(),
+        frame.Body(channel_number, body).marshal(),
+    ))
+
+
+@scenario('encode_cost', kind='micro')
+def encode_cost(config: BenchConfig) -> TrialResult:
+    """Client-side cost per message of encoding strategies and pika framing"""
+    count = config.message_count
+    delivery_mode = config.delivery_mode
+    pool = MessagePool(config.pool_size)
+    shared = pika.BasicProperties(delivery_mode=delivery_mode)
+    template = {'id': 0, 'content': 'Hello World #0', 'timestamp': ''}
+    codec = codec_for(config)
+    payload = codec.prepare_payload(make_payload(config.payload_size))
+
+    def dict_json(i):
+        encode_message(build_message(i))
+        pika.BasicProperties(delivery_mode=delivery_mode)
+
+    def template_json(i):
+        template['id'] = i
+        template['content'] = f'Hello World #{i}'
+        encode_message(template)
+        pika.BasicProperties(delivery_mode=delivery_mode)
+
+    def pooled(i):
+        pool.body(i)
+
+    def dict_json_framed(i):
+        marshal_publish(encode_message(build_message(i)),
+                        pika.BasicProperties(delivery_mode=delivery_mode))
+
+    def pooled_framed(i):
+        marshal_publish(pool.body(i), shared)
+
+    def configured_codec(i):
+        codec.encode(build_message(i, payload))
+
+    strategies = {
+        'dict_json': dict_json,
+        'template_json': template_json,
+        'pool': pooled,
+        'dict_json_framed': dict_json_framed,
+        'pool_framed': pooled_framed,
+        f'codec:{codec.name}/{config.payload_size}': configured_codec,
+    }
+    for func in strategies.values():
+        time_per_message(func, min(config.warmup, count) or min(count, 1000))
+    ns_per_message = {name: round(time_per_message(func, count), 1)
+                      for name, func in strategies.items()}
+
+    # The headline rate is the path producers take with the current config
+    selected = 'pool_framed' if config.preencode else 'dict_json_framed'
+    return TrialResult(
+        messages=count,
+        duration=ns_per_message[selected] * count / 1e9,
+        extra={'selected': selected, 'ns_per_message': ns_per_message},
+    )
@@ -0,0 +1,183 @@
+"""Many channels over a few connections.
+
+Each connection runs in its own process, as ``multiprocess`` does, and
+opens ``channels`` channels on it. ``channel_mode=round_robin`` publishes
+message ``n`` on channel ``n % channels`` from one thread;
+``channel_mode=thread`` gives every channel its own publishing thread.
+pika's ``BlockingConnection`` is not thread-safe, so those threads share
+it under a lock, the way a threaded service has to; the lock wait is
+reported so contention on the shared socket is visible.
+"""
+
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .. import metrics
+from ..config import BenchConfig
+from ..connection import connect, declare_queue
+from ..payloads import message_factory
+from ..ratecontrol import pacer_for
+from ..results import TrialResult
+from . import scenario
+from .multiprocess import split_evenly, timed_window
+
+CHANNEL_MODES = ('round_robin', 'thread')
+
+
+def publish_round_robin(channels: list, config: BenchConfig, start_id: int,
+                        count: int, stats: list, messages, pacer=None) -> None:
+    body_for, properties_for = messages
+    live = metrics.active()
+    fanout = len(channels)
+    budget = 0
+    for n, i in enumerate(range(start_id, start_id + count)):
+        if pacer is not None:
+            while not budget:
+                budget = pacer.acquire(count - n)
+            budget -= 1
+        k = n % fanout
+        body = body_for(i)
+        channels[k].basic_publish(exchange='', routing_key=config.queue,
+                                  body=body, properties=properties_for())
+        stats[k]['messages'] += 1
+        if pacer is not None:
+            pacer.sent()
+        if live is not None:
+            live.on_publish(len(body))
+
+
+def publish_threaded(channels: list, config: BenchConfig, start_id: int,
+                     count: int, stats: list, pacer_scale: float = None) -> None:
+    lock = threading.Lock()
+    live = metrics.active()
+
+    def run(k, start, n_messages):
+        channel = channels[k]
+        body_for, properties_for = message_factory(config)
+        pacer = pacer_for(config, scale=pacer_scale) if pacer_scale else None
+        budget = 0
+        waited = 0.0
+        begin = time.time()
+        for n, i in enumerate(range(start, start + n_messages)):
+            if pacer is not None:
+                while not budget:
+                    budget = pacer.acquire(n_messages - n)
+                budget -= 1
+            body = body_for(i)
+            properties = properties_for()
+            wait_start = time.perf_counter()
+            with lock:
+                waited += time.perf_counter() - wait_start
+                channel.basic_publish(exchange='', routing_key=config.queue,
+                                      body=body, properties=properties)
+            if pacer is not None:
+                pacer.sent()
+            if live is not None:
+                live.on_publish(len(body))
+        stats[k]['messages'] += n_messages
+        stats[k]['duration'] = time.time() - begin
+        stats[k]['lock_wait_s'] = stats[k].get('lock_wait_s', 0.0) + waited
+
+    threads = []
+    for k, n_messages in enumerate(split_evenly(count, len(channels))):
+        threads.append(threading.Thread(target=run, args=(k, start_id, n_messages)))
+        start_id += n_messages
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def connection_worker(config: BenchConfig, worker_id: int, start_id: int,
+                      count: int, warmup: int) -> dict:
+    """One connection with ``channels`` channels, publishing its id range"""
+    metrics.start_reporting(config, 'producer', worker_id)
+    connection = connect(config, quiet=True)
+    try:
+        channels = [connection.channel() for _ in range(max(config.channels, 1))]
+        declare_queue(channels[0], config)
+        stats = [{'channel': ch.channel_number, 'messages': 0} for ch in channels]
+        scale = 1.0 / config.connections
+
+        if config.channel_mode == 'thread':
+            publish_threaded(channels, config, start_id, warmup, stats)
+            for entry in stats:
+                entry.update(messages=0, lock_wait_s=0.0)
+            start = time.perf_counter()
+            publish_threaded(channels, config, start_id + warmup, count, stats,
+                             pacer_scale=scale / len(channels)
+                             if config.rate or config.rate_profile else None)
+        else:
+            messages = message_factory(config)
+            publish_round_robin(channels, config, start_id, warmup, stats,
+                                messages)
+            for entry in stats:
+                entry['messages'] = 0
+            start = time.perf_counter()
+            publish_round_robin(channels, config, start_id + warmup, count,
+                                stats, messages, pacer=pacer_for(config, scale))
+        end = time.perf_counter()
+    finally:
+        connection.close()
+        metrics.stop_reporting()
+
+    duration = end - start
+    for entry in stats:
+        channel_time = entry.get('duration', duration)
+        entry['rate'] = entry['messages'] / channel_time if channel_time > 0 else 0.0
+        if 'lock_wait_s' in entry:
+            entry['lock_wait_s'] = round(entry['lock_wait_s'], 4)
+    return {
+        'worker': worker_id,
+        'messages': count,
+        'start': start,
+        'end': end,
+        'duration': duration,
+        'rate': count / duration if duration > 0 else 0.0,
+        'channels': stats,
+    }
+
+
+@scenario('multiplex', queue='multiplex_queue', durable=False, persistent=False,
+          connections=2, channels=4)
+def multiplex(config: BenchConfig) -> TrialResult:
+    """`connections` processes x `channels` channels, round-robin or a thread each
+
+    Compare ``--vary connections=1,2,4 --vary channels=1,4,16`` at the same
+    total to see whether scaling out should add connections or channels.
+    """
+    if config.channel_mode not in CHANNEL_MODES:
+        raise ValueError(f'Unknown channel_mode {config.channel_mode!r}; '
+                         f'expected one of {", ".join(CHANNEL_MODES)}')
+    connections = max(config.connections, 1)
+    counts = split_evenly(config.message_count, connections)
+    warmups = split_evenly(config.warmup, connections)
+
+    with ProcessPoolExecutor(max_workers=connections) as executor:
+        futures = []
+        start_id = 0
+        for worker_id, (count, warmup) in enumerate(zip(counts, warmups)):
+            futures.append(executor.submit(
+                connection_worker, config, worker_id, start_id, count, warmup))
+            start_id += count + warmup
+        workers = [future.result() for future in futures]
+
+    channel_rates = [c['rate'] for w in workers for c in w['channels']]
+    extra = {
+        'connections': connections,
+        'channels_per_connection': max(config.channels, 1),
+        'channel_mode': config.channel_mode,
+        'min_channel_rate': round(min(channel_rates), 1),
+        'max_channel_rate': round(max(channel_rates), 1),
+    }
+    lock_waits = [c['lock_wait_s'] for w in workers for c in w['channels']
+                  if 'lock_wait_s' in c]
+    if lock_waits:
+        extra['lock_wait_s'] = round(sum(lock_waits), 4)
+    return TrialResult(
+        messages=sum(w['messages'] for w in workers),
+        duration=timed_window(workers),
+        workers=workers,
+        extra=extra,
+    )
@@ -0,0 +1,123 @@
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .. import metrics
+from ..config import BenchConfig
+from ..connection import connect, declare_queue
+from ..payloads import message_factory
+from ..publisher import publish_range
+from ..ratecontrol import pacer_for
+from ..results import TrialResult
+from . import scenario
+
+
+def process_worker(config: BenchConfig, worker_id: int, start_id: int,
+                   message_count: int, warmup: int) -> dict:
+    """Independent process worker with its own connection"""
+    metrics.start_reporting(config, 'producer', worker_id)
+    connection = connect(config, quiet=True)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        messages = message_factory(config)
+
+        publish_range(channel, config, start_id, warmup, messages=messages)
+
+        pacer = pacer_for(config, scale=1.0 / config.processes)
+        start = time.perf_counter()
+        sent = publish_range(channel, config, start_id + warmup, message_count,
+                             messages=messages, pacer=pacer)
+        end = time.perf_counter()
+    finally:
+        connection.close()
+        metrics.stop_reporting()
+
+    report = {
+        'worker': worker_id,
+        'messages': sent,
+        'start': start,
+        'end': end,
+        'duration': end - start,
+        'rate': sent / (end - start) if end > start else 0.0,
+    }
+    if pacer is not None:
+        report['rate_control'] = pacer.report()
+    return report
+
+
+def split_evenly(total: int, parts: int) -> list:
+    """Split ``total`` into ``parts`` counts that differ by at most one"""
+    base, remainder = divmod(total, parts)
+    return [base + (1 if i < remainder else 0) for i in range(parts)]
+
+
+def timed_window(reports: list) -> float:
+    """Seconds from the first worker starting its timed loop to the last
+    one finishing, from the ``start`` and ``end`` each worker reports
+
+    Those are ``time.perf_counter()`` readings, which on Linux come from
+    the system-wide monotonic clock and so compare across processes.
+    """
+    return max(r['end'] for r in reports) - min(r['start'] for r in reports)
+
+
+def gather(results, processes: list, timeout: float, until=None) -> list:
+    """One report from the ``results`` queue per process in ``processes``
+
+    Raises instead of waiting forever when a process exits without
+    reporting, or when no report arrives for ``timeout`` seconds. With
+    ``until``, returns the reports so far as soon as ``until(report)`` is
+    true for one of them.
+    """
+    reports = []
+    deadline = time.time() + timeout
+    while len(reports) < len(processes):
+        try:
+            reports.append(results.get(timeout=0.5))
+            if until is not None and until(reports[-1]):
+                break
+            deadline = time.time() + timeout
+            continue
+        except queue.Empty:
+            pass
+        exited = sum(not p.is_alive() for p in processes)
+        if exited <= len(reports) and time.time() < deadline:
+            continue
+        try:
+            # A process may have reported just before exiting
+            reports.append(results.get(timeout=0.5))
+        except queue.Empty:
+            if exited > len(reports):
+                codes = [p.exitcode for p in processes if not p.is_alive()]
+                raise RuntimeError(f'{exited - len(reports)} worker process(es) '
+                                   f'exited without reporting (exit codes '
+                                   f'{codes})') from None
+            raise TimeoutError(f'No worker report within {timeout:g}s') from None
+    return reports
+
+
+@scenario('multiprocess', queue='process_queue', durable=False, persistent=False)
+def multiprocess(config: BenchConfig) -> TrialResult:
+    """Separate processes, each with its own connection, to bypass the GIL"""
+    counts = split_evenly(config.message_count, config.processes)
+    warmups = split_evenly(config.warmup, config.processes)
+
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=config.processes) as executor:
+        futures = []
+        start_id = 0
+        for worker_id, (count, warmup) in enumerate(zip(counts, warmups)):
+            futures.append(executor.submit(
+                process_worker, config, worker_id, start_id, count, warmup))
+            start_id += count + warmup
+        workers = [future.result() for future in futures]
+    wall_time = time.time() - start_time
+
+    # The timed window excludes process start-up and warmup
+    return TrialResult(
+        messages=sum(w['messages'] for w in workers),
+        duration=timed_window(workers),
+        workers=workers,
+        extra={'processes': config.processes, 'wall_time': wall_time},
+    )
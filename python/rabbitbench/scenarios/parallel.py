@@ -0,0 +1,205 @@
+"""The same producer or consumer worker run as threads, processes or sub-interpreters.
+
+The README found threads slower than one thread and processes the only way
+to scale, which holds for a GIL build. ``worker_mode`` picks how the
+``producers`` (or ``consumers``) workers run, each with its own connection:
+
+    thread          threads in this process; parallel only on a
+                    free-threaded build with the GIL off (3.13t and later)
+    process         a ProcessPoolExecutor, as ``multiprocess`` does
+    subinterpreter  one PEP 734 interpreter per worker, each with its own
+                    GIL, driven from a thread (needs Python 3.14)
+
+Each result records what the interpreter supports (see :mod:`runtime`)
+and the memory a worker costs. Thread and sub-interpreter workers share
+this process, so theirs is the growth of its RSS over the trial divided
+by the worker count; a process worker reports its own RSS, which also
+counts pages still shared with the parent after fork.
+"""
+
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .. import metrics
+from ..config import BenchConfig
+from ..connection import connect, declare_queue
+from ..memory import mib, rss_bytes
+from ..payloads import message_factory
+from ..publisher import publish_range
+from ..ratecontrol import pacer_for
+from ..results import TrialResult
+from ..runtime import capabilities, interpreters
+from . import scenario
+from .consumers import drain
+from .multiprocess import split_evenly, timed_window
+
+WORKER_MODES = ('thread', 'process', 'subinterpreter')
+TABLE = ('worker_mode', 'workers', 'gil_enabled', 'rss_per_worker_mib',
+         'rss_total_mib')
+
+
+def parallel_worker(config: BenchConfig, role: str, worker_id: int,
+                    start_id: int, count: int, warmup: int) -> dict:
+    """Publish or consume one share of the trial on a connection of its own"""
+    # Threads count into this process's live metrics; a process or
+    # sub-interpreter has its own module state and reports for itself
+    own_metrics = config.worker_mode != 'thread'
+    if own_metrics:
+        metrics.start_reporting(config, role, worker_id)
+    pacer = None
+    try:
+        connection = connect(config, quiet=True)
+        try:
+            channel = connection.channel()
+            declare_queue(channel, config)
+            if role == 'producer':
+                messages = message_factory(config)
+                publish_range(channel, config, start_id, warmup, messages=messages)
+                pacer = pacer_for(config, scale=1.0 / config.producers)
+                start = time.perf_counter()
+                done = publish_range(channel, config, start_id + warmup, count,
+                                     messages=messages, pacer=pacer)
+                end = time.perf_counter()
+            else:
+                counter = drain(connection, channel, config.replace(
+                    warmup=warmup, message_count=count, latency=False))
+                consumed = counter.result()
+                # The counter keeps wall-clock times; move its window onto
+                # perf_counter so it lines up with the other workers'
+                start = (counter.start_time or time.time()) + \
+                    time.perf_counter() - time.time()
+                done, end = consumed.messages, start + consumed.duration
+            rss = rss_bytes()
+        finally:
+            connection.close()
+    finally:
+        if own_metrics:
+            metrics.stop_reporting()
+
+    report = {
+        'worker': worker_id,
+        'messages': done,
+        'start': start,
+        'end': end,
+        'duration': end - start,
+        'rate': done / (end - start) if end > start else 0.0,
+        'rss_bytes': rss,
+    }
+    if pacer is not None:
+        report['rate_control'] = pacer.report()
+    return report
+
+
+class InterpreterPool:
+    """One sub-interpreter per worker, each called from its own thread
+
+    Every interpreter gets this process's ``sys.path`` first, so it
+    imports rabbitbench the same way however the harness was started.
+    """
+
+    def __init__(self, workers: int):
+        if interpreters is None:
+            raise ValueError('worker_mode=subinterpreter needs Python 3.14 or '
+                             f'later (concurrent.interpreters); this is '
+                             f'{sys.version.split()[0]}')
+        self.interpreters = []
+        for _ in range(workers):
+            interp = interpreters.create()
+            interp.exec(f'import sys; sys.path[:] = {sys.path!r}')
+            self.interpreters.append(interp)
+        self.threads = ThreadPoolExecutor(max_workers=workers)
+        self.next = 0
+
+    def submit(self, func, *args):
+        interp = self.interpreters[self.next]
+        self.next += 1
+        return self.threads.submit(interp.call, func, *args)
+
+    def shutdown(self) -> None:
+        self.threads.shutdown()
+        for interp in self.interpreters:
+            interp.close()
+
+
+def run_workers(config: BenchConfig, role: str, workers: int) -> TrialResult:
+    if config.worker_mode not in WORKER_MODES:
+        raise ValueError(f'Unknown worker_mode {config.worker_mode!r}; '
+                         f'expected one of {", ".join(WORKER_MODES)}')
+    counts = split_evenly(config.message_count, workers)
+    warmups = split_evenly(config.warmup, workers)
+    baseline = rss_bytes()
+
+    start_time = time.time()
+    if config.worker_mode == 'thread':
+        executor = ThreadPoolExecutor(max_workers=workers)
+    elif config.worker_mode == 'process':
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = InterpreterPool(workers)
+    try:
+        futures = []
+        start_id = 0
+        for worker_id, (count, warmup) in enumerate(zip(counts, warmups)):
+            futures.append(executor.submit(parallel_worker, config, role,
+                                           worker_id, start_id, count, warmup))
+            start_id += count + warmup
+        reports = [future.result() for future in futures]
+    finally:
+        executor.shutdown()
+    wall_time = time.time() - start_time
+
+    if config.worker_mode == 'process':
+        per_worker = sum(r['rss_bytes'] for r in reports) / workers
+        total = per_worker * workers + baseline
+    else:
+        total = max(r['rss_bytes'] for r in reports)
+        per_worker = max(total - baseline, 0) / workers
+    caps = capabilities()
+    return TrialResult(
+        messages=sum(r['messages'] for r in reports),
+        duration=timed_window(reports),
+        workers=reports,
+        extra={
+            'worker_mode': config.worker_mode,
+            'workers': workers,
+            'wall_time': wall_time,
+            'gil_enabled': caps['gil_enabled'],
+            'runtime': caps,
+            'rss_baseline_mib': mib(baseline),
+            'rss_per_worker_mib': mib(per_worker),
+            'rss_total_mib': mib(total),
+        },
+    )
+
+
+@scenario('parallel_publish', queue='parallel_queue', durable=False,
+          persistent=False, producers=4, table=TABLE)
+def parallel_publish(config: BenchConfig) -> TrialResult:
+    """producers workers publishing as threads, processes or sub-interpreters
+
+    Compare the modes with ``--vary worker_mode=thread,process,subinterpreter
+    --vary producers=1,2,4,8``, on a free-threaded build for the threads.
+    """
+    return run_workers(config, 'producer', config.producers)
+
+
+@scenario('parallel_consume', kind='consumer', queue='parallel_queue',
+          durable=False, persistent=False, consumers=4, table=TABLE)
+def parallel_consume(config: BenchConfig) -> TrialResult:
+    """consumers workers draining a pre-filled queue as threads, processes or sub-interpreters
+
+    The queue is purged and pre-filled with ``warmup + message_count``
+    messages; each worker consumes its share and then closes its
+    connection, handing back anything it had prefetched beyond it.
+    """
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        channel.queue_purge(config.queue)
+        publish_range(channel, config, 0, config.warmup + config.message_count,
+                      messages=message_factory(config))
+    finally:
+        connection.close()
+    return run_workers(config, 'consumer', config.consumers)
@@ -0,0 +1,74 @@
+import time
+
+from .. import metrics
+from ..codec import codec_for
+from ..config import BenchConfig
+from ..connection import connect, declare_queue
+from ..payloads import message_factory
+from ..results import TrialResult
+from ..stats import cpu_per_message
+from . import scenario
+from .consumers import drain
+
+
+@scenario('codec', kind='roundtrip', queue='codec_queue', durable=True,
+          persistent=False, payload_size=1024,
+          table=('codec', 'payload_size', 'persistent', 'body_bytes',
+                 'cpu_us_per_message', 'consumer.rate'))
+def codec_roundtrip(config: BenchConfig) -> TrialResult:
+    """Publish then drain the same messages with the configured codec and size
+
+    The trial's own rate is the producer side; the consumer side is reported
+    under ``extra['consumer']``. Build the codec x payload size x persistence
+    matrix with repeated ``--vary`` options.
+    """
+    codec = codec_for(config)
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        channel.queue_purge(config.queue)
+        body_for, properties_for = message_factory(config)
+
+        def publish(start_id, count):
+            sent_bytes = 0
+            live = metrics.active()
+            for i in range(start_id, start_id + count):
+                body = body_for(i)
+                sent_bytes += len(body)
+                channel.basic_publish(exchange='', routing_key=config.queue,
+                                      body=body, properties=properties_for())
+                if live is not None:
+                    live.on_publish(len(body))
+            return sent_bytes
+
+        publish(0, config.warmup)
+        start_time = time.time()
+        cpu_start = time.process_time()
+        sent_bytes = publish(config.warmup, config.message_count)
+        duration = time.time() - start_time
+        cpu = time.process_time() - cpu_start
+
+        consumed = drain(connection, channel, config).result()
+    finally:
+        connection.close()
+
+    count = config.message_count
+    return TrialResult(
+        messages=count,
+        duration=duration,
+        bytes=sent_bytes,
+        extra={
+            'codec': codec.name,
+            'payload_size': config.payload_size,
+            'persistent': config.persistent,
+            'body_bytes': round(sent_bytes / count) if count else 0,
+            'cpu_us_per_message': cpu_per_message(cpu, count),
+            'consumer': {
+                'messages': consumed.messages,
+                'rate': round(consumed.rate, 2),
+                'mb_per_sec': round(consumed.mb_per_sec, 3),
+                'cpu_us_per_message': consumed.extra['cpu_us_per_message'],
+            },
+        },
+    )
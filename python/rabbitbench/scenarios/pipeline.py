@@ -0,0 +1,262 @@
+"""Generator processes feeding publisher processes through shared memory.
+
+Models an upstream producer handing finished messages to a publishing
+tier. Generator ``g`` encodes its id range and deals the bodies
+round-robin into one :class:`SharedRing` per publisher; publisher ``p``
+polls the ``g``-th ring of every generator and only publishes. Nothing is
+pickled on the hot path, and each side records how long it waited on the
+other, which shows where the bottleneck sits.
+"""
+
+import math
+import multiprocessing
+import threading
+import time
+
+from .. import memory, metrics, profiling
+from ..config import BenchConfig
+from ..connection import connect, declare_queue
+from ..payloads import message_factory
+from ..ratecontrol import pacer_for
+from ..results import TrialResult
+from ..shmring import SharedRing
+from . import scenario
+from .multiprocess import gather, split_evenly, timed_window
+
+
+def generator_worker(config: BenchConfig, worker_id: int, start_id: int,
+                     warmup: int, count: int, ring_specs: list, barrier,
+                     results) -> None:
+    rings = []
+    try:
+        # Generators publish nothing, so they only need the profiler and
+        # the memory sampler
+        profiling.start(config, 'generator', worker_id)
+        memory.start(config, 'generator', worker_id)
+        rings = [SharedRing.attach(spec) for spec in ring_specs]
+        body_for, _ = message_factory(config)
+        pacer = pacer_for(config, scale=1.0 / config.generators)
+        fanout = len(rings)
+        barrier.wait()
+
+        for n, i in enumerate(range(start_id, start_id + warmup)):
+            rings[n % fanout].put(body_for(i))
+        for ring in rings:
+            ring.wait_time = 0.0
+
+        budget = 0
+        start = time.perf_counter()
+        for n, i in enumerate(range(start_id + warmup, start_id + warmup + count),
+                              warmup):
+            if pacer is not None:
+                while not budget:
+                    budget = pacer.acquire(warmup + count - n)
+                budget -= 1
+            rings[n % fanout].put(body_for(i))
+            if pacer is not None:
+                pacer.sent()
+        end = time.perf_counter()
+        duration = end - start
+
+        blocked = sum(ring.wait_time for ring in rings)
+        report = {'messages': count, 'start': start, 'end': end,
+                  'duration': duration,
+                  'rate': count / duration if duration > 0 else 0.0,
+                  'blocked_s': round(blocked, 4)}
+        if pacer is not None:
+            report['rate_control'] = pacer.report()
+        results.put(('generator', worker_id, report))
+    except Exception as e:
+        barrier.abort()
+        results.put(('error', f'generator {worker_id}', repr(e)))
+    finally:
+        memory.stop()
+        profiling.stop()
+        for ring in rings:
+            ring.close()
+
+
+def publisher_worker(config: BenchConfig, worker_id: int, ring_specs: list,
+                     warmups: list, counts: list, barrier, results) -> None:
+    rings = []
+    try:
+        rings = [SharedRing.attach(spec) for spec in ring_specs]
+        live = metrics.start_reporting(config, 'publisher', worker_id)
+        connection = connect(config, quiet=True)
+        try:
+            channel = connection.channel()
+            declare_queue(channel, config)
+            _, properties_for = message_factory(config)
+            remaining = [w + c for w, c in zip(warmups, counts)]
+            # Rings drain at different speeds, so the clock starts once
+            # every ring has handed over its own warmup share
+            warming = list(warmups)
+            cold = sum(1 for w in warming if w)
+            active = [k for k, left in enumerate(remaining) if left]
+            barrier.wait()
+
+            published = 0
+            warm_count = 0
+            starved = 0.0
+            start = time.perf_counter() if not cold else None
+            while active:
+                progressed = False
+                for k in active:
+                    body = rings[k].poll()
+                    if body is None:
+                        continue
+                    channel.basic_publish(exchange='', routing_key=config.queue,
+                                          body=body, properties=properties_for())
+                    remaining[k] -= 1
+                    published += 1
+                    if live is not None:
+                        live.on_publish(len(body))
+                    progressed = True
+                    if warming[k]:
+                        warming[k] -= 1
+                        if not warming[k]:
+                            cold -= 1
+                            if not cold:
+                                start = time.perf_counter()
+                                starved = 0.0
+                                warm_count = published
+                if not progressed:
+                    wait_start = time.perf_counter()
+                    time.sleep(0)
+                    starved += time.perf_counter() - wait_start
+                elif not all(remaining[k] for k in active):
+                    active = [k for k in active if remaining[k]]
+            end = time.perf_counter()
+        finally:
+            connection.close()
+            metrics.stop_reporting()
+
+        timed = published - warm_count
+        duration = end - start
+        results.put(('publisher', worker_id, {
+            'messages': timed, 'start': start, 'end': end, 'duration': duration,
+            'rate': timed / duration if duration > 0 else 0.0,
+            'starved_s': round(starved, 4)}))
+    except Exception as e:
+        barrier.abort()
+        results.put(('error', f'publisher {worker_id}', repr(e)))
+    finally:
+        for ring in rings:
+            ring.close()
+
+
+def slot_size_for(config: BenchConfig) -> int:
+    """Slot bytes for the largest id in the run, with room for variation"""
+    if config.slot_size:
+        return config.slot_size
+    body_for, _ = message_factory(config.replace(pool_size=1))
+    size = len(body_for(config.warmup + config.message_count))
+    return size + max(64, size // 8)
+
+
+@scenario('pipeline', kind='producer', queue='pipeline_queue', durable=False,
+          persistent=False, generators=1, producers=2)
+def pipeline(config: BenchConfig) -> TrialResult:
+    """`generators` encode into shared-memory rings, `producers` only publish
+
+    The trial's rate is the publishing tier's. ``bottleneck`` names the side
+    that spent the larger share of its time waiting for the other to catch
+    up: starved publishers mean the generators set the pace.
+    """
+    generators = max(config.generators, 1)
+    publishers = max(config.producers, 1)
+    slot_size = slot_size_for(config)
+    # rings[g][p] carries generator g's messages for publisher p
+    rings = [[SharedRing.create(config.ring_slots, slot_size)
+              for _ in range(publishers)] for _ in range(generators)]
+    context = multiprocessing.get_context()
+    barrier = context.Barrier(generators + publishers + 1)
+    results = context.Queue()
+
+    try:
+        counts = split_evenly(config.message_count, generators)
+        warmups = split_evenly(config.warmup, generators)
+        workers = []
+        start_id = 0
+        for g in range(generators):
+            workers.append(context.Process(target=generator_worker, args=(
+                config, g, start_id, warmups[g], counts[g],
+                [ring.spec for ring in rings[g]], barrier, results)))
+            start_id += warmups[g] + counts[g]
+        # Generator g deals message n to ring n % publishers, warmup first
+        warm_shares = [split_evenly(warmups[g], publishers)
+                       for g in range(generators)]
+        total_shares = [split_evenly(warmups[g] + counts[g], publishers)
+                        for g in range(generators)]
+        for p in range(publishers):
+            workers.append(context.Process(target=publisher_worker, args=(
+                config, p, [rings[g][p].spec for g in range(generators)],
+                [warm_shares[g][p] for g in range(generators)],
+                [total_shares[g][p] - warm_shares[g][p]
+                 for g in range(generators)],
+                barrier, results)))
+        for worker in workers:
+            worker.start()
+
+        try:
+            barrier.wait(timeout=config.connect_retries * config.retry_delay
+                         + config.consume_timeout)
+        except threading.BrokenBarrierError:
+            barrier.abort()
+
+        # Workers only report once they finish, so a long run must not
+        # count as silence; an exit without a report still raises
+        try:
+            gathered = gather(results, workers, math.inf,
+                              until=lambda report: report[0] == 'error')
+        except Exception:
+            for worker in workers:
+                worker.terminate()
+            raise
+        reports = {'generator': [], 'publisher': []}
+        errors = []
+        for kind, worker_id, report in gathered:
+            if kind == 'error':
+                errors.append(f'{worker_id}: {report}')
+            else:
+                report['worker'] = worker_id
+                reports[kind].append(report)
+        if errors:
+            # The other side of its rings would wait forever
+            for worker in workers:
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+    finally:
+        for row in rings:
+            for ring in row:
+                ring.close()
+    if errors:
+        raise RuntimeError('Pipeline run failed: ' + '; '.join(errors))
+
+    generated = reports['generator']
+    published = reports['publisher']
+    generate_time = timed_window(generated)
+    duration = timed_window(published)
+    blocked = sum(r['blocked_s'] for r in generated) / sum(
+        r['duration'] for r in generated) if generate_time > 0 else 0.0
+    starved = sum(r['starved_s'] for r in published) / sum(
+        r['duration'] for r in published) if duration > 0 else 0.0
+    messages = sum(r['messages'] for r in published)
+    return TrialResult(
+        messages=messages,
+        duration=duration,
+        workers=[dict(r, role=kind) for kind in ('generator', 'publisher')
+                 for r in sorted(reports[kind], key=lambda r: r['worker'])],
+        extra={
+            'generators': generators,
+            'publishers': publishers,
+            'ring_slots': config.ring_slots,
+            'slot_size': slot_size,
+            'generate_rate': round(sum(r['messages'] for r in generated)
+                                   / generate_time, 1) if generate_time > 0 else 0.0,
+            'generator_blocked': round(blocked, 3),
+            'publisher_starved': round(starved, 3),
+            'bottleneck': 'generators' if starved > blocked else 'publishers',
+        },
+    )
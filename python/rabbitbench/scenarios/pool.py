@@ -0,0 +1,150 @@
+"""Multi-process consumer pool draining a pre-filled queue."""
+
+import multiprocessing
+import time
+
+from .. import metrics
+from ..acking import AckBatcher
+from ..codec import codec_for
+from ..config import BenchConfig
+from ..connection import connect, consume_arguments, declare_queue
+from ..payloads import message_factory
+from ..publisher import publish_range
+from ..results import TrialResult
+from . import scenario
+from .multiprocess import gather
+
+
+def pool_worker(config: BenchConfig, worker_id: int, consumed, ready, go, stop,
+                results) -> None:
+    """One consumer process with its own connection, prefetch and ack batching"""
+    try:
+        live = metrics.start_reporting(config, 'consumer', worker_id)
+        connection = connect(config, quiet=True)
+        try:
+            channel = connection.channel()
+            declare_queue(channel, config)
+            channel.basic_qos(prefetch_count=config.prefetch_count)
+            decode = codec_for(config).decode
+            acks = AckBatcher(channel, config.ack_every, config.ack_interval,
+                              config.prefetch_count)
+            times = {'first': None, 'last': None}
+
+            def on_message(ch, method, properties, body):
+                decode(body)
+                acks.delivered(method.delivery_tag)
+                consumed.value += 1
+                if live is not None:
+                    live.on_consume(len(body))
+                times['last'] = time.time()
+                if times['first'] is None:
+                    times['first'] = times['last']
+
+            # Register before reporting ready so every worker is attached
+            # when go is set. The broker still pushes each worker up to
+            # prefetch_count messages as soon as it registers, so the first
+            # to attach may hold its window early; pika only dispatches them
+            # to on_message from process_data_events, after go
+            channel.basic_consume(queue=config.queue, on_message_callback=on_message,
+                                  arguments=consume_arguments(config))
+            ready.set()
+            go.wait()
+            poll = min(config.ack_interval or 0.05, 0.05)
+            while not stop.is_set():
+                connection.process_data_events(time_limit=poll)
+                acks.tick()
+            acks.flush()
+        finally:
+            connection.close()
+            metrics.stop_reporting()
+
+        duration = (times['last'] - times['first']) if times['first'] else 0.0
+        results.put((worker_id, {
+            'worker': worker_id,
+            'messages': consumed.value,
+            'duration': duration,
+            'rate': consumed.value / duration if duration > 0 else 0.0,
+            'acks_sent': acks.acks_sent,
+        }))
+    except Exception as e:
+        results.put((worker_id, e))
+
+
+@scenario('consumer_pool', kind='consumer', queue='pool_queue', durable=False,
+          persistent=False, consumers=4)
+def consumer_pool(config: BenchConfig) -> TrialResult:
+    """K consumer processes with per-worker prefetch and batched multiple=True acks
+
+    The queue is purged and pre-filled with ``warmup + message_count``
+    messages, then every worker starts consuming at once. The timed window
+    runs from the moment ``warmup`` messages have been consumed in total to
+    the moment the last one is.
+    """
+    target = config.warmup + config.message_count
+    context = multiprocessing.get_context()
+    go = context.Event()
+    stop = context.Event()
+    results = context.Queue()
+    counters = [context.RawValue('q', 0) for _ in range(config.consumers)]
+    readies = [context.Event() for _ in range(config.consumers)]
+
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        channel.queue_purge(config.queue)
+        publish_range(channel, config, 0, target, messages=message_factory(config))
+
+        workers = [context.Process(target=pool_worker, args=(
+            config, worker_id, counters[worker_id], readies[worker_id], go, stop,
+            results)) for worker_id in range(config.consumers)]
+        for worker in workers:
+            worker.start()
+        for ready in readies:
+            ready.wait(config.consume_timeout + config.retry_delay)
+
+        go.set()
+        start_time = end_time = None
+        last_total, idle_since = -1, time.time()
+        while True:
+            total = sum(c.value for c in counters)
+            now = time.time()
+            if start_time is None and total >= config.warmup:
+                start_time, start_total = now, total
+            if total >= target:
+                end_time = now
+                break
+            if total != last_total:
+                last_total, idle_since = total, now
+            elif now - idle_since >= config.consume_timeout:
+                break
+            time.sleep(0.005)
+    finally:
+        stop.set()
+        go.set()
+        connection.close()
+
+    reports = dict(gather(results, workers,
+                          config.consume_timeout + config.retry_delay))
+    for worker in workers:
+        worker.join()
+    errors = [f'worker {w}: {r!r}' for w, r in reports.items()
+              if isinstance(r, Exception)]
+    if errors:
+        raise RuntimeError('Consumer pool failed: ' + '; '.join(errors))
+
+    total = sum(r['messages'] for r in reports.values())
+    if start_time is None:
+        start_time, start_total = time.time(), total
+    # On timeout, stop the clock at the last progress rather than the idle wait
+    end_time = end_time or idle_since
+    return TrialResult(
+        messages=max(total - start_total, 0),
+        duration=end_time - start_time,
+        workers=[reports[w] for w in sorted(reports)],
+        extra={'consumers': config.consumers,
+               'prefetch_count': config.prefetch_count,
+               'ack_every': min(config.ack_every, config.prefetch_count or config.ack_every),
+               'ack_interval': config.ack_interval,
+               'timed_out': total < target},
+    )
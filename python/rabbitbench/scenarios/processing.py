@@ -0,0 +1,203 @@
+"""Consumers that hand each delivery to a pool for processing.
+
+``processing=inline`` decodes and does the simulated work in the pika
+callback, as ``consumer_fast_docker.py`` does, so the connection's I/O loop
+stalls for as long as the work takes. ``thread`` and ``process`` submit
+the body to a pool of ``pool_workers`` instead; when the work finishes,
+the delivery is acked back on the connection's thread through
+:class:`OrderedAcker`, which coalesces contiguous tags into
+``multiple=True`` acks. The prefetch window bounds how much work can be
+queued in the pool.
+
+``work=cpu`` spins for ``work_time`` seconds, holding the GIL in a thread
+pool; ``work=sleep`` sleeps, like waiting on a database or an HTTP call.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .. import metrics
+from ..acking import AckBatcher, OrderedAcker
+from ..codec import codec_for
+from ..config import BenchConfig
+from ..connection import connect, consume_arguments, declare_queue
+from ..payloads import message_factory
+from ..publisher import publish_range
+from ..results import TrialResult
+from ..stats import cpu_per_message
+from . import scenario
+
+PROCESSING_MODES = ('inline', 'thread', 'process')
+WORK_KINDS = ('cpu', 'sleep')
+
+_decode = None
+
+
+def simulate_work(work: str, seconds: float) -> None:
+    if seconds <= 0:
+        return
+    if work == 'sleep':
+        time.sleep(seconds)
+        return
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def init_worker(config: BenchConfig) -> None:
+    """Pool initializer: build the decoder once per worker process"""
+    global _decode
+    _decode = codec_for(config).decode
+
+
+def process_message(body: bytes, work: str, work_time: float) -> None:
+    _decode(body)
+    simulate_work(work, work_time)
+
+
+class PoolConsumer:
+    """Delivery callback and completion tracking for one consume trial"""
+
+    def __init__(self, connection, channel, config: BenchConfig, executor):
+        self.connection = connection
+        self.channel = channel
+        self.config = config
+        self.executor = executor
+        self.target = config.warmup + config.message_count
+        self.processed = 0
+        self.bytes = 0
+        self.start_time = time.time() if config.warmup == 0 else None
+        self.start_bytes = 0
+        self.last_time = None
+        self.errors = []
+        self.live = metrics.active()
+        init_worker(config)
+        if executor is None:
+            self.acks = AckBatcher(channel, config.ack_every, config.ack_interval,
+                                   config.prefetch_count)
+        else:
+            self.acks = OrderedAcker(connection, channel,
+                                     on_completed=self.on_completed)
+
+    def __call__(self, ch, method, properties, body):
+        self.bytes += len(body)
+        if self.live is not None:
+            self.live.on_consume(len(body))
+        if self.executor is None:
+            process_message(body, self.config.work, self.config.work_time)
+            self.acks.delivered(method.delivery_tag)
+            self.on_completed(1)
+            return
+        future = self.executor.submit(process_message, body, self.config.work,
+                                      self.config.work_time)
+        tag = method.delivery_tag
+        future.add_done_callback(lambda f: self.finished(f, tag))
+
+    def finished(self, future, delivery_tag: int) -> None:
+        # Runs on a pool thread (or the process pool's result thread), or
+        # on the thread shutting the pool down for work it cancelled
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.errors.append(repr(future.exception()))
+        self.acks.completed(delivery_tag)
+
+    def on_completed(self, count: int) -> None:
+        # Always on the connection's thread
+        self.processed += count
+        self.last_time = time.time()
+        if self.start_time is None and self.processed >= self.config.warmup:
+            self.start_time = self.last_time
+            self.start_bytes = self.bytes
+
+    @property
+    def done(self) -> bool:
+        return self.processed >= self.target or bool(self.errors)
+
+
+def make_executor(config: BenchConfig):
+    if config.processing == 'thread':
+        return ThreadPoolExecutor(max_workers=config.pool_workers)
+    if config.processing == 'process':
+        executor = ProcessPoolExecutor(max_workers=config.pool_workers,
+                                       initializer=init_worker,
+                                       initargs=(config,))
+        # Start every worker process now rather than inside the timed window
+        for future in [executor.submit(simulate_work, 'sleep', 0.05)
+                       for _ in range(config.pool_workers)]:
+            future.result()
+        return executor
+    return None
+
+
+@scenario('work_pool', kind='consumer', queue='work_queue', durable=False,
+          persistent=False, processing='thread', work_time=0.001)
+def work_pool(config: BenchConfig) -> TrialResult:
+    """Consume with simulated per-message work done inline or in a thread/process pool
+
+    The queue is purged and pre-filled with ``warmup + message_count``
+    messages first. Chart it with ``--vary processing=inline,thread,process
+    --vary pool_workers=1,4,16 --vary work_time=0.0001,0.001,0.01``.
+    """
+    if config.processing not in PROCESSING_MODES:
+        raise ValueError(f'Unknown processing {config.processing!r}; '
+                         f'expected one of {", ".join(PROCESSING_MODES)}')
+    if config.work not in WORK_KINDS:
+        raise ValueError(f'Unknown work {config.work!r}; '
+                         f'expected one of {", ".join(WORK_KINDS)}')
+    executor = make_executor(config)
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        channel.queue_purge(config.queue)
+        target = config.warmup + config.message_count
+        publish_range(channel, config, 0, target, messages=message_factory(config))
+
+        channel.basic_qos(prefetch_count=config.prefetch_count)
+        consumer = PoolConsumer(connection, channel, config, executor)
+        cpu_start = time.process_time()
+        channel.basic_consume(queue=config.queue, on_message_callback=consumer,
+                              arguments=consume_arguments(config))
+        idle_since, last_processed = time.time(), 0
+        while not consumer.done:
+            connection.process_data_events(time_limit=0.05)
+            if isinstance(consumer.acks, AckBatcher):
+                consumer.acks.tick()
+            if consumer.processed != last_processed:
+                idle_since, last_processed = time.time(), consumer.processed
+            elif time.time() - idle_since >= config.consume_timeout:
+                break
+        if isinstance(consumer.acks, AckBatcher):
+            consumer.acks.flush()
+        cpu = time.process_time() - cpu_start
+    finally:
+        # Let running work finish first: its completions schedule acks on
+        # the connection, which must still be open to take them
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        connection.close()
+
+    if consumer.errors:
+        raise RuntimeError('Processing failed: ' + consumer.errors[0])
+    timed = max(consumer.processed - config.warmup, 0)
+    start_time = consumer.start_time or time.time()
+    duration = (consumer.last_time or start_time) - start_time
+    workers = 1 if config.processing == 'inline' else config.pool_workers
+    extra = {
+        'processing': config.processing,
+        'pool_workers': workers,
+        'work': config.work,
+        'work_time': config.work_time,
+        'prefetch_count': config.prefetch_count,
+        'acks_sent': consumer.acks.acks_sent,
+        'timed_out': consumer.processed < target,
+        'cpu_us_per_message': cpu_per_message(cpu, consumer.processed),
+    }
+    if config.work_time > 0:
+        # What the pool could do if handing work over cost nothing
+        extra['ideal_rate'] = round(workers / config.work_time, 1)
+    if isinstance(consumer.acks, OrderedAcker):
+        extra['max_held_acks'] = consumer.acks.max_held
+    return TrialResult(messages=timed, duration=duration,
+                       bytes=consumer.bytes - consumer.start_bytes, extra=extra)
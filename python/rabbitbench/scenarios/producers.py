@@ -0,0 +1,187 @@
+import time
+
+import pika
+
+from .. import metrics
+from ..config import BenchConfig
+from ..connection import connect, declare_queue
+from ..fastpath import FramePublisher
+from ..messages import encode_message
+from ..payloads import message_factory
+from ..publisher import publish_range
+from ..ratecontrol import pacer_for
+from ..results import TrialResult
+from ..stats import cpu_per_message
+from . import scenario
+
+
+def simple_publish(config: BenchConfig) -> TrialResult:
+    """Connect, publish the warmup untimed, then time ``message_count``"""
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        messages = message_factory(config)
+
+        publish_range(channel, config, 0, config.warmup, messages=messages)
+
+        pacer = pacer_for(config)
+        start_time = time.time()
+        cpu_start = time.process_time()
+        sent = publish_range(channel, config, config.warmup,
+                             config.message_count, progress_from=start_time,
+                             messages=messages, pacer=pacer)
+        duration = time.time() - start_time
+        cpu = time.process_time() - cpu_start
+    finally:
+        connection.close()
+
+    extra = {'cpu_us_per_message': cpu_per_message(cpu, sent)}
+    if pacer is not None:
+        extra['rate_control'] = pacer.report()
+    return TrialResult(messages=sent, duration=duration, extra=extra)
+
+
+@scenario('persistent', queue='persistent_queue', durable=True, persistent=True)
+def persistent(config: BenchConfig) -> TrialResult:
+    """Persistent messages + durable queue"""
+    return simple_publish(config)
+
+
+@scenario('non_persistent', queue='fast_queue', durable=False, persistent=False)
+def non_persistent(config: BenchConfig) -> TrialResult:
+    """Non-persistent messages + non-durable queue"""
+    return simple_publish(config)
+
+
+@scenario('sleep', queue='sleep_queue', durable=True, persistent=True,
+          sleep_time=0.001)
+def sleep_throttled(config: BenchConfig) -> TrialResult:
+    """Persistent messages throttled by time.sleep(sleep_time) per message"""
+    return simple_publish(config)
+
+
+@scenario('rate_limited', queue='hello_queue', durable=True, persistent=True,
+          rate=1000)
+def rate_limited(config: BenchConfig) -> TrialResult:
+    """Persistent messages paced by the closed-loop rate controller"""
+    return simple_publish(config)
+
+
+@scenario('single_thread', queue='fast_queue', durable=False, persistent=False)
+def optimized_single_thread(config: BenchConfig) -> TrialResult:
+    """Optimized single thread reusing one message dict template"""
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+
+        # The dict template only applies to the default small JSON message
+        templated = (not config.preencode and config.codec == 'json'
+                     and config.compression == 'none' and not config.payload_size)
+        message_template = {'id': 0, 'content': 'Hello World #0', 'timestamp': ''}
+        messages = message_factory(config)
+
+        def publish(start_id, count):
+            if not templated:
+                return publish_range(channel, config, start_id, count,
+                                     messages=messages)
+            live = metrics.active()
+            for i in range(start_id, start_id + count):
+                message_template['id'] = i
+                message_template['content'] = f'Hello World #{i}'
+                body = encode_message(message_template)
+                channel.basic_publish(
+                    exchange='',
+                    routing_key=config.queue,
+                    body=body,
+                    properties=pika.BasicProperties(
+                        delivery_mode=config.delivery_mode),
+                )
+                if live is not None:
+                    live.on_publish(len(body))
+
+        publish(0, config.warmup)
+        start_time = time.time()
+        publish(config.warmup, config.message_count)
+        duration = time.time() - start_time
+    finally:
+        connection.close()
+
+    return TrialResult(messages=config.message_count, duration=duration)
+
+
+@scenario('raw_frames', queue='fast_queue', durable=False, persistent=False,
+          preencode=True)
+def raw_frames(config: BenchConfig) -> TrialResult:
+    """Pre-built publish frames written batch_size at a time with one sendall
+
+    The timed part ends with a passive declare, so the rate counts only
+    messages the broker has read.
+    """
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        publisher = FramePublisher(connection, channel, config)
+
+        publisher.publish(0, config.warmup)
+        publisher.barrier()
+
+        pacer = pacer_for(config)
+        start_time = time.time()
+        cpu_start = time.process_time()
+        sent = publisher.publish(config.warmup, config.message_count,
+                                 pacer=pacer, progress_from=start_time)
+        publisher.barrier()
+        duration = time.time() - start_time
+        cpu = time.process_time() - cpu_start
+    finally:
+        connection.close()
+
+    extra = {'cpu_us_per_message': cpu_per_message(cpu, sent),
+             'batch_size': config.batch_size}
+    if pacer is not None:
+        extra['rate_control'] = pacer.report()
+    return TrialResult(messages=sent, duration=duration, extra=extra)
+
+
+@scenario('batched', queue='optimized_queue', durable=False, persistent=False)
+def single_thread_batched(config: BenchConfig) -> TrialResult:
+    """Single thread building messages in batches on a confirm-mode channel"""
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        declare_queue(channel, config)
+        channel.confirm_delivery()
+        body_for, properties_for = message_factory(config,
+                                                   min_slots=config.batch_size)
+
+        def publish(start_id, count):
+            sent = 0
+            live = metrics.active()
+            end = start_id + count
+            for batch_start in range(start_id, end, config.batch_size):
+                batch = [body_for(i) for i in
+                         range(batch_start, min(batch_start + config.batch_size, end))]
+                for body in batch:
+                    channel.basic_publish(
+                        exchange='',
+                        routing_key=config.queue,
+                        body=body,
+                        properties=properties_for(),
+                    )
+                    sent += 1
+                    if live is not None:
+                        live.on_publish(len(body))
+            return sent
+
+        publish(0, config.warmup)
+        start_time = time.time()
+        sent = publish(config.warmup, config.message_count)
+        duration = time.time() - start_time
+    finally:
+        connection.close()
+
+    return TrialResult(messages=sent, duration=duration,
+                       extra={'batch_size': config.batch_size})
@@ -0,0 +1,82 @@
+"""The same durable workload against each RabbitMQ queue type.
+
+``queue_type`` selects a classic, lazy (``x-queue-mode: lazy``), quorum
+or stream queue, and ``max_length``, ``max_length_bytes``, ``overflow``,
+``message_ttl`` and ``max_age`` add the matching ``x-`` arguments, for
+every scenario. The ``queue_types`` scenario runs the workload the
+comparison needs: it recreates its queue, publishes with confirms and
+then consumes what the queue kept, so each type starts from the same
+empty state. RabbitMQ 3.12 and later ignore ``x-queue-mode``, as every
+classic queue there already pages messages out the way lazy ones did.
+"""
+
+from ..config import BenchConfig
+from ..connection import (connect, declare_queue, queue_arguments,
+                          queue_depth)
+from ..results import TrialResult
+from . import scenario
+from .confirms import confirms
+from .consumers import drain
+
+
+@scenario('queue_types', kind='roundtrip', queue='queue_suite', durable=True,
+          persistent=True, confirm_mode='window',
+          table=('publish_rate', 'consume_rate', 'confirm_latency_ms.p50',
+                 'confirm_latency_ms.p99', 'consumed'))
+def queue_types(config: BenchConfig) -> TrialResult:
+    """Confirmed publish then consume on a fresh classic, lazy, quorum or stream queue
+
+    Each queue type gets its own queue, ``<queue>.<queue_type>``, deleted
+    and declared again every trial. The trial rate is the timed messages
+    over the time spent publishing and consuming them. Compare the types
+    side by side with ``--vary queue_type=classic,lazy,quorum,stream``.
+
+    Only confirm latency is compared. Consuming starts after publishing
+    ends, so publish-to-consume latency here would mostly be how long a
+    message sat in the queue; run ``latency`` with ``--vary queue_type=...``
+    for end-to-end latency per type.
+    """
+    config = config.replace(queue=f'{config.queue}.{config.queue_type}')
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        channel.queue_delete(queue=config.queue)
+        declare_queue(channel, config)
+    finally:
+        connection.close()
+
+    published = confirms(config)
+
+    connection = connect(config)
+    try:
+        channel = connection.channel()
+        if config.queue_type == 'stream':
+            # A stream keeps everything it accepted and reports no depth
+            kept = config.warmup + published.extra.get('acked', published.messages)
+        else:
+            kept = queue_depth(channel, config.queue)[0]
+        # Consume the warmup messages untimed, unless a limit dropped them;
+        # latency stays off, see the docstring
+        timed = min(kept, config.message_count)
+        counter = drain(connection, channel, config.replace(
+            warmup=kept - timed, message_count=timed, latency=False))
+    finally:
+        connection.close()
+    consumed = counter.result()
+
+    extra = {
+        'queue_type': config.queue_type,
+        'arguments': queue_arguments(config) or {},
+        'publish_rate': round(published.rate, 1),
+        'consume_rate': round(consumed.rate, 1),
+        'consumed': consumed.messages,
+        'timed_out': consumed.extra['timed_out'],
+    }
+    extra.update({key: value for key, value in published.extra.items()
+                  if key in ('acked', 'nacked', 'confirm_latency_ms')})
+    return TrialResult(
+        messages=published.messages,
+        duration=published.duration + consumed.duration,
+        bytes=consumed.bytes,
+        extra=extra,
+    )
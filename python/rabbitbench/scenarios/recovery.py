@@ -0,0 +1,126 @@
+"""Publishing and consuming through broker restarts.
+
+``broker_restart`` runs a :class:`ResilientPublisher` and a
+:class:`RecoveringConsumer` on separate connections and restarts the
+broker ``restarts`` times, evenly spaced over the messages confirmed.
+By default it starts its own stand-in broker (ignoring ``host`` and
+``port``) and keeps it down for ``restart_downtime`` seconds each time;
+with ``restart_command`` set it runs that command against the configured
+broker instead, e.g. ``docker restart rabbitmq``.
+
+A restart keeps only durable queues and persistent messages, so
+``--vary persistent=true,false`` shows what a transient workload loses.
+"""
+
+import asyncio
+import time
+
+from ..config import BenchConfig
+from ..resilience import RecoveringConsumer, RecoveringSession, ResilientPublisher
+from ..results import TrialResult
+from ..stubbroker import StubBroker
+from . import scenario
+
+
+async def inject_restarts(config: BenchConfig, broker, publisher, sessions: list,
+                          restarts: list) -> None:
+    loop = asyncio.get_running_loop()
+    for k in range(1, config.restarts + 1):
+        threshold = config.message_count * k // (config.restarts + 1)
+        # Count confirms rather than messages generated, which run ahead
+        # into the buffer during an outage, and let every client recover
+        # from the last restart first
+        while len(publisher.confirmed) < threshold or \
+                not all(session.ready.is_set() for session in sessions):
+            await asyncio.sleep(0.005)
+        began = time.time()
+        if broker is not None:
+            await loop.run_in_executor(None, broker.restart,
+                                       config.restart_downtime)
+        else:
+            process = await asyncio.create_subprocess_shell(config.restart_command)
+            await process.wait()
+        restarts.append({'at': began, 'restart_s': round(time.time() - began, 3)})
+
+
+def recovery_times(restarts: list, sessions: list) -> list:
+    """Seconds from each restart to every session being ready again"""
+    for restart in restarts:
+        for session in sessions:
+            outage = next((o for o in session.outages
+                           if o['lost_at'] >= restart['at']), None)
+            if outage is not None:
+                restart[f'{session.role}_s'] = round(
+                    outage['ready_at'] - restart['at'], 3)
+                restart[f'{session.role}_attempts'] = outage['attempts']
+    return restarts
+
+
+async def recovery_trial(config: BenchConfig, broker) -> TrialResult:
+    producer = RecoveringSession(config, 'producer')
+    consumer_session = RecoveringSession(config, 'consumer')
+    publisher = ResilientPublisher(producer, config.confirm_window)
+    consumer = RecoveringConsumer(consumer_session, config.message_count)
+    restarts = []
+    injector = None
+    try:
+        await producer.open()
+        await producer._call(producer.channel.queue_purge, config.queue)
+        await consumer_session.open()
+
+        start_time = time.time()
+        injector = asyncio.ensure_future(
+            inject_restarts(config, broker, publisher,
+                            [producer, consumer_session], restarts))
+        await publisher.publish(config.message_count, rate=config.rate)
+        consumed = await consumer.wait()
+        end_time = consumer.last_time or time.time()
+        await injector
+    finally:
+        if injector is not None:
+            injector.cancel()
+        await consumer_session.close()
+        await producer.close()
+
+    recovery_times(restarts, [producer, consumer_session])
+    recovered = [r[key] for r in restarts for key in ('producer_s', 'consumer_s')
+                 if key in r]
+    extra = {
+        'broker': config.restart_command or 'stand-in',
+        'restarts': restarts,
+        'recover_s': max(recovered) if recovered else 0.0,
+        'buffered': publisher.buffered,
+        'max_buffered': publisher.max_buffered,
+        'republished': publisher.republished,
+        'confirmed': len(publisher.confirmed),
+        'nacked': publisher.nacked,
+        'consumed': consumed,
+        'lost': len(publisher.confirmed - consumer.seen),
+        'duplicated': consumer.duplicates,
+        'redelivered': consumer.redelivered,
+        'timed_out': not consumer.done.is_set(),
+    }
+    return TrialResult(messages=consumed, duration=end_time - start_time,
+                       bytes=consumer.bytes, extra=extra)
+
+
+@scenario('broker_restart', kind='roundtrip', queue='recovery_queue', durable=True,
+          persistent=True,
+          table=('recover_s', 'buffered', 'republished', 'lost', 'duplicated'))
+def broker_restart(config: BenchConfig) -> TrialResult:
+    """Confirmed publish and consume while the broker restarts, recovering each time
+
+    The rate is distinct messages consumed over the whole run, outages
+    included; ``warmup`` is not used. ``recover_s`` is the longest time
+    from a restart starting to a client being connected with its topology
+    declared again.
+    """
+    broker = None
+    if not config.restart_command:
+        broker = StubBroker().start()
+        config = config.replace(host=broker.host, port=broker.port)
+    try:
+        return asyncio.run(recovery_trial(config, broker))
+    finally:
+        if broker is not None:
+            broker.stop()
@@ -0,0 +1,68 @@
+"""Spread one logical stream over several queues.
+
+A RabbitMQ queue is a single Erlang process, so one queue caps throughput
+no matter how many producers feed it. With ``shards`` > 1 messages are
+routed by key (the message id) to one of S queues named ``<queue>.<n>``:
+
+    queue            publish straight to the shard queue (default exchange)
+    direct           a direct exchange with one ``shard.<n>`` binding per queue
+    consistent-hash  an ``x-consistent-hash`` exchange (needs the
+                     rabbitmq_consistent_hash_exchange plugin) hashing the id
+"""
+
+from .config import BenchConfig
+from .connection import queue_arguments, queue_durable
+
+SHARD_MODES = ('queue', 'direct', 'consistent-hash')
+
+
+def shard_queues(config: BenchConfig) -> list:
+    if config.shards <= 1 and config.shard_mode == 'queue':
+        return [config.queue]
+    return [f'{config.queue}.{n}' for n in range(max(config.shards, 1))]
+
+
+def exchange_name(config: BenchConfig) -> str:
+    return f'{config.queue}.shards'
+
+
+def declare_shards(channel, config: BenchConfig) -> list:
+    """Declare every shard queue plus the routing exchange; returns the queues"""
+    if config.shard_mode not in SHARD_MODES:
+        raise ValueError(f'shard_mode must be one of {", ".join(SHARD_MODES)}, '
+                         f'not {config.shard_mode!r}')
+
+    queues = shard_queues(config)
+    for queue in queues:
+        channel.queue_declare(queue=queue, durable=queue_durable(config),
+                              arguments=queue_arguments(config))
+
+    if config.shard_mode != 'queue':
+        exchange = exchange_name(config)
+        exchange_type = ('direct' if config.shard_mode == 'direct'
+                         else 'x-consistent-hash')
+        channel.exchange_declare(exchange=exchange, exchange_type=exchange_type,
+                                 durable=config.durable)
+        for n, queue in enumerate(queues):
+            # For consistent hashing the binding key is the shard's weight
+            key = f'shard.{n}' if config.shard_mode == 'direct' else '1'
+            channel.queue_bind(queue=queue, exchange=exchange, routing_key=key)
+    return queues
+
+
+def shard_router(config: BenchConfig):
+    """Return ``route(message_id) -> (exchange, routing_key)``"""
+    queues = shard_queues(config)
+    count = len(queues)
+
+    if config.shard_mode == 'queue':
+        if count == 1:
+            only = queues[0]
+            return lambda i: ('', only)
+        return lambda i: ('', queues[i % count])
+
+    exchange = exchange_name(config)
+    if config.shard_mode == 'direct':
+        keys = [f'shard.{n}' for n in range(count)]
+        return lambda i: (exchange, keys[i % count])
+    return lambda i: (exchange, str(i))
@@ -0,0 +1,122 @@
+import math
+from typing import Iterable, Sequence
+
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def percentiles(values: Iterable[float],
+                pcts: Sequence[float] = DEFAULT_PERCENTILES) -> dict:
+    """Percentile summary keyed like ``p50``/``p99.9`` plus ``max``"""
+    ordered = sorted(values)
+    summary = {f'p{pct:g}': percentile(ordered, pct) for pct in pcts}
+    summary['max'] = ordered[-1] if ordered else 0.0
+    summary['count'] = len(ordered)
+    return summary
+
+
+def cpu_per_message(cpu_seconds: float, messages: int) -> float:
+    """Client CPU microseconds per message"""
+    return round(cpu_seconds * 1e6 / messages, 2) if messages else 0.0
+
+
+def linear_slope(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """Least-squares slope of ``ys`` against ``xs``"""
+    n = len(xs)
+    if n < 2:
+        return 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+
+
+def _t_pdf(t: float, df: float) -> float:
+    log_norm = (math.lgamma((df + 1) / 2) - math.lgamma(df / 2)
+                - 0.5 * math.log(df * math.pi))
+    return math.exp(log_norm - (df + 1) / 2 * math.log1p(t * t / df))
+
+
+def t_cdf(t: float, df: float) -> float:
+    """Student's t distribution function, by Simpson's rule from 0 to ``t``
+
+    Accurate to well under 1e-6 for the df of a few dozen trials, which is
+    all a benchmark comparison needs, without depending on scipy.
+    """
+    x = min(abs(t), 1e3)
+    steps = 2000
+    h = x / steps
+    area = _t_pdf(0.0, df) + _t_pdf(x, df)
+    for i in range(1, steps):
+        area += (4 if i % 2 else 2) * _t_pdf(i * h, df)
+    half = min(area * h / 3, 0.5)
+    return 0.5 + half if t >= 0 else 0.5 - half
+
+
+def t_quantile(p: float, df: float) -> float:
+    """Inverse of :func:`t_cdf`, by bisection"""
+    if p == 0.5:
+        return 0.0
+    if p < 0.5:
+        return -t_quantile(1 - p, df)
+    low, high = 0.0, 1.0
+    while t_cdf(high, df) < p:
+        high *= 2
+    for _ in range(60):
+        mid = (low + high) / 2
+        if t_cdf(mid, df) < p:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def describe(values: Sequence[float], confidence: float = 0.95) -> dict:
+    """Mean, sample stdev and the t confidence interval of the mean"""
+    n = len(values)
+    if not n:
+        return {'n': 0}
+    mean = sum(values) / n
+    stdev = (math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+             if n > 1 else 0.0)
+    margin = (t_quantile((1 + confidence) / 2, n - 1) * stdev / math.sqrt(n)
+              if n > 1 else float('nan'))
+    return {'n': n, 'mean': mean, 'stdev': stdev,
+            'cv': stdev / mean if mean else 0.0,
+            'ci_low': mean - margin, 'ci_high': mean + margin,
+            'confidence': confidence}
+
+
+def welch(a: Sequence[float], b: Sequence[float],
+          confidence: float = 0.95) -> dict:
+    """Welch's t-test of ``mean(b) - mean(a)``, with its confidence interval
+
+    Welch rather than Student because a broker or client change can alter
+    the run-to-run spread as well as the mean.
+    """
+    n_a, n_b = len(a), len(b)
+    if n_a < 2 or n_b < 2:
+        return {}
+    da, db = describe(a), describe(b)
+    var_a, var_b = da['stdev'] ** 2 / n_a, db['stdev'] ** 2 / n_b
+    diff = db['mean'] - da['mean']
+    error = math.sqrt(var_a + var_b)
+    if error == 0:
+        return {'diff': diff, 't': 0.0, 'df': n_a + n_b - 2,
+                'p_value': 1.0 if diff == 0 else 0.0,
+                'ci_low': diff, 'ci_high': diff}
+    df = (var_a + var_b) ** 2 / (var_a ** 2 / (n_a - 1) + var_b ** 2 / (n_b - 1))
+    t = diff / error
+    margin = t_quantile((1 + confidence) / 2, df) * error
+    return {'diff': diff, 't': t, 'df': df,
+            'p_value': 2 * (1 - t_cdf(abs(t), df)),
+            'ci_low': diff - margin, 'ci_high': diff + margin}
@@ -0,0 +1,740 @@
+"""Loopback AMQP 0-9-1 stand-in broker.
+
+Implements just enough of the protocol for the benchmark clients:
+connection and channel lifecycle, exchange/queue declare, bind and purge,
+basic.qos/publish/consume/cancel/get/ack/nack/reject and confirm.select.
+Messages live in memory only and properties are forwarded as the raw bytes
+the publisher sent, so the stand-in does very little work per message.
+
+Benchmarks against it give a ceiling for pure client cost per message and
+make runs reproducible without Docker. It is not a RabbitMQ replacement:
+there is no persistence, no authentication check, and queue arguments are
+recorded but only ``x-max-length`` (with ``x-overflow``) is honoured.
+:meth:`StubBroker.restart` drops every client and keeps durable queues
+and persistent messages in memory, as a restarted RabbitMQ would from disk.
+
+Run it standalone with ``python -m rabbitbench broker --port 5673`` or
+embed it with :class:`StubBroker`.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import struct
+import threading
+import zlib
+from collections import OrderedDict, deque
+
+from pika import frame, spec
+
+PROTOCOL_HEADER = b'AMQP\x00\x00\x09\x01'
+FRAME_END = bytes((spec.FRAME_END,))
+FRAME_HEADER = struct.Struct('>BHL')
+CONTENT_HEADER = struct.Struct('>HHQ')
+METHOD_ID = struct.Struct('>I')
+
+
+class ChannelError(Exception):
+    """Closes the channel with an AMQP reply code"""
+
+    def __init__(self, code: int, text: str, method=None):
+        super().__init__(text)
+        self.code = code
+        self.text = text
+        self.method = method
+
+
+class Message:
+    __slots__ = ('exchange', 'routing_key', 'properties', 'body', 'redelivered')
+
+    def __init__(self, exchange, routing_key, properties, body):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.properties = properties  # raw property bytes from the publisher
+        self.body = body
+        self.redelivered = False
+
+
+def persistent(message: Message) -> bool:
+    properties = spec.BasicProperties()
+    properties.decode(message.properties)
+    return properties.delivery_mode == 2
+
+
+class Consumer:
+    __slots__ = ('channel', 'tag', 'queue', 'no_ack', 'unacked')
+
+    def __init__(self, channel, tag, queue, no_ack):
+        self.channel = channel
+        self.tag = tag
+        self.queue = queue
+        self.no_ack = no_ack
+        self.unacked = 0
+
+    @property
+    def has_credit(self) -> bool:
+        prefetch = self.channel.prefetch_count
+        return self.no_ack or not prefetch or self.unacked < prefetch
+
+
+class Queue:
+    def __init__(self, name, durable=False, arguments=None):
+        self.name = name
+        self.durable = durable
+        self.arguments = dict(arguments or {})
+        self.messages = deque()
+        self.consumers = []
+        self._next_consumer = 0
+        self.max_length = self.arguments.get('x-max-length')
+        self.overflow = self.arguments.get('x-overflow', 'drop-head')
+
+    def put(self, message: Message) -> bool:
+        """Enqueue a message; False if ``reject-publish`` refused it"""
+        if self.max_length is not None and len(self.messages) >= self.max_length:
+            if self.overflow in ('reject-publish', 'reject-publish-dlx'):
+                return False
+            self.messages.popleft()
+        self.messages.append(message)
+        self.dispatch()
+        return True
+
+    def requeue(self, message: Message) -> None:
+        message.redelivered = True
+        self.messages.appendleft(message)
+
+    def dispatch(self) -> None:
+        """Hand ready messages round-robin to consumers with prefetch credit"""
+        consumers = self.consumers
+        while self.messages and consumers:
+            for _ in range(len(consumers)):
+                self._next_consumer %= len(consumers)
+                consumer = consumers[self._next_consumer]
+                self._next_consumer += 1
+                if consumer.has_credit:
+                    break
+            else:
+                return
+            consumer.channel.deliver(consumer, self, self.messages.popleft())
+
+
+class Exchange:
+    def __init__(self, name, exchange_type='direct', durable=False):
+        self.name = name
+        self.type = exchange_type
+        self.durable = durable
+        self.bindings = []  # (queue name, routing key)
+
+    def route(self, routing_key: str) -> list:
+        if self.type == 'fanout':
+            return [queue for queue, _ in self.bindings]
+        if self.type == 'x-consistent-hash':
+            if not self.bindings:
+                return []
+            index = zlib.crc32(routing_key.encode()) % len(self.bindings)
+            return [self.bindings[index][0]]
+        # direct, and topic treated as exact match
+        return [queue for queue, key in self.bindings if key == routing_key]
+
+
+class Channel:
+    def __init__(self, connection, number):
+        self.connection = connection
+        self.broker = connection.broker
+        self.number = number
+        self.prefetch_count = 0
+        self.confirming = False
+        self.publish_seq = 0
+        self.confirm_pending = []  # (seq, ack) not yet sent
+        self.consumers = {}
+        self.unacked = OrderedDict()  # delivery tag -> (consumer, queue, message)
+        self.next_delivery_tag = 1
+        self.content = None  # (exchange, routing key, size, properties, chunks)
+        self.closing = False
+
+    # Outgoing
+
+    def deliver(self, consumer, queue, message) -> None:
+        tag = self.next_delivery_tag
+        self.next_delivery_tag += 1
+        if not consumer.no_ack:
+            consumer.unacked += 1
+            self.unacked[tag] = (consumer, queue, message)
+        self.connection.send_content(
+            self.number,
+            spec.Basic.Deliver(consumer.tag, tag, message.redelivered,
+                               message.exchange, message.routing_key),
+            message)
+
+    def flush_confirms(self) -> None:
+        """Send pending publisher confirms, collapsing runs into multi-acks"""
+        pending, self.confirm_pending = self.confirm_pending, []
+        while pending:
+            seq, ack = pending[0]
+            run = 1
+            while run < len(pending) and pending[run][1] == ack:
+                run += 1
+            seq = pending[run - 1][0]
+            method = spec.Basic.Ack if ack else spec.Basic.Nack
+            self.connection.send_method(self.number,
+                                        method(delivery_tag=seq, multiple=run > 1))
+            del pending[:run]
+
+    # Incoming
+
+    def handle(self, method) -> None:
+        handler = getattr(self, 'on_' + method.NAME.replace('.', '_').lower(), None)
+        if handler is None:
+            raise ChannelError(spec.NOT_IMPLEMENTED,
+                               f'{method.NAME} is not implemented by the stub broker',
+                               method)
+        handler(method)
+
+    def reply(self, method, request=None) -> None:
+        if request is not None and getattr(request, 'nowait', False):
+            return
+        self.connection.send_method(self.number, method)
+
+    def on_channel_close(self, method):
+        self.release()
+        self.connection.send_method(self.number, spec.Channel.CloseOk())
+        self.connection.channels.pop(self.number, None)
+
+    def on_channel_closeok(self, method):
+        self.connection.channels.pop(self.number, None)
+
+    def on_channel_flow(self, method):
+        self.reply(spec.Channel.FlowOk(active=method.active))
+
+    def on_confirm_select(self, method):
+        self.confirming = True
+        self.reply(spec.Confirm.SelectOk(), method)
+
+    def on_basic_qos(self, method):
+        self.prefetch_count = method.prefetch_count
+        self.reply(spec.Basic.QosOk())
+        for queue in {c.queue for c in self.consumers.values()}:
+            queue.dispatch()
+
+    def on_exchange_declare(self, method):
+        broker = self.broker
+        if method.exchange not in broker.exchanges:
+            if method.passive:
+                raise ChannelError(spec.NOT_FOUND,
+                                   f"NOT_FOUND - no exchange '{method.exchange}'",
+                                   method)
+            broker.exchanges[method.exchange] = Exchange(
+                method.exchange, method.type, method.durable)
+        self.reply(spec.Exchange.DeclareOk(), method)
+
+    def on_exchange_delete(self, method):
+        self.broker.exchanges.pop(method.exchange, None)
+        self.reply(spec.Exchange.DeleteOk(), method)
+
+    def on_queue_declare(self, method):
+        broker = self.broker
+        name = method.queue or f'amq.gen-{next(broker.names)}'
+        queue = broker.queues.get(name)
+        if queue is None:
+            if method.passive:
+                raise ChannelError(spec.NOT_FOUND,
+                                   f"NOT_FOUND - no queue '{name}'", method)
+            queue = broker.queues[name] = Queue(name, method.durable,
+                                                method.arguments)
+        elif not method.passive and queue.durable != bool(method.durable):
+            raise ChannelError(spec.PRECONDITION_FAILED,
+                               f"PRECONDITION_FAILED - inequivalent arg 'durable' "
+                               f"for queue '{name}'", method)
+        self.reply(spec.Queue.DeclareOk(name, len(queue.messages),
+                                        len(queue.consumers)), method)
+
+    def on_queue_bind(self, method):
+        exchange = self._exchange(method.exchange, method)
+        self._queue(method.queue, method)
+        binding = (method.queue, method.routing_key)
+        if binding not in exchange.bindings:
+            exchange.bindings.append(binding)
+        self.reply(spec.Queue.BindOk(), method)
+
+    def on_queue_unbind(self, method):
+        exchange = self._exchange(method.exchange, method)
+        binding = (method.queue, method.routing_key)
+        if binding in exchange.bindings:
+            exchange.bindings.remove(binding)
+        self.reply(spec.Queue.UnbindOk())
+
+    def on_queue_purge(self, method):
+        queue = self._queue(method.queue, method)
+        count = len(queue.messages)
+        queue.messages.clear()
+        self.reply(spec.Queue.PurgeOk(message_count=count), method)
+
+    def on_queue_delete(self, method):
+        queue = self.broker.queues.get(method.queue)
+        if queue is None:
+            # RabbitMQ treats deleting a missing queue as already done
+            self.reply(spec.Queue.DeleteOk(message_count=0), method)
+            return
+        count = len(queue.messages)
+        for consumer in list(queue.consumers):
+            consumer.channel.cancel(consumer.tag, notify=True)
+        del self.broker.queues[queue.name]
+        self.reply(spec.Queue.DeleteOk(message_count=count), method)
+
+    def on_basic_consume(self, method):
+        queue = self._queue(method.queue, method)
+        tag = method.consumer_tag or f'ctag-stub-{next(self.broker.names)}'
+        if tag in self.consumers:
+            raise ChannelError(spec.NOT_ALLOWED,
+                               f"NOT_ALLOWED - attempt to reuse consumer tag '{tag}'",
+                               method)
+        consumer = Consumer(self, tag, queue, method.no_ack)
+        self.consumers[tag] = consumer
+        queue.consumers.append(consumer)
+        self.reply(spec.Basic.ConsumeOk(consumer_tag=tag), method)
+        queue.dispatch()
+
+    def on_basic_cancel(self, method):
+        self.cancel(method.consumer_tag)
+        self.reply(spec.Basic.CancelOk(consumer_tag=method.consumer_tag), method)
+
+    def on_basic_get(self, method):
+        queue = self._queue(method.queue, method)
+        if not queue.messages:
+            self.reply(spec.Basic.GetEmpty())
+            return
+        message = queue.messages.popleft()
+        tag = self.next_delivery_tag
+        self.next_delivery_tag += 1
+        if not method.no_ack:
+            self.unacked[tag] = (None, queue, message)
+        self.connection.send_content(
+            self.number,
+            spec.Basic.GetOk(tag, message.redelivered, message.exchange,
+                             message.routing_key, len(queue.messages)),
+            message)
+
+    def on_basic_publish(self, method):
+        self.content = [method.exchange, method.routing_key, None, None, []]
+
+    def on_basic_ack(self, method):
+        self.settle(method.delivery_tag, method.multiple, requeue=None)
+
+    def on_basic_nack(self, method):
+        self.settle(method.delivery_tag, method.multiple, requeue=method.requeue)
+
+    def on_basic_reject(self, method):
+        self.settle(method.delivery_tag, False, requeue=method.requeue)
+
+    def on_basic_recover(self, method):
+        for consumer, queue, message in self.unacked.values():
+            if consumer is not None:
+                consumer.unacked -= 1
+            queue.requeue(message)
+        queues = {queue for _, queue, _ in self.unacked.values()}
+        self.unacked.clear()
+        self.reply(spec.Basic.RecoverOk())
+        for queue in queues:
+            queue.dispatch()
+
+    # Content frames for basic.publish
+
+    def on_header(self, body_size: int, properties: bytes) -> None:
+        if self.content is None:
+            raise ChannelError(spec.UNEXPECTED_FRAME,
+                               'UNEXPECTED_FRAME - content header without publish')
+        self.content[2] = body_size
+        self.content[3] = properties
+        if body_size == 0:
+            self.publish()
+
+    def on_body(self, fragment: bytes) -> None:
+        content = self.content
+        if content is None or content[2] is None:
+            raise ChannelError(spec.UNEXPECTED_FRAME,
+                               'UNEXPECTED_FRAME - body without content header')
+        content[4].append(fragment)
+        if sum(map(len, content[4])) >= content[2]:
+            self.publish()
+
+    def publish(self) -> None:
+        exchange, routing_key, _, properties, chunks = self.content
+        self.content = None
+        body = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+        message = Message(exchange, routing_key, properties, body)
+
+        broker = self.broker
+        if exchange:
+            target = broker.exchanges.get(exchange)
+            if target is None:
+                raise ChannelError(spec.NOT_FOUND,
+                                   f"NOT_FOUND - no exchange '{exchange}'")
+            names = target.route(routing_key)
+        else:
+            names = [routing_key]
+
+        accepted = True
+        for index, name in enumerate(names):
+            queue = broker.queues.get(name)
+            if queue is not None:
+                copy = message if index == 0 else Message(
+                    exchange, routing_key, properties, body)
+                accepted = queue.put(copy) and accepted
+        broker.published += 1
+
+        if self.confirming:
+            self.publish_seq += 1
+            self.confirm_pending.append((self.publish_seq, accepted))
+
+    # Helpers
+
+    def settle(self, delivery_tag: int, multiple: bool, requeue) -> None:
+        """Ack (``requeue`` None), requeue or drop outstanding deliveries"""
+        if multiple:
+            tags = []
+            for tag in self.unacked:
+                if delivery_tag and tag > delivery_tag:
+                    break
+                tags.append(tag)
+        elif delivery_tag in self.unacked:
+            tags = [delivery_tag]
+        else:
+            raise ChannelError(spec.PRECONDITION_FAILED,
+                               f'PRECONDITION_FAILED - unknown delivery tag '
+                               f'{delivery_tag}')
+
+        queues = set()
+        for tag in tags:
+            consumer, queue, message = self.unacked.pop(tag)
+            if consumer is not None:
+                consumer.unacked -= 1
+            if requeue:
+                queue.requeue(message)
+            queues.add(queue)
+        for queue in queues:
+            queue.dispatch()
+
+    def cancel(self, consumer_tag: str, notify: bool = False) -> None:
+        consumer = self.consumers.pop(consumer_tag, None)
+        if consumer is not None:
+            consumer.queue.consumers.remove(consumer)
+            if notify:
+                self.connection.send_method(
+                    self.number, spec.Basic.Cancel(consumer_tag=consumer_tag))
+
+    def release(self) -> None:
+        """Cancel consumers and requeue unacked deliveries (channel closing)"""
+        for tag in list(self.consumers):
+            self.cancel(tag)
+        queues = set()
+        for consumer, queue, message in reversed(self.unacked.values()):
+            queue.requeue(message)
+            queues.add(queue)
+        self.unacked.clear()
+        for queue in queues:
+            queue.dispatch()
+
+    def _queue(self, name, method) -> Queue:
+        queue = self.broker.queues.get(name)
+        if queue is None:
+            raise ChannelError(spec.NOT_FOUND, f"NOT_FOUND - no queue '{name}'",
+                               method)
+        return queue
+
+    def _exchange(self, name, method) -> Exchange:
+        exchange = self.broker.exchanges.get(name)
+        if exchange is None:
+            raise ChannelError(spec.NOT_FOUND,
+                               f"NOT_FOUND - no exchange '{name}'", method)
+        return exchange
+
+
+class Connection:
+    """One client socket"""
+
+    def __init__(self, broker, reader, writer):
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        self.channels = {}
+        self.frame_max = broker.frame_max
+        self.out = []
+        self.write_scheduled = False
+        self.closed = False
+
+    def send_method(self, channel_number: int, method) -> None:
+        self.out.append(frame.Method(channel_number, method).marshal())
+        self.schedule_write()
+
+    def send_content(self, channel_number: int, method, message: Message) -> None:
+        body = message.body
+        properties = message.properties
+        header = CONTENT_HEADER.pack(spec.BasicProperties.INDEX, 0, len(body))
+        out = self.out
+        out.append(frame.Method(channel_number, method).marshal())
+        out.append(FRAME_HEADER.pack(spec.FRAME_HEADER, channel_number,
+                                     len(header) + len(properties)))
+        out.append(header)
+        out.append(properties)
+        out.append(FRAME_END)
+        chunk = self.frame_max - 8
+        for start in range(0, len(body), chunk):
+            fragment = body[start:start + chunk]
+            out.append(FRAME_HEADER.pack(spec.FRAME_BODY, channel_number,
+                                         len(fragment)))
+            out.append(fragment)
+            out.append(FRAME_END)
+        self.schedule_write()
+
+    def schedule_write(self) -> None:
+        # Deliveries can be queued by another connection's publish, so
+        # output is written from the loop rather than by the reader only
+        if not self.write_scheduled:
+            self.write_scheduled = True
+            asyncio.get_running_loop().call_soon(self.write)
+
+    def write(self) -> None:
+        self.write_scheduled = False
+        for channel in self.channels.values():
+            if channel.confirm_pending:
+                channel.flush_confirms()
+        if self.out and not self.writer.is_closing():
+            self.writer.write(b''.join(self.out))
+        self.out = []
+
+    async def flush(self) -> None:
+        self.write()
+        await self.writer.drain()
+
+    async def run(self) -> None:
+        try:
+            header = await self.reader.readexactly(8)
+            if header != PROTOCOL_HEADER:
+                self.writer.write(PROTOCOL_HEADER)
+                return
+            self.send_method(0, spec.Connection.Start(
+                server_properties={
+                    'product': 'rabbitbench-stub',
+                    'capabilities': {
+                        'publisher_confirms': True,
+                        'basic.nack': True,
+                        'consumer_cancel_notify': True,
+                        'exchange_exchange_bindings': False,
+                        'connection.blocked': False,
+                    },
+                },
+                mechanisms='PLAIN', locales='en_US'))
+            await self.flush()
+
+            buffer = b''
+            while not self.closed:
+                data = await self.reader.read(1 << 16)
+                if not data:
+                    break
+                buffer = self.process(buffer + data if buffer else data)
+                await self.flush()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for channel in list(self.channels.values()):
+                channel.release()
+            self.channels.clear()
+            self.broker.connections.discard(self)
+            self.writer.close()
+
+    def process(self, data: bytes) -> bytes:
+        """Handle every complete frame in ``data``; return the remainder"""
+        view = memoryview(data)
+        offset = 0
+        end = len(data)
+        while end - offset >= 7:
+            frame_type, channel_number, size = FRAME_HEADER.unpack_from(view, offset)
+            frame_end = offset + 7 + size
+            if frame_end >= end:
+                break
+            payload = view[offset + 7:frame_end]
+            offset = frame_end + 1
+            if frame_type == spec.FRAME_HEARTBEAT:
+                continue
+            self.handle_frame(frame_type, channel_number, payload)
+            if self.closed:
+                break
+        return bytes(view[offset:])
+
+    def handle_frame(self, frame_type: int, channel_number: int, payload) -> None:
+        channel = self.channels.get(channel_number)
+        try:
+            if frame_type == spec.FRAME_METHOD:
+                method = spec.methods[METHOD_ID.unpack_from(payload)[0]]()
+                method.decode(bytes(payload), 4)
+                if channel_number == 0:
+                    self.handle_connection(method)
+                elif isinstance(method, spec.Channel.Open):
+                    self.channels[channel_number] = Channel(self, channel_number)
+                    self.send_method(channel_number, spec.Channel.OpenOk())
+                elif channel is not None and not channel.closing:
+                    channel.handle(method)
+                elif isinstance(method, spec.Channel.CloseOk):
+                    self.channels.pop(channel_number, None)
+            elif channel is None or channel.closing:
+                return
+            elif frame_type == spec.FRAME_HEADER:
+                _, _, body_size = CONTENT_HEADER.unpack_from(payload)
+                channel.on_header(body_size, bytes(payload[12:]))
+            elif frame_type == spec.FRAME_BODY:
+                channel.on_body(bytes(payload))
+        except ChannelError as e:
+            channel = self.channels.get(channel_number)
+            if channel is not None:
+                channel.release()
+                channel.closing = True
+            method = e.method
+            self.send_method(channel_number, spec.Channel.Close(
+                reply_code=e.code, reply_text=e.text,
+                class_id=(method.INDEX >> 16) if method else 0,
+                method_id=(method.INDEX & 0xFFFF) if method else 0))
+
+    def handle_connection(self, method) -> None:
+        if isinstance(method, spec.Connection.StartOk):
+            self.send_method(0, spec.Connection.Tune(
+                channel_max=2047, frame_max=self.broker.frame_max, heartbeat=0))
+        elif isinstance(method, spec.Connection.TuneOk):
+            if method.frame_max:
+                self.frame_max = min(method.frame_max, self.broker.frame_max)
+        elif isinstance(method, spec.Connection.Open):
+            self.send_method(0, spec.Connection.OpenOk())
+        elif isinstance(method, spec.Connection.Close):
+            self.send_method(0, spec.Connection.CloseOk())
+            self.closed = True
+        elif isinstance(method, spec.Connection.CloseOk):
+            self.closed = True
+
+
+class StubBroker:
+    """In-memory AMQP 0-9-1 server on an asyncio event loop
+
+    Use :meth:`start` to serve from a background thread of the current
+    process, :func:`start_broker_process` to keep it off the client's GIL,
+    or :meth:`serve_forever` to run it in the foreground.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 frame_max: int = spec.FRAME_MAX_SIZE):
+        self.host = host
+        self.port = port
+        self.frame_max = frame_max
+        self.queues = {}
+        self.exchanges = {name: Exchange(name, kind, True) for name, kind in (
+            ('amq.direct', 'direct'), ('amq.fanout', 'fanout'),
+            ('amq.topic', 'topic'))}
+        self.connections = set()
+        self.names = itertools.count(1)
+        self.published = 0
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def _on_client(self, reader, writer) -> None:
+        connection = Connection(self, reader, writer)
+        self.connections.add(connection)
+        await connection.run()
+
+    async def open(self) -> None:
+        self._server = await asyncio.start_server(self._on_client, self.host,
+                                                  self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        # Drop the clients first: from 3.12 wait_closed waits for them
+        for connection in list(self.connections):
+            connection.writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def forget_transient(self) -> None:
+        """Drop what a RabbitMQ restart would lose: every non-durable queue
+        and exchange, and every message not published as persistent"""
+        for name, queue in list(self.queues.items()):
+            if not queue.durable:
+                del self.queues[name]
+                continue
+            queue.consumers.clear()
+            queue.messages = deque(m for m in queue.messages if persistent(m))
+        self.exchanges = {name: exchange for name, exchange
+                          in self.exchanges.items() if exchange.durable}
+        for exchange in self.exchanges.values():
+            exchange.bindings = [(queue, key) for queue, key in exchange.bindings
+                                 if queue in self.queues]
+
+    async def _restart(self, downtime: float) -> None:
+        await self.close()
+        # Let each client's handler requeue its unacked deliveries
+        while self.connections:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(downtime)
+        self.forget_transient()
+        await self.open()
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.open()
+        await self._server.serve_forever()
+
+    def start(self) -> 'StubBroker':
+        """Serve from a daemon thread; returns once the port is bound"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.open())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.close())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='stub-broker', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def restart(self, downtime: float = 0.0) -> None:
+        """Drop every client, stay down ``downtime`` seconds and come back
+        on the same port; only for a broker serving from :meth:`start`"""
+        asyncio.run_coroutine_threadsafe(self._restart(downtime),
+                                         self._loop).result()
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self) -> 'StubBroker':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def _serve_process(host: str, port: int, conn) -> None:
+    broker = StubBroker(host, port)
+
+    async def main():
+        await broker.open()
+        conn.send(broker.port)
+        await broker.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def start_broker_process(host: str = '127.0.0.1', port: int = 0):
+    """Run a :class:`StubBroker` in a child process; returns ``(process, port)``"""
+    parent, child = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_serve_process,
+                                      args=(host, port, child), daemon=True)
+    process.start()
+    return process, parent.recv()
@@ -0,0 +1,228 @@
+"""Parameter sweeps with a resumable result cache.
+
+A sweep runs one scenario at every point of a parameter grid (or a random
+sample of it), each point with the usual repeated trials. Finished points
+are stored under a hash of the scenario and its resolved config, so an
+interrupted sweep picks up where it stopped and overlapping sweeps share
+work. The analysis reduces every point to its mean rate and p99 latency,
+ranks parameters by how much they move the rate, tabulates the
+throughput and p99 surface over the two most influential parameters and
+recommends the fastest point that meets an optional p99 limit.
+
+Plots are written when matplotlib is installed; otherwise the surfaces are
+only printed and saved in the report.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import random
+import statistics
+
+from .config import BenchConfig
+from .results import ScenarioResult
+from .runner import resolve_config, run_scenario
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot
+except ImportError:  # optional dependency
+    pyplot = None
+
+# Connection and reporting settings do not change what is being measured
+EXCLUDED_FROM_KEY = {'host', 'port', 'username', 'password', 'virtual_host',
+                     'connect_retries', 'retry_delay', 'progress_every',
+                     'metrics_port', 'metrics_host', 'stats_file',
+                     'stats_interval', 'metrics_addr', 'profile_dir',
+                     'profile_interval', 'memory_dir'}
+
+
+def config_key(scenario: str, config: BenchConfig) -> str:
+    """Stable hash of a scenario and the config fields that affect results"""
+    fields = {k: v for k, v in config.as_dict().items()
+              if k not in EXCLUDED_FROM_KEY}
+    blob = json.dumps([scenario, fields], sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+class SweepCache:
+    """One JSON file per finished sweep point"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def load(self, key: str):
+        try:
+            with open(self.path(key)) as f:
+                return ScenarioResult.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def store(self, key: str, result: ScenarioResult) -> None:
+        # Write then rename so an interrupted write never looks finished
+        path = self.path(key)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(result.as_dict(), f, default=str)
+        os.replace(path + '.tmp', path)
+
+
+def grid_points(space: dict) -> list:
+    """Cross product of ``{key: [values]}`` as a list of override dicts"""
+    keys = list(space)
+    return [dict(zip(keys, values))
+            for values in itertools.product(*(space[k] for k in keys))]
+
+
+def sample_points(points: list, count: int, seed: int = 0) -> list:
+    """A reproducible random subset of ``points``, in grid order"""
+    if not count or count >= len(points):
+        return points
+    chosen = set(random.Random(seed).sample(range(len(points)), count))
+    return [p for i, p in enumerate(points) if i in chosen]
+
+
+def trial_p99(extra: dict):
+    """p99 in ms from a trial's end-to-end or confirm latency, if recorded"""
+    for key in ('latency_ms', 'confirm_latency_ms'):
+        summary = extra.get(key)
+        if summary and summary.get('count'):
+            return summary.get('p99')
+    return None
+
+
+def point_stats(point: dict, result: ScenarioResult) -> dict:
+    rates = [t.rate for t in result.trials]
+    p99s = [p for p in (trial_p99(t.extra) for t in result.trials) if p is not None]
+    return {
+        'point': point,
+        'label': result.variant,
+        'trials': len(rates),
+        'rate': statistics.fmean(rates) if rates else 0.0,
+        'stdev': statistics.stdev(rates) if len(rates) > 1 else 0.0,
+        'p99_ms': statistics.fmean(p99s) if p99s else None,
+    }
+
+
+def run_sweep(scenario: str, points: list, overrides: dict, cache: SweepCache,
+              trial_pause: float = 0.0, label=None) -> list:
+    """Run or load every point; returns ``(point, result, cached)`` tuples"""
+    label = label or (lambda point: ','.join(f'{k}={v}' for k, v in point.items()))
+    done = []
+    for n, point in enumerate(points, 1):
+        config = resolve_config(scenario, dict(overrides, **point))
+        key = config_key(scenario, config)
+        result = cache.load(key)
+        cached = result is not None
+        if cached:
+            print(f'[{n}/{len(points)}] {label(point)}: cached')
+        else:
+            print(f'[{n}/{len(points)}] {label(point)}')
+            result = run_scenario(scenario, overrides=dict(overrides, **point),
+                                  trial_pause=trial_pause, variant=label(point))
+            cache.store(key, result)
+        done.append((point, result, cached))
+    return done
+
+
+def main_effects(rows: list, metric: str = 'rate') -> dict:
+    """Mean ``metric`` per value of each parameter, most influential first
+
+    ``spread`` is the difference between the best and worst value's mean,
+    a crude but assumption-free measure of how much a parameter matters.
+    """
+    effects = {}
+    for key in rows[0]['point'] if rows else []:
+        by_value = {}
+        for row in rows:
+            if row[metric] is not None:
+                by_value.setdefault(row['point'][key], []).append(row[metric])
+        means = {value: statistics.fmean(v) for value, v in by_value.items()}
+        if len(means) > 1:
+            effects[key] = {'means': means,
+                            'spread': max(means.values()) - min(means.values())}
+    return dict(sorted(effects.items(), key=lambda kv: -kv[1]['spread']))
+
+
+def surface(rows: list, x: str, y: str, metric: str = 'rate') -> dict:
+    """Mean ``metric`` on the ``x`` by ``y`` grid, averaging other parameters"""
+    xs = sorted({row['point'][x] for row in rows}, key=_order)
+    ys = sorted({row['point'][y] for row in rows}, key=_order)
+    cells = {}
+    for row in rows:
+        if row[metric] is not None:
+            cells.setdefault((row['point'][x], row['point'][y]), []).append(row[metric])
+    values = [[round(statistics.fmean(cells[(vx, vy)]), 3) if (vx, vy) in cells
+               else None for vx in xs] for vy in ys]
+    return {'metric': metric, 'x': x, 'y': y, 'xs': xs, 'ys': ys,
+            'values': values}
+
+
+def _order(value):
+    return (0, value, '') if isinstance(value, (int, float)) else (1, 0, str(value))
+
+
+def recommend(rows: list, max_p99: float = None):
+    """Fastest point, among those within ``max_p99`` ms when given
+
+    Points are ranked by mean rate minus one standard deviation, so a point
+    that was fast once but noisy does not beat a consistently fast one.
+    """
+    candidates = [row for row in rows if max_p99 is None
+                  or (row['p99_ms'] is not None and row['p99_ms'] <= max_p99)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda row: row['rate'] - row['stdev'])
+
+
+def format_surface(table: dict) -> str:
+    width = max([len(str(v)) for v in table['xs']] + [10])
+    lines = [f'{table["metric"]} by {table["y"]} (rows) x {table["x"]} (columns)',
+             ' ' * 12 + ''.join(f'{str(v):>{width + 2}}' for v in table['xs'])]
+    for vy, values in zip(table['ys'], table['values']):
+        cells = ''.join(f'{"-" if v is None else f"{v:.1f}":>{width + 2}}'
+                        for v in values)
+        lines.append(f'{str(vy):>12}{cells}')
+    return '\n'.join(lines)
+
+
+def plot_surfaces(tables: list, prefix: str) -> list:
+    """Heatmaps of each surface as ``<prefix>-<metric>.png``; needs matplotlib"""
+    if pyplot is None:
+        return []
+    paths = []
+    for table in tables:
+        figure, axes = pyplot.subplots(figsize=(7, 5))
+        data = [[float('nan') if v is None else v for v in row]
+                for row in table['values']]
+        image = axes.imshow(data, origin='lower', aspect='auto', cmap='viridis')
+        axes.set_xticks(range(len(table['xs'])), [str(v) for v in table['xs']])
+        axes.set_yticks(range(len(table['ys'])), [str(v) for v in table['ys']])
+        axes.set_xlabel(table['x'])
+        axes.set_ylabel(table['y'])
+        axes.set_title(table['metric'])
+        figure.colorbar(image, ax=axes)
+        path = f'{prefix}-{table["metric"]}.png'
+        figure.savefig(path, bbox_inches='tight')
+        pyplot.close(figure)
+        paths.append(path)
+    return paths
+
+
+def analyse(rows: list, max_p99: float = None) -> dict:
+    """Main effects, rate and p99 surfaces and the recommended point"""
+    effects = main_effects(rows)
+    report = {'effects': effects, 'surfaces': [],
+              'recommended': recommend(rows, max_p99), 'max_p99_ms': max_p99}
+    ranked = list(effects)
+    if len(ranked) >= 2:
+        x, y = ranked[0], ranked[1]
+        report['surfaces'].append(surface(rows, x, y, 'rate'))
+        if any(row['p99_ms'] is not None for row in rows):
+            report['surfaces'].append(surface(rows, x, y, 'p99_ms'))
+    return report
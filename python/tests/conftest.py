@@ -0,0 +1,49 @@
+import pytest
+
+from rabbitbench.connection import connect, declare_queue
+from rabbitbench.payloads import message_factory
+from rabbitbench.publisher import publish_range
+from rabbitbench.runner import resolve_config, run_scenario
+from rabbitbench.stubbroker import StubBroker
+
+
+@pytest.fixture(scope='module')
+def broker():
+    broker = StubBroker().start()
+    yield broker
+    broker.stop()
+
+
+@pytest.fixture
+def run(broker):
+    """Run one trial of a scenario against the stand-in broker"""
+
+    def run(name, **overrides):
+        overrides = dict({'host': broker.host, 'port': broker.port,
+                          'message_count': 300, 'warmup': 20,
+                          'consume_timeout': 5.0}, **overrides)
+        result = run_scenario(name, overrides=overrides, verbose=False)
+        assert len(result.trials) == 1
+        return result.trials[0]
+
+    return run
+
+
+@pytest.fixture
+def prefill(broker):
+    """Purge a scenario's queue and publish ``count`` messages into it"""
+
+    def prefill(name, count, **overrides):
+        config = resolve_config(name, dict({'host': broker.host,
+                                            'port': broker.port}, **overrides))
+        connection = connect(config, quiet=True)
+        try:
+            channel = connection.channel()
+            declare_queue(channel, config)
+            channel.queue_purge(config.queue)
+            publish_range(channel, config, 0, count,
+                          messages=message_factory(config))
+        finally:
+            connection.close()
+
+    return prefill
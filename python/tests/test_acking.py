@@ -0,0 +1,139 @@
+import time
+
+import pytest
+
+from rabbitbench.acking import AckBatcher, OrderedAcker
+
+
+class FakeChannel:
+    def __init__(self):
+        self.acks = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+
+class ImmediateConnection:
+    """Runs threadsafe callbacks on the spot, counting them"""
+
+    def __init__(self):
+        self.callbacks = 0
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks += 1
+        callback()
+
+
+class DeferredConnection:
+    """Holds threadsafe callbacks until :meth:`run` is called"""
+
+    def __init__(self):
+        self.pending = []
+
+    def add_callback_threadsafe(self, callback):
+        self.pending.append(callback)
+
+    def run(self):
+        callbacks, self.pending = self.pending, []
+        for callback in callbacks:
+            callback()
+
+
+def test_batcher_acks_every_n_with_multiple():
+    channel = FakeChannel()
+    acks = AckBatcher(channel, every=3)
+    for tag in range(1, 8):
+        acks.delivered(tag)
+    assert channel.acks == [(3, True), (6, True)]
+    acks.flush()
+    assert channel.acks[-1] == (7, False)
+    assert acks.acks_sent == 3
+
+
+def test_batcher_every_capped_at_prefetch():
+    channel = FakeChannel()
+    acks = AckBatcher(channel, every=100, prefetch_count=4)
+    for tag in range(1, 5):
+        acks.delivered(tag)
+    assert channel.acks == [(4, True)]
+
+
+def test_batcher_tick_flushes_after_interval():
+    channel = FakeChannel()
+    acks = AckBatcher(channel, every=100, interval=0.01)
+    acks.delivered(1)
+    acks.delivered(2)
+    acks.tick()
+    assert channel.acks == []
+    time.sleep(0.02)
+    acks.tick()
+    assert channel.acks == [(2, True)]
+    acks.tick()
+    assert len(channel.acks) == 1
+
+
+def test_batcher_flush_with_nothing_pending_sends_nothing():
+    channel = FakeChannel()
+    AckBatcher(channel).flush()
+    assert channel.acks == []
+
+
+def test_ordered_acker_holds_tags_behind_a_gap():
+    channel = FakeChannel()
+    acker = OrderedAcker(ImmediateConnection(), channel)
+    acker.completed(2)
+    acker.completed(3)
+    assert channel.acks == []
+    assert acker.done == {2, 3}
+    acker.completed(1)
+    assert channel.acks == [(3, True)]
+    assert acker.acked_to == 3 and not acker.done
+    assert acker.max_held == 2
+    acker.completed(4)
+    assert channel.acks[-1] == (4, False)
+
+
+def test_ordered_acker_batches_a_burst_into_one_drain():
+    channel = FakeChannel()
+    connection = DeferredConnection()
+    completed = []
+    acker = OrderedAcker(connection, channel, on_completed=completed.append)
+    for tag in (3, 1, 2, 5):
+        acker.completed(tag)
+    assert len(connection.pending) == 1
+    connection.run()
+    assert channel.acks == [(3, True)]
+    assert completed == [4]
+    assert acker.done == {5}
+    acker.completed(4)
+    connection.run()
+    assert channel.acks[-1] == (5, True)
+    assert acker.acks_sent == 2
+
+
+def test_consumer_pool(run):
+    trial = run('consumer_pool', consumers=3, prefetch_count=20, ack_every=5)
+    # The window opens at the first check that sees warmup done, which a
+    # burst of prefetched deliveries can overshoot
+    assert 0 < trial.messages <= 300
+    assert len(trial.workers) == 3
+    assert sum(w['messages'] for w in trial.workers) == 320
+    assert all(w['acks_sent'] for w in trial.workers)
+
+
+@pytest.mark.parametrize('processing', ['inline', 'thread', 'process'])
+def test_work_pool(run, processing):
+    trial = run('work_pool', processing=processing, pool_workers=2,
+                work_time=0.0001)
+    assert trial.messages == 300
+    assert not trial.extra['timed_out']
+    assert trial.extra['acks_sent'] > 0
+    assert ('max_held_acks' in trial.extra) == (processing != 'inline')
+
+
+def test_work_pool_timeout_waits_for_running_work(run):
+    # Slow sleeps still running at the timeout must finish before the
+    # connection closes under their acks
+    trial = run('work_pool', message_count=40, warmup=0, pool_workers=2,
+                work='sleep', work_time=0.2, consume_timeout=0.1)
+    assert trial.extra['timed_out']
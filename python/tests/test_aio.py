@@ -0,0 +1,21 @@
+"""The asyncio engine against the stand-in broker"""
+
+
+def test_async_publish(run):
+    trial = run('async_publish', concurrency=16)
+    assert trial.messages == 300
+    assert trial.extra['nacked'] == 0
+
+
+def test_async_consume(run, prefill):
+    prefill('async_consume', 320)
+    trial = run('async_consume', concurrency=16)
+    assert trial.messages == 300
+    assert not trial.extra['timed_out']
+
+
+def test_async_round_trip_latency(run, prefill):
+    prefill('async_consume', 0)
+    run('async_publish', message_count=100, warmup=0, latency=True)
+    trial = run('async_consume', message_count=100, warmup=0, latency=True)
+    assert trial.extra['latency_ms']['count'] == 100
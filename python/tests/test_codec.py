@@ -0,0 +1,70 @@
+import pytest
+
+from rabbitbench.codec import (CODECS, available_codecs, codec_for, get_codec,
+                               lz4_frame, make_payload)
+from rabbitbench.config import BenchConfig
+from rabbitbench.messages import build_message
+
+COMPRESSIONS = ['none', 'zlib',
+                pytest.param('lz4', marks=pytest.mark.skipif(
+                    lz4_frame is None, reason='lz4 not installed'))]
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+@pytest.mark.parametrize('name', available_codecs())
+def test_round_trip(name, compression):
+    codec = get_codec(name, compression)
+    payload = codec.prepare_payload(make_payload(300))
+    message = build_message(42, payload)
+    decoded = codec.decode(codec.encode(message))
+    assert decoded['id'] == 42
+    if codec.text:
+        assert decoded['payload'] == payload
+    else:
+        assert bytes(decoded['payload']) == payload
+    if name != 'raw':
+        assert decoded['content'] == message['content']
+        assert decoded['timestamp'] == message['timestamp']
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_decodes_memoryviews(name):
+    codec = get_codec(name)
+    body = b'..' + codec.encode(build_message(7))
+    assert codec.decode(memoryview(body)[2:])['id'] == 7
+
+
+def test_binary_codecs_are_smaller_than_json():
+    message = build_message(1, None)
+    json_size = len(get_codec('json').encode(message))
+    assert len(get_codec('struct').encode(message)) < json_size
+    assert len(get_codec('raw').encode(message)) == 8
+
+
+def test_payload_is_deterministic_and_compressible():
+    assert make_payload(1000) == make_payload(1000)
+    compressed = get_codec('raw', 'zlib').encode(
+        {'id': 1, 'payload': make_payload(10_000)})
+    assert len(compressed) < 10_000
+
+
+def test_unknown_codec_and_compression():
+    with pytest.raises(ValueError):
+        get_codec('yaml')
+    with pytest.raises(ValueError):
+        get_codec('json', 'brotli')
+
+
+def test_missing_optional_dependency_names_the_package():
+    missing = [name for name in CODECS if name not in available_codecs()]
+    for name in missing:
+        with pytest.raises(ValueError, match='pip install'):
+            codec_for(BenchConfig(codec=name))
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_codec_scenario(run, name):
+    trial = run('codec', codec=name, message_count=100, payload_size=256)
+    assert trial.messages == 100
+    assert trial.extra['codec'] == name
+    assert trial.extra['consumer']['messages'] == 100
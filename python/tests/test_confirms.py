@@ -0,0 +1,66 @@
+from rabbitbench.confirms import ConfirmTracker
+
+
+def publish(tracker, count):
+    return [tracker.record_publish() for _ in range(count)]
+
+
+def test_tags_count_up_from_one():
+    tracker = ConfirmTracker(window=0)
+    assert publish(tracker, 3) == [1, 2, 3]
+    assert tracker.outstanding == 3
+
+
+def test_window_fills_and_drains():
+    tracker = ConfirmTracker(window=3)
+    publish(tracker, 2)
+    assert not tracker.full
+    publish(tracker, 1)
+    assert tracker.full
+    assert tracker.confirm(1) == 1
+    assert not tracker.full
+    assert tracker.outstanding == 2
+
+
+def test_unbounded_window_is_never_full():
+    tracker = ConfirmTracker(window=0)
+    publish(tracker, 1000)
+    assert not tracker.full
+
+
+def test_multiple_settles_every_tag_up_to_it():
+    tracker = ConfirmTracker(window=10)
+    publish(tracker, 5)
+    tracker.confirm(2)
+    assert tracker.confirm(4, multiple=True) == 3
+    assert list(tracker.pending) == [5]
+    assert tracker.acked == 4
+    assert len(tracker.latencies_ns) == 4
+
+
+def test_nack_counts_separately():
+    tracker = ConfirmTracker(window=10)
+    publish(tracker, 4)
+    assert tracker.confirm(3, multiple=True, nack=True) == 3
+    tracker.confirm(4)
+    assert (tracker.acked, tracker.nacked) == (1, 3)
+    assert tracker.outstanding == 0
+
+
+def test_unknown_or_repeated_tags_settle_nothing():
+    tracker = ConfirmTracker(window=10)
+    publish(tracker, 2)
+    tracker.confirm(1)
+    assert tracker.confirm(1) == 0
+    assert tracker.confirm(9) == 0
+    assert tracker.acked == 1
+
+
+def test_reset_stats_keeps_pending():
+    tracker = ConfirmTracker(window=10)
+    publish(tracker, 3)
+    tracker.confirm(1)
+    tracker.reset_stats()
+    assert (tracker.acked, tracker.latencies_ns) == (0, [])
+    assert tracker.outstanding == 2
+    assert tracker.latency_summary()['count'] == 0
@@ -0,0 +1,53 @@
+from rabbitbench.scenarios.coordinated import analyse_backlog
+
+
+def samples(publish_rate, consume_rate, seconds):
+    return [{'t': float(t), 'published': publish_rate * t,
+             'consumed': consume_rate * t,
+             'depth': (publish_rate - consume_rate) * t}
+            for t in range(1, seconds + 1)]
+
+
+def test_keeping_up_is_limited_by_publishers():
+    analysis = analyse_backlog(samples(1000, 1000, 10), publish_end=10)
+    assert not analysis['saturated']
+    assert analysis['sustainable_rate'] == 1000
+
+
+def test_growing_backlog_is_limited_by_consumers():
+    analysis = analyse_backlog(samples(1000, 600, 10), publish_end=10)
+    assert analysis['saturated']
+    assert analysis['backlog_growth'] == 400
+    assert analysis['sustainable_rate'] == 600
+
+
+def test_samples_after_publishing_are_ignored():
+    draining = samples(1000, 600, 10) + [
+        {'t': 11.0, 'published': 10000, 'consumed': 10000, 'depth': 0}]
+    assert analyse_backlog(draining, publish_end=10)['sustainable_rate'] == 600
+
+
+def test_no_full_window_is_undetermined():
+    analysis = analyse_backlog(samples(1000, 1000, 3), publish_end=0.5)
+    assert analysis['sustainable_rate'] is None
+    assert analysis['saturated'] is None
+
+
+def test_coordinated(run):
+    trial = run('coordinated', producers=2, consumers=2, stats_interval=0.1)
+    assert trial.messages == 300
+    producers = [w for w in trial.workers if w['role'] == 'producer']
+    consumers = [w for w in trial.workers if w['role'] == 'consumer']
+    assert sum(w['messages'] for w in producers) == 300
+    assert sum(w['messages'] for w in consumers) == 300
+    # Without a backlog fit the run is timed by the workers, not the monitor
+    if trial.extra['sustainable_rate'] is None:
+        assert trial.duration < 1.0
+    for worker in consumers:
+        assert worker['end'] >= worker['start']
+
+
+def test_short_run_is_not_timed_by_the_monitor(run):
+    trial = run('coordinated', message_count=100, stats_interval=1.0)
+    assert trial.extra['sustainable_rate'] is None
+    assert trial.duration < 0.5
@@ -0,0 +1,70 @@
+import pytest
+
+from rabbitbench.codec import msgpack
+from rabbitbench.config import BenchConfig
+from rabbitbench.envelope import (COUNT_HEADER, ENVELOPE_HEADER, EnvelopePacker,
+                                  iter_records)
+
+RECORDS = [b'', b'a', b'hello world', bytes(range(256)) * 40]
+
+
+def pack_all(packer, records):
+    bodies = [body for body in map(packer.add, records) if body is not None]
+    last = packer.flush()
+    if last is not None:
+        bodies.append(last)
+    return bodies
+
+
+@pytest.mark.parametrize('envelope_format', [
+    'length',
+    pytest.param('msgpack', marks=pytest.mark.skipif(
+        msgpack is None, reason='msgpack not installed')),
+])
+def test_round_trip(envelope_format):
+    packer = EnvelopePacker(BenchConfig(envelope_size=100,
+                                        envelope_format=envelope_format))
+    bodies = pack_all(packer, RECORDS)
+    assert len(bodies) == 1
+    assert packer.headers() == {ENVELOPE_HEADER: envelope_format,
+                                COUNT_HEADER: len(RECORDS)}
+    unpacked = [bytes(r) for r in iter_records(bodies[0], envelope_format)]
+    assert unpacked == RECORDS
+
+
+def test_flushes_at_size():
+    packer = EnvelopePacker(BenchConfig(envelope_size=3))
+    records = [str(i).encode() for i in range(7)]
+    bodies = pack_all(packer, records)
+    assert [len(list(iter_records(b))) for b in bodies] == [3, 3, 1]
+    assert [bytes(r) for b in bodies for r in iter_records(b)] == records
+    assert packer.stats()['envelopes'] == 3
+
+
+def test_flushes_at_bytes():
+    packer = EnvelopePacker(BenchConfig(envelope_size=1000, envelope_bytes=64))
+    assert packer.add(b'x' * 30) is None
+    body = packer.add(b'y' * 30)
+    assert [bytes(r) for r in iter_records(body)] == [b'x' * 30, b'y' * 30]
+
+
+def test_length_records_are_views_of_the_body():
+    body = pack_all(EnvelopePacker(BenchConfig()), [b'abc', b'def'])[0]
+    records = list(iter_records(body))
+    assert all(isinstance(r, memoryview) for r in records)
+    assert records[1].obj is records[0].obj
+
+
+def test_empty_flush():
+    assert EnvelopePacker(BenchConfig()).flush() is None
+
+
+def test_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        EnvelopePacker(BenchConfig(envelope_format='zip'))
+
+
+def test_envelope(run):
+    trial = run('envelope', envelope_size=25)
+    assert trial.messages == 300
+    assert trial.extra['records_per_envelope'] == 25
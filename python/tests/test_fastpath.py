@@ -0,0 +1,64 @@
+import pika
+
+from rabbitbench.config import BenchConfig
+from rabbitbench.connection import connect
+from rabbitbench.fastpath import FramePublisher
+
+
+def messages(size=16):
+    def body_for(i):
+        return str(i).encode().ljust(size, b'.')
+
+    def properties_for():
+        return pika.BasicProperties(content_type='text/plain', delivery_mode=1,
+                                    headers={'run': 'fastpath'})
+
+    return body_for, properties_for
+
+
+def drain(channel, queue):
+    received = []
+    while True:
+        method, properties, body = channel.basic_get(queue, auto_ack=True)
+        if method is None:
+            return received
+        received.append((properties, body))
+
+
+def publish_raw(broker, queue, count, size=16, batch_size=4):
+    config = BenchConfig(host=broker.host, port=broker.port, queue=queue,
+                         durable=False, batch_size=batch_size)
+    connection = connect(config, quiet=True)
+    try:
+        channel = connection.channel()
+        channel.queue_declare(queue)
+        channel.queue_purge(queue)
+        publisher = FramePublisher(connection, channel, config,
+                                   messages=messages(size))
+        assert publisher.publish(0, count) == count
+        publisher.barrier()
+        return drain(channel, queue)
+    finally:
+        connection.close()
+
+
+def test_frames_decode_like_basic_publish(broker):
+    received = publish_raw(broker, 'fastpath_queue', 10)
+    body_for, _ = messages()
+    assert [body for _, body in received] == [body_for(i) for i in range(10)]
+    properties = received[0][0]
+    assert properties.content_type == 'text/plain'
+    assert properties.headers == {'run': 'fastpath'}
+
+
+def test_bodies_over_frame_max_are_split(broker):
+    size = 300_000
+    received = publish_raw(broker, 'fastpath_large', 3, size=size, batch_size=2)
+    body_for, _ = messages(size)
+    assert [body for _, body in received] == [body_for(i) for i in range(3)]
+
+
+def test_raw_frames(run):
+    trial = run('raw_frames', batch_size=25)
+    assert trial.messages == 300
+    assert trial.extra['batch_size'] == 25
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from rabbitbench import impairment
+from rabbitbench.config import BenchConfig
+
+
+def test_link_delays_and_splits_segments():
+    link = impairment.Link(delay=0.05, jitter=0.0, mbps=0.0, chunk=4)
+    before = time.monotonic()
+    segments = link.schedule(b'0123456789')
+    assert [segment for _, segment in segments] == [b'0123', b'4567', b'89']
+    assert all(due >= before + 0.05 for due, _ in segments)
+
+
+def test_link_bandwidth_spaces_segments():
+    # 0.008 Mbit/s is 1000 bytes a second, so each 100 bytes takes 0.1s
+    link = impairment.Link(delay=0.0, jitter=0.0, mbps=0.008, chunk=100)
+    dues = [due for due, _ in link.schedule(bytes(300))]
+    assert dues[1] - dues[0] == pytest.approx(0.1)
+    assert dues[2] - dues[1] == pytest.approx(0.1)
+
+
+def test_jitter_never_reorders():
+    link = impairment.Link(delay=0.01, jitter=0.01, mbps=0.0, chunk=1)
+    dues = [due for due, _ in link.schedule(bytes(200))]
+    assert dues == sorted(dues)
+
+
+def test_describe():
+    config = BenchConfig(net_rtt=0.02, net_mbps=100, net_chunk=512)
+    assert impairment.impaired(config)
+    assert not impairment.impaired(BenchConfig())
+    assert impairment.describe(config) == ('rtt 20ms, 100 Mbit/s, '
+                                           '512-byte segments')
+
+
+def test_net_rtt_adds_round_trips(run):
+    direct = run('confirms', message_count=20, warmup=0, confirm_mode='sync')
+    delayed = run('confirms', message_count=20, warmup=0, confirm_mode='sync',
+                  net_rtt=0.01)
+    # Every synchronous confirm waits at least one added round trip
+    assert delayed.duration >= 20 * 0.01
+    assert delayed.duration > direct.duration
+    assert delayed.extra['acked'] == 20
@@ -0,0 +1,73 @@
+import pytest
+
+from rabbitbench.latency import LatencyHistogram
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram(sub_bits=8)
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.value_at_percentile(50) == 50
+    assert histogram.value_at_percentile(99) == 99
+    assert histogram.value_at_percentile(100) == 100
+    assert histogram.min == 1 and histogram.max == 100
+    assert histogram.mean == pytest.approx(50.5)
+
+
+def test_large_values_within_bucket_precision():
+    histogram = LatencyHistogram(sub_bits=8)
+    values = [1000 * i for i in range(1, 1001)]
+    for value in values:
+        histogram.record(value)
+    for pct in (50, 90, 99, 99.9):
+        exact = values[int(pct / 100 * len(values)) - 1]
+        assert histogram.value_at_percentile(pct) == pytest.approx(exact, rel=2 ** -7)
+
+
+def test_percentile_never_exceeds_max():
+    histogram = LatencyHistogram()
+    histogram.record(1_000_001)
+    assert histogram.value_at_percentile(100) == 1_000_001
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.value_at_percentile(99) == 0
+    assert histogram.summary()['count'] == 0
+
+
+def test_merge_matches_recording_everything_in_one():
+    a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in range(0, 5000, 7):
+        a.record(value)
+        both.record(value)
+    for value in range(100_000, 200_000, 13):
+        b.record(value, count=2)
+        both.record(value, count=2)
+    a.merge(b)
+    assert a.count == both.count
+    assert a.total == both.total
+    assert (a.min, a.max) == (both.min, both.max)
+    assert a.summary() == both.summary()
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram(8).merge(LatencyHistogram(6))
+
+
+def test_dict_round_trip():
+    histogram = LatencyHistogram()
+    for value in (5, 500, 50_000, 5_000_000):
+        histogram.record(value)
+    copy = LatencyHistogram.from_dict(histogram.to_dict())
+    assert copy.summary() == histogram.summary()
+    assert copy.counts == histogram.counts
+
+
+def test_summary_scales_to_milliseconds():
+    histogram = LatencyHistogram()
+    histogram.record(2_000_000)
+    summary = histogram.summary(pcts=(50,))
+    assert summary['p50'] == pytest.approx(2.0, rel=0.01)
+    assert summary['max'] == 2.0
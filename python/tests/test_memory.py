@@ -0,0 +1,64 @@
+import json
+import os
+
+from rabbitbench import memory
+
+MIB = 1 << 20
+
+
+def write_report(directory, name, pid, role, worker, rss, uss, pss, **extra):
+    report = dict({'pid': pid, 'role': role, 'worker': worker,
+                   'peak': {'rss': rss * MIB, 'uss': uss * MIB, 'pss': pss * MIB}},
+                  **extra)
+    (directory / f'{name}.json').write_text(json.dumps(report))
+
+
+def traced(growth, peak, line):
+    return {'growth': growth, 'peak': peak,
+            'top': [{'line': line, 'growth': growth, 'count': 1}]}
+
+
+def test_collect_merges_reports_by_pid(tmp_path):
+    # A main thread and a thread worker of one process, plus a child process
+    write_report(tmp_path, 'a', 10, 'main', 0, rss=50, uss=30, pss=40)
+    write_report(tmp_path, 'b', 10, 'producer', 1, rss=60, uss=20, pss=35)
+    write_report(tmp_path, 'c', 11, 'consumer', 0, rss=40, uss=10, pss=20)
+    (tmp_path / 'ignored.tmp').write_text('{}')
+
+    summary = memory.collect(str(tmp_path), messages=1000, rate=2000.0)
+    assert summary['processes'] == 2
+    assert summary['peak_rss_mib'] == 100
+    assert summary['peak_uss_mib'] == 40
+    assert summary['peak_pss_mib'] == 60
+    assert summary['msgs_per_sec_per_gb'] == round(2000 / (60 * MIB / 1e9), 1)
+    assert summary['per_process'][0] == {
+        'role': 'producer', 'worker': 1, 'peak_rss_mib': 60,
+        'peak_uss_mib': 30, 'peak_pss_mib': 40}
+    assert 'tracemalloc' not in summary
+    assert os.listdir(tmp_path) == ['ignored.tmp']
+
+
+def test_collect_sums_tracemalloc_per_message(tmp_path):
+    write_report(tmp_path, 'a', 10, 'producer', 0, 1, 1, 1,
+                 tracemalloc=traced(4000, 8000, 'payloads.py:10'))
+    write_report(tmp_path, 'b', 11, 'producer', 1, 1, 1, 1,
+                 tracemalloc=traced(6000, 2000, 'payloads.py:10'))
+    summary = memory.collect(str(tmp_path), messages=100, rate=1.0)
+    assert summary['tracemalloc']['growth_per_message'] == 100
+    assert summary['tracemalloc']['peak_per_message'] == 100
+    (top,) = summary['tracemalloc']['top']
+    assert (top['growth'], top['count']) == (10000, 2)
+    assert 'B/msg retained' in memory.format_memory(summary)
+
+
+def test_collect_without_reports(tmp_path):
+    summary = memory.collect(str(tmp_path / 'missing'), messages=0, rate=0.0)
+    assert summary['processes'] == 0
+    assert summary['msgs_per_sec_per_gb'] == 0.0
+
+
+def test_memory_run(run):
+    trial = run('confirms', memory=True, memory_interval=0.01)
+    usage = trial.extra['memory']
+    assert usage['processes'] >= 1
+    assert usage['peak_rss_mib'] > 0
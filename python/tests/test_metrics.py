@@ -0,0 +1,52 @@
+import threading
+
+from rabbitbench.metrics import WorkerMetrics, parse_address
+
+
+def reporter():
+    return WorkerMetrics(('127.0.0.1', 9), 'publisher', 0, interval=60)
+
+
+def hammer(target, threads=4):
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def test_counters_from_many_threads_add_up():
+    live = reporter()
+
+    def publish():
+        for _ in range(20_000):
+            live.on_publish(10)
+            live.on_consume(5)
+
+    for worker in hammer(publish):
+        worker.join()
+    snapshot = live.snapshot()
+    assert snapshot['sent'] == snapshot['consumed'] == 80_000
+    assert snapshot['sent_bytes'] == 800_000
+    assert snapshot['consumed_bytes'] == 400_000
+
+
+def test_snapshots_lose_no_latencies():
+    live = reporter()
+    counted = []
+
+    def record():
+        for n in range(20_000):
+            live.on_latency(1000 + n)
+
+    workers = hammer(record)
+    while any(worker.is_alive() for worker in workers):
+        counted.append(live.snapshot().get('latency', {}).get('count', 0))
+    for worker in workers:
+        worker.join()
+    counted.append(live.snapshot().get('latency', {}).get('count', 0))
+    assert sum(counted) == 80_000
+
+
+def test_parse_address_defaults_the_host():
+    assert parse_address(':9000') == ('127.0.0.1', 9000)
+    assert parse_address('metrics:9000') == ('metrics', 9000)
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.parametrize('mode', ['round_robin', 'thread'])
+def test_multiplex(run, mode):
+    trial = run('multiplex', connections=2, channels=3, channel_mode=mode)
+    assert trial.messages == 300
+    assert trial.extra['channel_mode'] == mode
+    channels = [c for w in trial.workers for c in w['channels']]
+    assert len(channels) == 6
+    assert sum(c['messages'] for c in channels) == 300
+    assert ('lock_wait_s' in trial.extra) == (mode == 'thread')
+
+
+def test_unknown_channel_mode(run):
+    with pytest.raises(ValueError):
+        run('multiplex', channel_mode='fanout')
@@ -0,0 +1,49 @@
+import pytest
+
+from rabbitbench import runtime
+
+
+def test_capabilities_are_consistent():
+    caps = runtime.capabilities()
+    assert caps['subinterpreters'] == (runtime.interpreters is not None)
+    if not caps['free_threaded_build']:
+        assert caps['gil_enabled']
+    assert caps['python'] in runtime.format_capabilities(caps)
+
+
+def test_format_capabilities():
+    caps = {'implementation': 'CPython', 'python': '3.13.1',
+            'free_threaded_build': True, 'gil_enabled': True,
+            'subinterpreters': False}
+    assert runtime.format_capabilities(caps) == (
+        'CPython 3.13.1 (free-threaded build, GIL re-enabled); '
+        'sub-interpreters unavailable')
+    caps['gil_enabled'] = False
+    assert 'free-threaded, GIL off' in runtime.format_capabilities(caps)
+
+
+@pytest.mark.parametrize('mode', ['thread', 'process'])
+def test_parallel_publish(run, mode):
+    trial = run('parallel_publish', worker_mode=mode, producers=3)
+    assert trial.messages == 300
+    assert len(trial.workers) == 3
+    assert trial.extra['worker_mode'] == mode
+    assert trial.extra['rss_total_mib'] > 0
+
+
+@pytest.mark.parametrize('mode', ['thread', 'process'])
+def test_parallel_consume(run, mode):
+    trial = run('parallel_consume', worker_mode=mode, consumers=2)
+    assert trial.messages == 300
+
+
+def test_subinterpreters_need_support(run):
+    if runtime.interpreters is not None:
+        pytest.skip('sub-interpreters are available here')
+    with pytest.raises(ValueError):
+        run('parallel_publish', worker_mode='subinterpreter')
+
+
+def test_unknown_worker_mode(run):
+    with pytest.raises(ValueError):
+        run('parallel_publish', worker_mode='fiber')
@@ -0,0 +1,61 @@
+import datetime
+import json
+
+import pytest
+
+from rabbitbench.config import BenchConfig
+from rabbitbench.latency import SENT_HEADER
+from rabbitbench.messages import build_message
+from rabbitbench.payloads import MessagePool, message_factory
+
+
+def same_message(decoded, expected):
+    """Equal apart from when each was stamped"""
+    assert decoded.keys() == expected.keys()
+    for key in expected:
+        if key != 'timestamp':
+            assert decoded[key] == expected[key]
+    datetime.datetime.fromisoformat(decoded['timestamp'])
+
+
+@pytest.mark.parametrize('message_id', [0, 7, 12345, 9_999_999_999])
+def test_pool_bodies_decode_like_built_messages(message_id):
+    pool = MessagePool(slots=4)
+    same_message(json.loads(bytes(pool.body(message_id))),
+                 build_message(message_id))
+
+
+def test_pool_with_payload():
+    pool = MessagePool(slots=2, payload='x"y' * 10)
+    same_message(json.loads(bytes(pool.body(3))), build_message(3, 'x"y' * 10))
+
+
+def test_pool_reuses_slots_in_a_ring():
+    pool = MessagePool(slots=2)
+    first, second, third = pool.body(1), pool.body(2), pool.body(3)
+    assert json.loads(bytes(second))['id'] == 2
+    # The third body overwrote the first slot
+    assert json.loads(bytes(first))['id'] == 3
+    assert third.obj is first.obj
+
+
+def test_pool_rejects_ids_too_wide():
+    with pytest.raises(ValueError):
+        MessagePool(slots=1).body(10 ** 10)
+
+
+@pytest.mark.parametrize('preencode', [False, True])
+def test_factory_bodies_match_either_way(preencode):
+    config = BenchConfig(preencode=preencode, payload_size=64, latency=True)
+    body_for, properties_for = message_factory(config)
+    for i in (1, 2, 1000):
+        decoded = json.loads(bytes(body_for(i)))
+        assert decoded['id'] == i
+        assert decoded['content'] == f'Hello World #{i}'
+        assert len(decoded['payload']) == 64
+        assert SENT_HEADER in properties_for().headers
+
+
+def test_preencode_needs_plain_json():
+    with pytest.raises(ValueError):
+        message_factory(BenchConfig(preencode=True, codec='struct'))
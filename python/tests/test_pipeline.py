@@ -0,0 +1,82 @@
+import multiprocessing
+import queue
+
+import pytest
+
+from rabbitbench.scenarios.multiprocess import gather
+from rabbitbench.shmring import SharedRing
+
+
+def write_all(spec, count):
+    ring = SharedRing.attach(spec)
+    try:
+        for i in range(count):
+            ring.put(str(i).encode() * (i % 5 + 1))
+    finally:
+        ring.close()
+
+
+def test_ring_round_trip_and_empty_poll():
+    ring = SharedRing.create(4, 16)
+    try:
+        assert ring.poll() is None
+        ring.put(b'abc')
+        ring.put(b'')
+        assert ring.poll() == b'abc'
+        assert ring.get() == b''
+        assert ring.poll() is None
+    finally:
+        ring.close()
+
+
+def test_oversized_message_is_rejected():
+    ring = SharedRing.create(4, 8)
+    try:
+        with pytest.raises(ValueError):
+            ring.put(b'x' * 9)
+    finally:
+        ring.close()
+
+
+def test_ring_across_processes_wraps_in_order():
+    ring = SharedRing.create(8, 32)
+    writer = multiprocessing.Process(target=write_all, args=(ring.spec, 1000))
+    writer.start()
+    try:
+        received = [ring.get() for _ in range(1000)]
+    finally:
+        writer.join()
+        ring.close()
+    assert received == [str(i).encode() * (i % 5 + 1) for i in range(1000)]
+
+
+class Finished:
+    def is_alive(self):
+        return False
+
+    exitcode = 0
+
+
+def test_gather_stops_early_on_request():
+    results = queue.Queue()
+    results.put(('error', 1, 'boom'))
+    processes = [Finished(), Finished()]
+    reports = gather(results, processes, 5.0,
+                     until=lambda report: report[0] == 'error')
+    assert reports == [('error', 1, 'boom')]
+
+
+def test_gather_raises_when_a_process_exits_silently():
+    results = queue.Queue()
+    results.put(('publisher', 0, {}))
+    with pytest.raises(RuntimeError):
+        gather(results, [Finished(), Finished()], 5.0)
+
+
+def test_pipeline(run):
+    trial = run('pipeline', generators=2, producers=2, ring_slots=16)
+    publishers = [w for w in trial.workers if w['role'] == 'publisher']
+    assert len(publishers) == 2
+    # Messages from rings that warmed up early are not timed
+    assert 0 < trial.messages <= 300
+    assert trial.extra['bottleneck'] in ('generators', 'publishers')
@@ -0,0 +1,68 @@
+import json
+import os
+import threading
+
+from rabbitbench import profiling
+
+
+def test_phase_of_uses_the_innermost_matching_frame():
+    stack = [('rabbitbench/publisher.py', 'publish_range'),
+             ('pika/spec.py', 'encode')]
+    assert profiling.phase_of(stack) == 'encode'
+    assert profiling.phase_of(stack[:1]) == 'publish'
+    assert profiling.phase_of([('app.py', 'main')]) == 'other'
+
+
+def test_sampler_records_other_threads(tmp_path):
+    sampler = profiling.Sampler(str(tmp_path), 'producer', 3, interval=60)
+    stop = threading.Event()
+    busy = threading.Thread(target=stop.wait, name='busy')
+    busy.start()
+    try:
+        sampler.sample()
+    finally:
+        stop.set()
+        busy.join()
+    assert sampler.samples >= 2
+    assert any(key.startswith('producer;busy;') for key in sampler.stacks)
+    assert sampler.phases['wait'] >= 1
+
+    sampler.write()
+    (raw,) = os.listdir(tmp_path / profiling.RAW_DIR)
+    assert raw.startswith('producer-3-')
+
+
+def write_raw(directory, name, role, phases, stacks):
+    raw = directory / profiling.RAW_DIR
+    raw.mkdir(exist_ok=True)
+    (raw / f'{name}.json').write_text(json.dumps({
+        'role': role, 'worker': 0, 'samples': sum(phases.values()),
+        'phases': dict(dict.fromkeys(profiling.PHASES, 0), **phases),
+        'stacks': stacks}))
+
+
+def test_collect_merges_processes_and_appends_trials(tmp_path):
+    write_raw(tmp_path, 'a', 'producer', {'publish': 3, 'wait': 1},
+              {'producer;main;x': 4})
+    write_raw(tmp_path, 'b', 'consumer', {'consume': 4}, {'consumer;main;y': 4})
+    first = profiling.collect(str(tmp_path), 'run 1/2')
+    assert first['samples'] == 8
+    assert first['busy'] == {'publish': round(3 / 7, 4),
+                             'consume': round(4 / 7, 4)}
+    assert first['roles']['producer'] == {'publish': 0.75, 'wait': 0.25}
+    assert not os.listdir(tmp_path / profiling.RAW_DIR)
+
+    write_raw(tmp_path, 'c', 'producer', {'publish': 2}, {'producer;main;x': 2})
+    second = profiling.collect(str(tmp_path), 'run 1/2', append=True)
+    assert second['samples'] == 2
+    assert profiling.read_collapsed(second['collapsed']) == {
+        'producer;main;x': 6, 'consumer;main;y': 4}
+    assert 'publish 100%' in profiling.format_phases(second)
+
+
+def test_profiled_run(run, tmp_path):
+    trial = run('confirms', profile_dir=str(tmp_path), profile_interval=0.001)
+    profile = trial.extra['profile']
+    assert os.path.exists(profile['collapsed'])
+    assert profile['samples'] == sum(
+        profiling.read_collapsed(profile['collapsed']).values())
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from rabbitbench.ratecontrol import ConstantProfile, RateController, parse_profile
+
+
+def test_step_profile():
+    profile = parse_profile('step:1000@10,5000@20')
+    assert profile.rate_at(5) == 1000
+    assert profile.rate_at(15) == 5000
+    assert profile.rate_at(100) == 5000
+
+
+def test_invalid_profile():
+    with pytest.raises(ValueError):
+        parse_profile('ramp:1:2')
+
+
+def test_releases_track_target():
+    pacer = RateController(ConstantProfile(10_000), tick=0.01)
+    released = sum(pacer.acquire(10_000) for _ in range(20))
+    assert released == pytest.approx(2000, abs=100)
+
+
+def test_stall_is_skipped_but_still_targeted():
+    pacer = RateController(ConstantProfile(10_000), tick=0.01, max_burst_ticks=2)
+    pacer.sent(pacer.acquire(10_000))
+    time.sleep(0.2)
+    burst = pacer.acquire(10_000)
+    pacer.sent(burst)
+    # No catching up on the 20 ticks slept through...
+    assert burst <= 200
+    # ...but what they should have sent counts towards the target
+    assert pacer.target >= 2000
+    report = pacer.report()
+    assert report['achieved_rate'] < report['target_rate'] / 2
+
+
+def test_achieved_counts_published_not_released():
+    pacer = RateController(ConstantProfile(10_000), tick=0.01)
+    released = pacer.acquire(10_000) + pacer.acquire(10_000)
+    pacer.sent(released // 2)
+    assert pacer.published == released // 2
+    timeline = pacer.report()['timeline']
+    assert sum(s['achieved'] for s in timeline) == released // 2
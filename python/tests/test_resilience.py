@@ -0,0 +1,28 @@
+import itertools
+
+import pytest
+
+from rabbitbench.resilience import Backoff
+
+
+def test_backoff_grows_to_the_maximum_with_jitter():
+    delays = list(itertools.islice(Backoff(0.1, 1.0).delays(), 6))
+    steps = [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+    for delay, step in zip(delays, steps):
+        assert step / 2 <= delay <= step
+
+
+@pytest.mark.parametrize('persistent', [True, False])
+def test_broker_restart(run, persistent):
+    # A transient queue may lose messages and then waits out the timeout
+    trial = run('broker_restart', message_count=200, restarts=2,
+                restart_downtime=0.1, persistent=persistent, durable=persistent,
+                consume_timeout=5.0 if persistent else 1.0)
+    extra = trial.extra
+    assert len(extra['restarts']) == 2
+    assert extra['confirmed'] == 200
+    assert extra['recover_s'] > 0
+    assert trial.messages + extra['lost'] == 200
+    if persistent:
+        assert not extra['timed_out']
+        assert extra['lost'] == 0
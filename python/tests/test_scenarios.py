@@ -0,0 +1,38 @@
+"""Scenarios end to end against the stand-in broker"""
+
+
+def test_confirms(run):
+    trial = run('confirms')
+    assert trial.messages == 300
+    assert trial.extra['acked'] == 300
+    assert trial.extra['nacked'] == 0
+    assert trial.extra['confirm_latency_ms']['count'] == 300
+    assert trial.duration > 0
+
+
+def test_confirms_sync(run):
+    trial = run('confirms', message_count=50, confirm_mode='sync')
+    assert trial.extra['acked'] == 50
+
+
+def test_latency(run):
+    trial = run('latency')
+    assert trial.messages == 300
+    assert not trial.extra['timed_out']
+    latency = trial.extra['latency_ms']
+    assert latency['count'] == 300
+    assert 0 <= latency['p50'] <= latency['p99'] <= latency['max']
+
+
+def test_consume(run, prefill):
+    prefill('consume', 320)
+    trial = run('consume')
+    assert trial.messages == 300
+    assert not trial.extra['timed_out']
+
+
+def test_consume_batched_acks(run, prefill):
+    prefill('consume', 320)
+    trial = run('consume', ack_every=10, prefetch_count=50)
+    assert trial.messages == 300
+    assert not trial.extra['timed_out']
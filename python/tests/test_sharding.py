@@ -0,0 +1,66 @@
+import pytest
+
+from rabbitbench.config import BenchConfig
+from rabbitbench.sharding import declare_shards, shard_queues, shard_router
+
+
+class FakeChannel:
+    def __init__(self):
+        self.queues, self.exchanges, self.bindings = [], [], []
+
+    def queue_declare(self, queue, **kwargs):
+        self.queues.append(queue)
+
+    def exchange_declare(self, exchange, exchange_type, **kwargs):
+        self.exchanges.append((exchange, exchange_type))
+
+    def queue_bind(self, queue, exchange, routing_key):
+        self.bindings.append((queue, exchange, routing_key))
+
+
+def config(**overrides):
+    return BenchConfig(queue='q').replace(**overrides)
+
+
+def test_one_queue_is_left_unsharded():
+    assert shard_queues(config(shards=1)) == ['q']
+    assert shard_router(config(shards=1))(7) == ('', 'q')
+
+
+def test_queue_mode_routes_round_robin_by_id():
+    route = shard_router(config(shards=3))
+    assert [route(i) for i in range(4)] == [('', 'q.0'), ('', 'q.1'),
+                                            ('', 'q.2'), ('', 'q.0')]
+
+
+def test_direct_mode_binds_one_key_per_shard():
+    channel = FakeChannel()
+    cfg = config(shards=2, shard_mode='direct')
+    assert declare_shards(channel, cfg) == ['q.0', 'q.1']
+    assert channel.exchanges == [('q.shards', 'direct')]
+    assert channel.bindings == [('q.0', 'q.shards', 'shard.0'),
+                                ('q.1', 'q.shards', 'shard.1')]
+    assert shard_router(cfg)(3) == ('q.shards', 'shard.1')
+
+
+def test_consistent_hash_binds_weights_and_routes_on_the_id():
+    channel = FakeChannel()
+    cfg = config(shards=2, shard_mode='consistent-hash')
+    declare_shards(channel, cfg)
+    assert channel.exchanges == [('q.shards', 'x-consistent-hash')]
+    assert {key for _, _, key in channel.bindings} == {'1'}
+    assert shard_router(cfg)(42) == ('q.shards', '42')
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        declare_shards(FakeChannel(), config(shards=2, shard_mode='random'))
+
+
+def test_sharded(run):
+    trial = run('sharded', shards=2, producers=2, stats_interval=0.05)
+    assert trial.extra['shards'] == 2
+    consumers = [w for w in trial.workers if w['role'] == 'consumer']
+    assert len(consumers) == 2
+    assert trial.messages == sum(w['messages'] for w in consumers) == 300
+    assert trial.duration > 0
@@ -0,0 +1,106 @@
+import math
+
+import pytest
+
+from rabbitbench.compare import compare_results, format_row
+from rabbitbench.results import ScenarioResult, TrialResult
+from rabbitbench.stats import describe, percentiles, t_cdf, t_quantile, welch
+
+
+@pytest.mark.parametrize('p, df, expected', [
+    (0.975, 1, 12.706),
+    (0.975, 5, 2.571),
+    (0.975, 10, 2.228),
+    (0.975, 30, 2.042),
+    (0.95, 5, 2.015),
+    (0.995, 10, 3.169),
+    (0.995, 30, 2.750),
+])
+def test_t_quantile_matches_t_table(p, df, expected):
+    assert t_quantile(p, df) == pytest.approx(expected, abs=1e-3)
+
+
+def test_t_quantile_approaches_normal():
+    assert t_quantile(0.975, 10_000) == pytest.approx(1.960, abs=1e-3)
+
+
+@pytest.mark.parametrize('df', [1, 4, 10, 57.3])
+def test_t_cdf_inverts_quantile(df):
+    assert t_cdf(0.0, df) == pytest.approx(0.5)
+    for p in (0.9, 0.975):
+        assert t_cdf(t_quantile(p, df), df) == pytest.approx(p, abs=1e-6)
+        assert t_quantile(1 - p, df) == pytest.approx(-t_quantile(p, df))
+
+
+def test_describe_confidence_interval():
+    described = describe([1, 2, 3, 4, 5])
+    assert described['mean'] == 3
+    assert described['stdev'] == pytest.approx(math.sqrt(2.5))
+    margin = 2.776 * math.sqrt(2.5) / math.sqrt(5)
+    assert described['ci_low'] == pytest.approx(3 - margin, abs=1e-3)
+    assert described['ci_high'] == pytest.approx(3 + margin, abs=1e-3)
+
+
+def test_describe_single_value_has_no_interval():
+    described = describe([7.0])
+    assert described['stdev'] == 0.0
+    assert math.isnan(described['ci_low'])
+
+
+def test_welch_known_values():
+    compared = welch([1, 2, 3, 4, 5], [3, 4, 5, 6, 7])
+    assert compared['diff'] == 2
+    assert compared['t'] == pytest.approx(2.0)
+    assert compared['df'] == pytest.approx(8.0)
+    assert compared['p_value'] == pytest.approx(0.0805, abs=1e-4)
+    assert compared['ci_low'] == pytest.approx(2 - 2.306, abs=1e-3)
+    assert compared['ci_high'] == pytest.approx(2 + 2.306, abs=1e-3)
+
+
+def test_welch_needs_two_samples_each():
+    assert welch([1.0], [1.0, 2.0]) == {}
+
+
+def test_percentiles():
+    summary = percentiles(range(1, 101), pcts=(50, 99))
+    assert summary['max'] == 100
+    assert summary['count'] == 100
+    assert 50 <= summary['p50'] <= 51
+    assert 99 <= summary['p99'] <= 100
+
+
+def test_summary_omits_interval_for_one_trial():
+    result = ScenarioResult(scenario='confirms', config={})
+    result.trials.append(TrialResult(messages=100, duration=1.0))
+    assert 'ci95_low_rate' not in result.summary()
+    result.trials.append(TrialResult(messages=120, duration=1.0))
+    summary = result.summary()
+    assert summary['ci95_low_rate'] < summary['mean_rate'] < summary['ci95_high_rate']
+
+
+def result_with(rates, **config):
+    result = ScenarioResult(scenario='confirms', config=config)
+    result.trials += [TrialResult(messages=rate, duration=1.0) for rate in rates]
+    return result
+
+
+def test_compare_flags_a_significant_regression():
+    report = compare_results([result_with([1000, 1010, 990, 1005])],
+                             [result_with([800, 810, 790, 805])])
+    assert report['regressions'] == ['confirms']
+    assert '[regression]' in format_row(report['rows'][0])
+
+
+def test_compare_small_noise_is_no_change():
+    report = compare_results([result_with([1000, 1010, 990])],
+                             [result_with([1002, 1008, 992])])
+    assert report['rows'][0]['verdict'] == 'no change'
+
+
+def test_compare_without_trials_prints_insufficient():
+    report = compare_results([result_with([], confirm_window=8)],
+                             [result_with([1000, 1010], confirm_window=16)])
+    row = report['rows'][0]
+    assert row['verdict'] == 'insufficient trials'
+    assert format_row(row) == ('confirms: insufficient trials'
+                               '\n    confirm_window: 8 -> 16')
@@ -0,0 +1,33 @@
+from rabbitbench.runner import resolve_config
+from rabbitbench.sweep import SweepCache, config_key, grid_points, run_sweep
+
+
+def test_grid_points():
+    assert grid_points({'a': [1, 2], 'b': ['x']}) == [{'a': 1, 'b': 'x'},
+                                                      {'a': 2, 'b': 'x'}]
+
+
+def test_reporting_settings_do_not_change_the_key():
+    base = config_key('confirms', resolve_config('confirms', {}))
+    for overrides in ({'metrics_host': '0.0.0.0'}, {'profile_dir': '/tmp/p'},
+                      {'profile_interval': 0.01}, {'memory_dir': '/tmp/m'},
+                      {'stats_interval': 5.0}, {'port': 5673}):
+        assert config_key('confirms', resolve_config('confirms', overrides)) == base
+    assert config_key('confirms', resolve_config(
+        'confirms', {'confirm_window': 7})) != base
+
+
+def test_resume_loads_finished_points(broker, tmp_path):
+    cache = SweepCache(str(tmp_path))
+    overrides = {'host': broker.host, 'port': broker.port, 'message_count': 50,
+                 'warmup': 0, 'trials': 1}
+    points = grid_points({'confirm_window': [1, 8]})
+
+    first = run_sweep('confirms', points, overrides, cache)
+    assert [cached for _, _, cached in first] == [False, False]
+    assert len(list(tmp_path.glob('*.json'))) == 2
+
+    again = run_sweep('confirms', points + [{'confirm_window': 16}],
+                      dict(overrides, metrics_host='0.0.0.0'), cache)
+    assert [cached for _, _, cached in again] == [True, True, False]
+    assert again[0][1].trials[0].messages == first[0][1].trials[0].messages